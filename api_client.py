@@ -182,30 +182,158 @@ class MaxParkAPI:
         params = {'card_number': card_number}
         return self._request('GET', f'/unblock_user', authenticated=True, params=params)
     
-    def get_users(self) -> Dict[str, Any]:
+    def get_users(self, query: Optional[str] = None, offset: Optional[int] = None,
+                  limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
         """
-        Get list of all users.
+        Get users sorted by name.
+        
+        Args:
+            query: Name substring or card number prefix to filter by
+            offset: Number of matching users to skip
+            limit: Page size (max 1000)
+            cursor: next_cursor from a previous page (takes precedence over offset)
         
         Returns:
-            Response dict with users list
+            Full user list when called without arguments, otherwise a page dict
+            with users, total, next_cursor and roster_version
             
         Authentication: None (Public) ❌
         """
-        return self._request('GET', '/get_users')
+        params = {}
+        if query:
+            params['q'] = query
+        if offset is not None:
+            params['offset'] = offset
+        if limit is not None:
+            params['limit'] = limit
+        if cursor:
+            params['cursor'] = cursor
+        return self._request('GET', '/get_users', params=params or None)
+    
+    def iter_users(self, query: Optional[str] = None, page_size: int = 500):
+        """Yield every user (optionally filtered), following next_cursor page by page."""
+        cursor = None
+        while True:
+            page = self.get_users(query=query, limit=page_size, cursor=cursor)
+            for user in page.get('users', []):
+                yield user
+            cursor = page.get('next_cursor')
+            if not cursor:
+                return
+    
+    def bulk_update_users(
+        self,
+        upserts: Optional[List[Dict[str, Any]]] = None,
+        deletes: Optional[List[str]] = None,
+        blocks: Optional[List[str]] = None,
+        unblocks: Optional[List[str]] = None,
+        replace: bool = False,
+        since: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply many user and blocklist changes in one request (one batch on the device).
+        
+        Args:
+            upserts: User dicts with card_number, id, name and optional ref_id
+            deletes: Card numbers to delete
+            blocks: Card numbers to block
+            unblocks: Card numbers to unblock
+            replace: Make upserts the complete user list (full roster sync)
+            since: Roster version these changes are a delta against; the device
+                   rejects the batch (HTTP 409) if its roster has moved on
+        
+        Returns:
+            Response dict with upserted/deleted/blocked/unblocked counts and the
+            new roster_id / roster_version
+            
+        Authentication: API Key Required ✅
+        """
+        body = {
+            'upsert': upserts or [],
+            'delete': deletes or [],
+            'block': blocks or [],
+            'unblock': unblocks or [],
+            'replace': replace
+        }
+        if since is not None:
+            body['since'] = since
+        return self._request('POST', '/bulk_users', authenticated=True, json=body)
     
-    def search_user(self, card_number: str) -> Dict[str, Any]:
+    def get_roster_version(self, since: Optional[int] = None,
+                           roster_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Search for a specific user.
+        Get the device's roster id and version.
+        
+        Args:
+            since: Version last seen by the caller; adds an in_sync flag to the response
+            roster_id: Roster id last seen by the caller
+        
+        Returns:
+            Response dict with roster_id, roster_version (and in_sync)
+            
+        Authentication: None (Public) ❌
+        """
+        params = {}
+        if since is not None:
+            params['since'] = since
+        if roster_id:
+            params['roster_id'] = roster_id
+        return self._request('GET', '/roster_version', params=params or None)
+    
+    def bulk_add_users(self, users: List[Dict[str, Any]], replace: bool = False) -> Dict[str, Any]:
+        """
+        Add or update many users at once (see bulk_update_users).
+        
+        Authentication: API Key Required ✅
+        """
+        return self.bulk_update_users(upserts=users, replace=replace)
+    
+    def bulk_delete_users(self, card_numbers: List[str]) -> Dict[str, Any]:
+        """
+        Delete many users at once (see bulk_update_users).
+        
+        Authentication: API Key Required ✅
+        """
+        return self.bulk_update_users(deletes=card_numbers)
+    
+    def bulk_block_users(self, card_numbers: List[str]) -> Dict[str, Any]:
+        """
+        Block many cards at once (see bulk_update_users).
+        
+        Authentication: API Key Required ✅
+        """
+        return self.bulk_update_users(blocks=card_numbers)
+    
+    def bulk_unblock_users(self, card_numbers: List[str]) -> Dict[str, Any]:
+        """
+        Unblock many cards at once (see bulk_update_users).
+        
+        Authentication: API Key Required ✅
+        """
+        return self.bulk_update_users(unblocks=card_numbers)
+    
+    def search_user(self, card_number: Optional[str] = None, user_id: Optional[str] = None,
+                    ref_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Search for users by card number, user id or ref_id (first one given is used).
         
         Args:
             card_number: Card number to search
+            user_id: User ID to search
+            ref_id: Reference ID to search
         
         Returns:
-            Response dict with user info
+            Response dict with matching users
             
         Authentication: None (Public) ❌
         """
-        params = {'card_number': card_number}
+        params = {}
+        if card_number:
+            params['card_number'] = card_number
+        if user_id:
+            params['id'] = user_id
+        if ref_id:
+            params['ref_id'] = ref_id
         return self._request('GET', '/search_user', params=params)
     
     # ====================================
@@ -231,6 +359,17 @@ class MaxParkAPI:
         }
         return self._request('GET', '/relay', authenticated=True, params=params)
     
+    def get_relay_status(self) -> Dict[str, Any]:
+        """
+        Get the mode and output state of each relay.
+        
+        Returns:
+            Response dict with per-relay mode, energised flag and pulse_remaining
+            
+        Authentication: None (Public) ❌
+        """
+        return self._request('GET', '/relay_status')
+    
     # ====================================
     # TRANSACTIONS (Public)
     # ====================================
@@ -246,6 +385,56 @@ class MaxParkAPI:
         """
         return self._request('GET', '/get_transactions')
     
+    def get_transaction_history(
+        self,
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None,
+        reader: Optional[int] = None,
+        status: Optional[str] = None,
+        card: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of transaction history, newest first.
+        
+        Args:
+            from_ts: Start of the range (epoch seconds)
+            to_ts: End of the range (epoch seconds)
+            reader: Reader number filter
+            status: "granted", "denied", "blocked" or a full status string
+            card: Card number filter
+            limit: Page size (max 500)
+            cursor: next_cursor from the previous page
+        
+        Returns:
+            Page dict with transactions and next_cursor (None on the last page)
+            
+        Authentication: None (Public) ❌
+        """
+        params = {'limit': limit}
+        for key, value in (('from', from_ts), ('to', to_ts), ('reader', reader),
+                           ('status', status), ('card', card), ('cursor', cursor)):
+            if value is not None:
+                params[key] = value
+        return self._request('GET', '/get_transaction_history', params=params)
+    
+    def iter_transaction_history(self, **filters):
+        """
+        Iterate over every transaction matching the filters, fetching page by page.
+        Accepts the same keyword arguments as get_transaction_history().
+        """
+        cursor = None
+        while True:
+            page = self.get_transaction_history(cursor=cursor, **filters)
+            if page.get("status") != "success":
+                raise RuntimeError(page.get("message", "Error fetching transaction history"))
+            for tx in page.get("transactions", []):
+                yield tx
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+    
     def get_today_stats(self) -> Dict[str, Any]:
         """
         Get today's statistics.
@@ -257,16 +446,18 @@ class MaxParkAPI:
         """
         return self._request('GET', '/get_today_stats')
     
-    def search_user_transactions(self, name: str, date_range: str = "today") -> Dict[str, Any]:
+    def search_user_transactions(self, name: str = "", date_range: str = "today",
+                                 card: Optional[str] = None) -> Dict[str, Any]:
         """
-        Search transactions by user name.
+        Search transactions by user name, or by exact card number.
         
         Args:
-            name: User name to search
+            name: User name (or part of it) to search
             date_range: "today", "week", "month", or "all"
+            card: Card number to search instead of a name
         
         Returns:
-            List of matching transactions
+            Matching transactions, newest first (max 100)
             
         Authentication: None (Public) ❌
         """
@@ -274,6 +465,8 @@ class MaxParkAPI:
             'name': name,
             'range': date_range
         }
+        if card:
+            params['card'] = card
         return self._request('GET', '/search_user_transactions', params=params)
     
     def sync_transactions(self) -> Dict[str, Any]:
@@ -287,6 +480,50 @@ class MaxParkAPI:
         """
         return self._request('POST', '/sync_transactions', authenticated=True)
     
+    def get_latency_stats(self) -> Dict[str, Any]:
+        """
+        Get per-reader access-path latency percentiles (p50/p95/p99 per stage).
+        
+        Returns:
+            Latency histograms summary
+            
+        Authentication: None (Public) ❌
+        """
+        return self._request('GET', '/latency_stats')
+    
+    def reset_latency_stats(self) -> Dict[str, Any]:
+        """
+        Clear the latency histograms.
+        
+        Returns:
+            Reset status
+            
+        Authentication: API Key Required ✅
+        """
+        return self._request('POST', '/reset_latency_stats', authenticated=True)
+    
+    def get_scan_rate_stats(self) -> Dict[str, Any]:
+        """
+        Get scan rate limiter windows and accepted/suppressed counters.
+        
+        Returns:
+            Rate limiter statistics
+            
+        Authentication: None (Public) ❌
+        """
+        return self._request('GET', '/scan_rate_stats')
+    
+    def get_work_stats(self) -> Dict[str, Any]:
+        """
+        Get priority class queue occupancy, shed counts and camera breaker states.
+        
+        Returns:
+            Work class statistics
+            
+        Authentication: None (Public) ❌
+        """
+        return self._request('GET', '/work_stats')
+    
     def transaction_cache_status(self) -> Dict[str, Any]:
         """
         Get transaction cache status.
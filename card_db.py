@@ -0,0 +1,354 @@
+import os
+import json
+import mmap
+import struct
+import zlib
+import logging
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from collections.abc import MutableMapping
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# Everything the scan path needs about one card, precomputed: the roster facts (allowed,
+# blocked, user name), the photo preference and the resulting status / transaction label
+AccessEntry = namedtuple("AccessEntry", ["allowed", "blocked", "name", "skip_photo", "status", "label"])
+
+STATUS_GRANTED = "Access Granted"
+STATUS_DENIED = "Access Denied"
+STATUS_BLOCKED = "Blocked"
+
+
+def make_access_entry(allowed: bool, blocked: bool, name: str = "Unknown", skip_photo: bool = False) -> AccessEntry:
+    """Build a decision record; blocking wins over the roster, unknown cards are denied."""
+    if blocked:
+        return AccessEntry(allowed, True, name, skip_photo, STATUS_BLOCKED, "Blocked User")
+    if allowed:
+        return AccessEntry(True, False, name, skip_photo, STATUS_GRANTED, name)
+    return AccessEntry(False, False, "Unknown", skip_photo, STATUS_DENIED, "Unknown")
+
+MAGIC = b"MPCD"
+VERSION = 2
+# magic, version, count, stamp length, allowed, blocked, id index, ref_id index; then the stamp (padded to 4)
+HEADER = struct.Struct("<4sIIIIIII")
+MAX_CARD = 0xFFFFFFFF
+
+FLAG_ALLOWED = 1
+FLAG_BLOCKED = 2
+FLAG_SKIP_PHOTO = 4
+
+# Record fields with a lookup index (hash of the value -> record)
+INDEXED_FIELDS = ("id", "ref_id")
+
+
+def _padded(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def _hash(value: str) -> int:
+    return zlib.crc32(value.encode("utf-8"))
+
+
+def entry_flags(entry: AccessEntry) -> int:
+    return ((FLAG_ALLOWED if entry.allowed else 0) | (FLAG_BLOCKED if entry.blocked else 0)
+            | (FLAG_SKIP_PHOTO if entry.skip_photo else 0))
+
+
+def card_key(card_str: str) -> Optional[int]:
+    """uint32 card id for a roster key stored in the database, or None if it can't be (non-canonical or too large)."""
+    try:
+        card_int = int(card_str)
+    except (TypeError, ValueError):
+        return None
+    return card_int if 0 <= card_int <= MAX_CARD and str(card_int) == card_str else None
+
+
+def name_key(name: str, card_str: str) -> Tuple[str, str]:
+    """Sort key of the name order index: (lower-cased name, card number)."""
+    return (name or "").lower(), card_str
+
+
+def build_card_db(path: str, entries: Iterable[Tuple[int, AccessEntry, dict]], stamp: str = "") -> int:
+    """
+    Write a compact card database to path (atomically).
+
+    entries: (card_int, access_entry, attrs) with card_int in uint32 range; attrs is the
+    user record (name, id, ref_id, ...) stored as compact JSON in the blob. Returns the count.
+    """
+    rows = sorted(entries, key=lambda e: e[0])
+    return write_card_db(path, ((card_int, entry_flags(entry),
+                                 json.dumps(attrs, separators=(",", ":")).encode("utf-8") if attrs else b"")
+                                for card_int, entry, attrs in rows), stamp)
+
+
+def write_card_db(path: str, rows: Iterable[Tuple[int, int, bytes]], stamp: str = "") -> int:
+    """
+    Write (card_int, flags, encoded record) rows, already in ascending card order, as a card database.
+    Used directly to merge changes into an existing database without decoding unchanged records.
+
+    Layout: header + stamp | uint32 cards[count] (sorted) | uint8 flags[count] (padded)
+            | uint32 offsets[count + 1] into the blob | uint32 name_order[allowed] (record
+            indexes by name_key) | per indexed field: uint32 hashes[n], uint32 indexes[n] | blob
+    """
+    cards = array("I")
+    flags = bytearray()
+    offsets = array("I", [0])
+    blob = bytearray()
+    names: List[str] = []
+    name_rows = array("I")
+    indexes = {field: [] for field in INDEXED_FIELDS}
+    blocked = 0
+    for i, (card_int, card_flags, raw) in enumerate(rows):
+        if cards and card_int <= cards[-1]:
+            raise ValueError("card database rows must be in ascending card order")
+        cards.append(card_int)
+        flags.append(card_flags)
+        blob += raw
+        offsets.append(len(blob))
+        blocked += bool(card_flags & FLAG_BLOCKED)
+        if card_flags & FLAG_ALLOWED:
+            attrs = json.loads(raw.decode("utf-8")) if raw else {}
+            names.append("\0".join(name_key(attrs.get("name", ""), str(card_int))))
+            name_rows.append(i)
+            for field in INDEXED_FIELDS:
+                if attrs.get(field):
+                    indexes[field].append((_hash(str(attrs[field])) << 32) | i)
+    name_order = array("I", (name_rows[j] for j in sorted(range(len(names)), key=names.__getitem__)))
+    del names
+    flags += b"\0" * (_padded(len(flags)) - len(flags))
+    stamp_bytes = stamp.encode("utf-8")
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(cards), len(stamp_bytes), len(name_order), blocked,
+                            *(len(indexes[field]) for field in INDEXED_FIELDS)))
+        f.write(stamp_bytes + b"\0" * (_padded(len(stamp_bytes)) - len(stamp_bytes)))
+        f.write(cards.tobytes())
+        f.write(bytes(flags))
+        f.write(offsets.tobytes())
+        f.write(name_order.tobytes())
+        for field in INDEXED_FIELDS:
+            pairs = sorted(indexes[field])
+            f.write(array("I", (p >> 32 for p in pairs)).tobytes())
+            f.write(array("I", (p & 0xFFFFFFFF for p in pairs)).tobytes())
+        f.write(bytes(blob))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(cards)
+
+
+class CardDB:
+    """
+    Read-only, memory-mapped view of a file written by build_card_db().
+
+    Opening only maps the file; pages are faulted in as lookups touch them,
+    so startup is instant and the resident footprint stays small. ``get()``
+    bisects the sorted uint32 card array and decodes only the matching record.
+    Instances are immutable: the owner publishes a new CardDB after a rebuild.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        if len(self._mm) < HEADER.size or self._mm[:4] != MAGIC or HEADER.unpack_from(self._mm, 0)[1] != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} card database")
+        _, _, count, stamp_len, allowed, blocked, *index_sizes = HEADER.unpack_from(self._mm, 0)
+        pos = HEADER.size
+        self.stamp = self._mm[pos:pos + stamp_len].decode("utf-8")
+        pos += _padded(stamp_len)
+
+        self.count = count
+        self.allowed_count = allowed
+        self.blocked_count = blocked
+        self._view = view = memoryview(self._mm)
+        self._cards = view[pos:pos + 4 * count].cast("I")
+        pos += 4 * count
+        self._flags = view[pos:pos + count]
+        pos += _padded(count)
+        self._offsets = view[pos:pos + 4 * (count + 1)].cast("I")
+        pos += 4 * (count + 1)
+        self._name_order = view[pos:pos + 4 * allowed].cast("I")
+        pos += 4 * allowed
+        self._indexes = {}
+        for field, n in zip(INDEXED_FIELDS, index_sizes):
+            hashes = view[pos:pos + 4 * n].cast("I")
+            rows = view[pos + 4 * n:pos + 8 * n].cast("I")
+            self._indexes[field] = (hashes, rows)
+            pos += 8 * n
+        self._blob_start = pos
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _index(self, card_int: int) -> int:
+        if not 0 <= card_int <= MAX_CARD:
+            return -1
+        i = bisect_left(self._cards, card_int)
+        return i if i < self.count and self._cards[i] == card_int else -1
+
+    def _raw_at(self, i: int) -> bytes:
+        return self._mm[self._blob_start + self._offsets[i]:self._blob_start + self._offsets[i + 1]]
+
+    def _record_at(self, i: int) -> dict:
+        raw = self._raw_at(i)
+        return json.loads(raw.decode("utf-8")) if raw else {}
+
+    def record(self, card_int: int) -> Optional[dict]:
+        """Stored attributes for a card, or None if absent."""
+        i = self._index(card_int)
+        return self._record_at(i) if i >= 0 else None
+
+    def flags(self, card_int: int) -> int:
+        """Flag bits for a card (0 if absent)."""
+        i = self._index(card_int)
+        return self._flags[i] if i >= 0 else 0
+
+    def get(self, card_int: int) -> Optional[AccessEntry]:
+        """AccessEntry for a card, or None if the card is not in the database."""
+        i = self._index(card_int)
+        if i < 0:
+            return None
+        flags = self._flags[i]
+        name = "Unknown"
+        if flags & FLAG_ALLOWED:
+            name = self._record_at(i).get("name", "Unknown")
+        return make_access_entry(bool(flags & FLAG_ALLOWED), bool(flags & FLAG_BLOCKED), name,
+                                 bool(flags & FLAG_SKIP_PHOTO))
+
+    def rows(self) -> Iterator[Tuple[int, int, bytes]]:
+        """(card_int, flags, encoded record) for every card in ascending order (the write_card_db input)."""
+        for i in range(self.count):
+            yield self._cards[i], self._flags[i], self._raw_at(i)
+
+    def find(self, field: str, value: str) -> List[int]:
+        """Cards whose record has field == value (field in INDEXED_FIELDS), via the hash index."""
+        hashes, rows = self._indexes[field]
+        value = str(value)
+        h = _hash(value)
+        found = []
+        j = bisect_left(hashes, h)
+        while j < len(hashes) and hashes[j] == h:
+            i = rows[j]
+            if str(self._record_at(i).get(field, "")) == value:
+                found.append(self._cards[i])
+            j += 1
+        return found
+
+    def by_name(self, after: Optional[Tuple[str, str]] = None) -> Iterator[Tuple[str, dict]]:
+        """(card number, record) of allowed cards in name_key order, starting after the given key."""
+        order = self._name_order
+        lo, hi = 0, len(order)
+        if after is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                i = order[mid]
+                if name_key(self._record_at(i).get("name", ""), str(self._cards[i])) <= after:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        for j in range(lo, len(order)):
+            i = order[j]
+            yield str(self._cards[i]), self._record_at(i)
+
+    def close(self):
+        try:
+            for view in ("_cards", "_flags", "_offsets", "_name_order", "_view"):
+                if hasattr(self, view):
+                    getattr(self, view).release()
+            for hashes, rows in getattr(self, "_indexes", {}).values():
+                hashes.release()
+                rows.release()
+            self._mm.close()
+        except Exception as e:
+            logging.getLogger(__name__).debug(f"Error closing card database {self.path}: {e}")
+        finally:
+            self._file.close()
+
+
+class RosterView(MutableMapping):
+    """
+    Dict-like roster read from a CardDB with a small dict of changes on top (None = deleted),
+    so a large roster can be read and edited without loading it into memory.
+
+    kind "users" maps card number -> user record for allowed cards; kind "blocked" maps
+    card number -> True for blocked cards. With cleared=True the database is ignored (the
+    roster was replaced) and only the changes count. Not thread-safe: the owner locks.
+    """
+
+    def __init__(self, card_db: CardDB, kind: str, changes: Optional[dict] = None, cleared: bool = False):
+        self.card_db = card_db
+        self.kind = kind
+        self.cleared = cleared
+        self._flag = FLAG_ALLOWED if kind == "users" else FLAG_BLOCKED
+        self.changes = {}
+        self._len = 0 if cleared else (card_db.allowed_count if kind == "users" else card_db.blocked_count)
+        for key, value in (changes or {}).items():
+            self._set(key, value)
+
+    def _base(self, key: str):
+        card_int = None if self.cleared else card_key(key)
+        if card_int is None or not self.card_db.flags(card_int) & self._flag:
+            return None
+        return self.card_db.record(card_int) if self.kind == "users" else True
+
+    def _set(self, key: str, value):
+        present = key in self
+        self.changes[key] = value
+        self._len += (value is not None) - present
+
+    def __getitem__(self, key):
+        if key in self.changes:
+            value = self.changes[key]
+        else:
+            value = self._base(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if value is None:
+            raise ValueError("None marks a deletion; use del or pop")
+        self._set(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._set(key, None)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        if not self.cleared:
+            db = self.card_db
+            for i in range(db.count):
+                if db._flags[i] & self._flag:
+                    key = str(db._cards[i])
+                    if key not in self.changes:
+                        yield key
+        for key, value in list(self.changes.items()):
+            if value is not None:
+                yield key
+
+    def copy(self) -> "RosterView":
+        """Independent view over the same database (only the changes are copied)."""
+        view = RosterView(self.card_db, self.kind, cleared=self.cleared)
+        view.changes = dict(self.changes)
+        view._len = self._len
+        return view
+
+    def find(self, field: str, value) -> List[str]:
+        """Card numbers whose user record has field == value, sorted."""
+        value = str(value)
+        found = [] if self.cleared else [str(c) for c in self.card_db.find(field, value)
+                                         if str(c) not in self.changes]
+        found += [k for k, v in self.changes.items() if v is not None and str(v.get(field, "")) == value]
+        return sorted(found)
@@ -0,0 +1,114 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+
+STATUS_FIELDS = {
+    "Access Granted": "valid_entries",
+    "Access Denied": "invalid_entries",
+    "Blocked": "blocked_entries",
+}
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {"valid_entries": 0, "invalid_entries": 0, "blocked_entries": 0}
+
+
+class DailyStats:
+    """
+    In-memory access counters keyed by day and reader.
+
+    ``record()`` is a dict increment under a lock, so the scan path never
+    touches the disk. The counters are written to ``daily_stats.json`` by
+    ``flush()`` (called from a timer thread and at shutdown) using the same
+    file layout as before, plus a per-reader breakdown under ``readers``.
+    """
+
+    def __init__(self, path: str, retention_days: int = 20):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._days: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.error(f"Error reading {self.path}: {e}")
+            return {}
+
+    def record(self, status: str, reader=None, when: Optional[datetime] = None):
+        """Count one access attempt for today (or `when`)."""
+        field = STATUS_FIELDS.get(status)
+        if field is None:
+            return
+        date_str = (when or datetime.now()).strftime('%Y-%m-%d')
+        with self._lock:
+            day = self._days.get(date_str)
+            if day is None:
+                day = self._days[date_str] = dict(date=date_str, readers={}, **_empty_counts())
+            day[field] = day.get(field, 0) + 1
+            if reader is not None:
+                per_reader = day.setdefault("readers", {}).setdefault(str(reader), _empty_counts())
+                per_reader[field] += 1
+            self._dirty = True
+
+    def day(self, date_str: str) -> dict:
+        """Copy of one day's counters (zeros if nothing was recorded)."""
+        with self._lock:
+            day = self._days.get(date_str)
+            if day is None:
+                return dict(date=date_str, readers={}, **_empty_counts())
+            return json.loads(json.dumps(day))
+
+    def last_days(self, days: Optional[int] = None) -> List[dict]:
+        """Counters for the last `days` days (default: retention window), oldest first."""
+        today = datetime.now()
+        dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days or self.retention_days)]
+        return [self.day(date_str) for date_str in reversed(dates)]
+
+    def prune(self) -> int:
+        """Drop days older than the retention window; returns how many were removed."""
+        cutoff_str = (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        with self._lock:
+            old_dates = [date_str for date_str in self._days if date_str < cutoff_str]
+            for date_str in old_dates:
+                del self._days[date_str]
+            if old_dates:
+                self._dirty = True
+        return len(old_dates)
+
+    def clear(self):
+        with self._lock:
+            self._days = {}
+            self._dirty = True
+
+    def flush(self) -> bool:
+        """Write the counters to disk if they changed since the last flush."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                snapshot = json.loads(json.dumps(self._days))
+                self._dirty = False
+            try:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(snapshot, f, indent=4)
+                os.replace(tmp, self.path)
+                return True
+            except Exception as e:
+                with self._lock:
+                    self._dirty = True
+                self.logger.error(f"Error flushing daily stats to {self.path}: {e}")
+                return False
@@ -1,9 +1,9 @@
 import json
 import threading
-import pigpio
 import time
 import sys
-import RPi.GPIO as GPIO
+import signal
+import atexit
 import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1 import FieldFilter, SERVER_TIMESTAMP
@@ -13,29 +13,74 @@ import logging
 import os
 from datetime import datetime, timedelta
 import google.api_core.exceptions
-from queue import Queue
+from queue import SimpleQueue, Empty, Full
+from collections import deque, namedtuple
+from types import MappingProxyType
 from dotenv import load_dotenv
 import hashlib
 import secrets
+import base64
+import bisect
+import heapq
+import itertools
+import uuid
 
 # NEW/UPDATED imports for camera capture & upload
 import cv2
-from concurrent.futures import ThreadPoolExecutor
 
 # Use your config/uploader modules (RTSP cameras, retry configs, S3 API)
 # (These come from your uploaded files.)
 from config import RTSP_CAMERAS, MAX_RETRIES, RETRY_DELAY
 from uploader import ImageUploader
 from json_uploader import JSONUploader  # NEW: JSON base64 uploader
+from transaction_store import TransactionStore
+from daily_stats import DailyStats
+from transaction_search import TransactionSearchIndex
+from user_journal import JournaledDict
+from latency import LatencyTracker, TickClock
+from relay_controller import RelayController
+from rate_limiter import ScanRateLimiter
+from wiegand_formats import FormatTable, DEFAULT_FORMATS, parse_custom_formats
+from work_classes import (BoundedExecutor, ShedQueue, FailureBreaker, start_worker, set_switch_interval,
+                          snapshot as work_class_snapshot, CAPTURE, PERSISTENCE, UPLOAD, CLEANUP)
+from card_db import (CardDB, RosterView, build_card_db, write_card_db, card_key, make_access_entry, STATUS_GRANTED,
+                     FLAG_ALLOWED, FLAG_BLOCKED, FLAG_SKIP_PHOTO)
 
 # =========================
 # Environment / Constants
 # =========================
 load_dotenv()
 
-transaction_queue = Queue()
-image_queue = Queue()  # for background S3 uploads (non-blocking)
-json_upload_queue = Queue()  # NEW: for background JSON uploads (non-blocking)
+# SIMULATION_MODE=true swaps in the in-process pigpio/GPIO stand-ins from sim_drivers.py, so the
+# access path runs on any Linux box (see load_harness.py); Firebase is not contacted in this mode
+SIMULATION_MODE = os.environ.get("SIMULATION_MODE", "false").lower() == "true"
+if SIMULATION_MODE:
+    from sim_drivers import pigpio, GPIO
+else:
+    import pigpio
+    import RPi.GPIO as GPIO
+
+# Priority classes (work_classes.py): realtime decisions first, then capture, persistence, uploads
+# and cleanup. Each class has bounded queues and runs its threads at a lower OS priority.
+# A short GIL switch interval bounds how long a busy background thread can keep the pigpio callback waiting.
+set_switch_interval(float(os.environ.get("GIL_SWITCH_INTERVAL_MS", "1")))
+
+# Scan hand-off from the pigpio callback thread to scan_event_worker: SimpleQueue.put never
+# blocks and takes no Python-level lock, so the callback returns to pigpio right after the decision.
+# Unbounded and never shed: its rate is limited by the readers themselves.
+scan_events = SimpleQueue()
+SCAN_CONSUMER_STOP = threading.Event()
+scan_consumer_thread = None
+# Persistence: bounded, never shed - scan_event_worker waits for the writer when it is full
+transaction_queue = ShedQueue(PERSISTENCE, int(os.environ.get("TRANSACTION_QUEUE_MAX", "10000")), "transaction_queue")
+TRANSACTION_WRITER_STOP = threading.Event()
+TRANSACTIONS_COMMITTED = threading.Event()  # set by the writer after each group commit, wakes firestore_flush_worker
+transaction_writer_thread = None
+TRANSACTION_WRITE_BATCH = int(os.environ.get("TRANSACTION_WRITE_BATCH", "200"))  # Max rows per local group commit
+# Uploads: bounded and shed when full - the files stay on disk and sync_loop re-enqueues them
+UPLOAD_QUEUE_MAX = int(os.environ.get("UPLOAD_QUEUE_MAX", "500"))
+image_queue = ShedQueue(UPLOAD, UPLOAD_QUEUE_MAX, "image_queue")  # for background S3 uploads (non-blocking)
+json_upload_queue = ShedQueue(UPLOAD, UPLOAD_QUEUE_MAX, "json_upload_queue")  # NEW: for background JSON uploads (non-blocking)
 IMAGES_DIR = os.environ.get("IMAGES_DIR", "images")
 os.makedirs(IMAGES_DIR, exist_ok=True)
 
@@ -54,6 +99,11 @@ STORAGE_CHECK_INTERVAL = int(os.environ.get("STORAGE_CHECK_INTERVAL", "300"))  #
 # Transaction Retention Configuration
 TRANSACTION_RETENTION_DAYS = int(os.environ.get("TRANSACTION_RETENTION_DAYS", "120"))  # Keep transactions for 120 days locally
 
+# Firestore batching (WriteBatch is limited to 500 documents)
+FIRESTORE_BATCH_SIZE = max(1, min(500, int(os.environ.get("FIRESTORE_BATCH_SIZE", "500"))))
+FIRESTORE_FLUSH_INTERVAL = float(os.environ.get("FIRESTORE_FLUSH_INTERVAL", "2"))  # Max seconds a new transaction waits before commit
+FIRESTORE_SYNC_LOCK = threading.Lock()
+
 # GPIO Pins for Three Wiegand RFID Readers
 D0_PIN_1 = int(os.environ.get('D0_PIN_1', 18))  # Wiegand Data 0 (Reader 1 - Green)
 D1_PIN_1 = int(os.environ.get('D1_PIN_1', 23))  # Wiegand Data 1 (Reader 1 - White)
@@ -71,8 +121,11 @@ RELAY_3 = int(os.environ.get('RELAY_3', 27))  # Relay for Reader 3
 BASE_DIR = os.environ.get('BASE_DIR', '/home/maxpark')
 USER_DATA_FILE = os.path.join(BASE_DIR, "users.json")
 BLOCKED_USERS_FILE = os.path.join(BASE_DIR, "blocked_users.json")
-TRANSACTION_CACHE_FILE = os.path.join(BASE_DIR, "transactions_cache.json")
+TRANSACTION_CACHE_FILE = os.path.join(BASE_DIR, "transactions_cache.json")  # legacy JSON array (migrated on boot)
+TRANSACTION_DB_FILE = os.path.join(BASE_DIR, "transactions.db")
 DAILY_STATS_FILE = os.path.join(BASE_DIR, "daily_stats.json")
+ROSTER_VERSION_FILE = os.path.join(BASE_DIR, "roster_version.json")
+PHOTO_PREFS_FILE = os.path.join(BASE_DIR, "photo_prefs.json")  # local copy of the Firestore photo preferences
 FIREBASE_CRED_FILE = os.environ.get('FIREBASE_CRED_FILE', "service.json")
 ENTITY_ID = os.environ.get('ENTITY_ID', 'default_entity')
 
@@ -121,15 +174,19 @@ def session_cleanup_worker():
             logging.error(f"Session cleanup error: {e}")
             time.sleep(60)  # Retry in 1 minute on error
 
-def daily_stats_cleanup_worker():
-    """Background worker to clean up old daily statistics"""
+def daily_stats_worker():
+    """Background worker that flushes the in-memory daily statistics and prunes old days"""
+    last_cleanup = 0
     while True:
         try:
-            cleanup_old_daily_stats()
-            time.sleep(86400)  # Check every 24 hours
+            time.sleep(DAILY_STATS_FLUSH_INTERVAL)
+            if time.time() - last_cleanup >= 86400:  # Prune every 24 hours
+                cleanup_old_daily_stats()
+                last_cleanup = time.time()
+            daily_stats.flush()
         except Exception as e:
-            logging.error(f"Daily stats cleanup error: {e}")
-            time.sleep(3600)  # Retry in 1 hour on error
+            logging.error(f"Daily stats worker error: {e}")
+            time.sleep(60)  # Retry in 1 minute on error
 
 def hash_password(password):
     """Hash password using SHA-256"""
@@ -173,16 +230,19 @@ logging.basicConfig(filename=LOG_FILE, level=getattr(logging, LOG_LEVEL), format
 
 # Firestore
 db = None
-try:
-    cred = credentials.Certificate(FIREBASE_CRED_FILE)
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    logging.info("Firebase initialized successfully.")
-except FileNotFoundError:
-    logging.error(f"Firebase credentials file not found: {FIREBASE_CRED_FILE}")
-except Exception as e:
-    logging.error(f"Error initializing Firebase: {str(e)}")
-    db = None  # Set to None when Firebase is unavailable
+if SIMULATION_MODE:
+    logging.info("Simulation mode: Firebase disabled, transactions stay local.")
+else:
+    try:
+        cred = credentials.Certificate(FIREBASE_CRED_FILE)
+        firebase_admin.initialize_app(cred)
+        db = firestore.client()
+        logging.info("Firebase initialized successfully.")
+    except FileNotFoundError:
+        logging.error(f"Firebase credentials file not found: {FIREBASE_CRED_FILE}")
+    except Exception as e:
+        logging.error(f"Error initializing Firebase: {str(e)}")
+        db = None  # Set to None when Firebase is unavailable
 
 # GPIO Setup for Relays with error handling
 try:
@@ -198,7 +258,18 @@ except Exception as e:
     logging.error(f"Error initializing GPIO relays: {str(e)}")
     # Continue without relay functionality
 
-relay_status = 0
+def _write_relay(pin, energised):
+    """Relays are active-low: LOW opens the gate, HIGH is the closed default."""
+    if not hasattr(GPIO, 'output'):
+        logging.warning("GPIO not available. Relay operation skipped.")
+        return
+    GPIO.output(pin, GPIO.LOW if energised else GPIO.HIGH)
+
+# Per-relay modes and timed pulses: one scheduler thread releases pulses, so a grant
+# costs one GPIO write on the caller's thread and HTTP handlers never sleep on a relay
+RELAY_PULSE_SECONDS = float(os.environ.get("RELAY_PULSE_SECONDS", "1"))
+relay_controller = RelayController(_write_relay, pins=(RELAY_1, RELAY_2, RELAY_3), pulse_seconds=RELAY_PULSE_SECONDS)
+RELAY_PINS = {1: RELAY_1, 2: RELAY_2, 3: RELAY_3}
 
 # pigpio
 pi = None
@@ -214,6 +285,35 @@ except Exception as e:
     logging.error(f"Error initializing pigpio: {str(e)}")
     pi = None
 
+# Wiegand formats keyed by frame length (H10301 26, 34, Corporate 1000 35, H10304 37, plus
+# WIEGAND_CUSTOM_FORMATS); frames with an unknown length or a parity error are rejected
+WIEGAND_PARITY_CHECK = os.environ.get("WIEGAND_PARITY_CHECK", "true").lower() == "true"
+WIEGAND_FRAME_TIMEOUT_MS = int(os.environ.get("WIEGAND_FRAME_TIMEOUT_MS", "25"))
+try:
+    _custom_wiegand_formats = parse_custom_formats(os.environ.get("WIEGAND_CUSTOM_FORMATS", ""))
+except ValueError as e:
+    logging.error(f"Ignoring WIEGAND_CUSTOM_FORMATS: {e}")
+    _custom_wiegand_formats = []
+WIEGAND_FORMATS = FormatTable(list(DEFAULT_FORMATS) + _custom_wiegand_formats, check_parity=WIEGAND_PARITY_CHECK)
+# Rejected frames per reader, counted on the callback thread (no logging there) and reported by /scan_rate_stats
+rejected_frames = {}
+
+# Access-path latency: per-reader histograms of each stage, measured from the last Wiegand bit
+# (pigpio tick mapped onto the local clock by tick_clock) to decision, relay pulse, capture and enqueue
+LATENCY_SLA_MS = float(os.environ.get("LATENCY_SLA_MS", "300"))
+TICK_CLOCK_CALIBRATE_INTERVAL = int(os.environ.get("TICK_CLOCK_CALIBRATE_INTERVAL", "60"))  # must stay well under the 72 min tick wrap
+latency_tracker = LatencyTracker(sla_ms=LATENCY_SLA_MS)
+tick_clock = TickClock()
+
+def tick_clock_worker():
+    """Background worker that re-anchors pigpio ticks to the local clock (drift and tick wrap)"""
+    while True:
+        try:
+            tick_clock.calibrate(pi.get_current_tick)
+        except Exception as e:
+            logging.error(f"Tick clock calibration error: {e}")
+        time.sleep(TICK_CLOCK_CALIBRATE_INTERVAL)
+
 # =========================
 # Utilities
 # =========================
@@ -293,18 +393,90 @@ def _ts_to_epoch(ts):
     return time.time()
 
 # =========================
-# Thread-safe stores + O(1) sets for fast lookups
+# Thread-safe stores + immutable access snapshot for lock-free lookups
 # =========================
 USERS_LOCK = threading.RLock()
 BLOCKED_LOCK = threading.RLock()
-ALLOWED_SET_LOCK = threading.RLock()
-BLOCKED_SET_LOCK = threading.RLock()
-
-users = read_json_or_default(USER_DATA_FILE, {})              # dict[str_card] -> user dict
-blocked_users = read_json_or_default(BLOCKED_USERS_FILE, {})  # dict[str_card] -> bool
+ACCESS_SNAPSHOT_LOCK = threading.Lock()  # serialises snapshot writers only; readers never lock
+
+# Snapshot + change journal per roster file; single changes are one journal append
+USER_JOURNAL_COMPACT_EVERY = int(os.environ.get("USER_JOURNAL_COMPACT_EVERY", "1000"))
+USER_JOURNAL_COMPACT_INTERVAL = int(os.environ.get("USER_JOURNAL_COMPACT_INTERVAL", "300"))  # seconds; also at shutdown
+users_journal = JournaledDict(USER_DATA_FILE, compact_every=USER_JOURNAL_COMPACT_EVERY)
+blocked_journal = JournaledDict(BLOCKED_USERS_FILE, compact_every=USER_JOURNAL_COMPACT_EVERY)
+
+# Optional memory-mapped card database (card_db.py) for very large rosters: the access path
+# reads CARD_DB plus a small overlay of changes, boot maps the file instead of parsing JSON, and
+# `users` / `blocked_users` are RosterViews over it (only changes since the last rebuild in memory)
+CARD_DB_ENABLED = os.environ.get("CARD_DB_ENABLED", "false").lower() == "true"
+CARD_DB_FILE = os.path.join(BASE_DIR, "cards.mpcd")
+CARD_DB = None
+
+users = {}          # dict[str_card] -> user dict (RosterView when mapped)
+blocked_users = {}  # dict[str_card] -> bool (RosterView when mapped)
+ROSTER_READY = threading.Event()  # set once `users` / `blocked_users` are loaded
+
+# card int -> AccessEntry. Never mutated after publication: writers build a new mapping and
+# swap the reference, so handle_access does lock-free dict reads. With CARD_DB_ENABLED this only
+# holds cards changed since CARD_DB was built (removed cards become deny tombstones).
+ACCESS_SNAPSHOT = MappingProxyType({})
+ACCESS_TOMBSTONE = make_access_entry(False, False)
+# Single-card changes since ACCESS_SNAPSHOT was published, checked first by lookup_access. Only this
+# small mapping is copied per change; past ACCESS_OVERLAY_MAX entries it is folded into a new base.
+ACCESS_OVERLAY = MappingProxyType({})
+ACCESS_OVERLAY_MAX = int(os.environ.get("ACCESS_OVERLAY_MAX", "256"))
+
+# Photo preferences, cached locally so neither a scan nor a capture ever calls Firestore.
+# PHOTO_PREFS keeps the Firestore lists as-is; PHOTO_SKIP is the derived (card numbers,
+# lower-cased user names) pair folded into the access snapshot. Both are replaced, never mutated.
+PHOTO_PREFS = read_json_or_default(PHOTO_PREFS_FILE, {"card_preferences": [], "user_preferences": []})
+
+def _photo_skip_sets(prefs):
+    cards = frozenset(str(p.get("identifier")) for p in prefs.get("card_preferences", [])
+                      if p.get("identifier") and p.get("skip_photo", False))
+    names = frozenset(str(p.get("identifier")).lower() for p in prefs.get("user_preferences", [])
+                      if p.get("identifier") and p.get("skip_photo", False))
+    return cards, names
+
+PHOTO_SKIP = _photo_skip_sets(PHOTO_PREFS)
+
+# Roster generation: bumped and persisted on every roster or block-list change, so an upstream
+# source can check "in sync" with one comparison and push only the changes since its version.
+# ROSTER_ID changes if the state file is lost, so an old version number can never match by accident.
+# Derived views such as the /get_users cache also compare against ROSTER_VERSION.
+ROSTER_VERSION_LOCK = threading.Lock()
+_roster_state = read_json_or_default(ROSTER_VERSION_FILE, {})
+ROSTER_ID = _roster_state.get("roster_id") or uuid.uuid4().hex[:12]
+ROSTER_VERSION = int(_roster_state.get("version", 0))
+if _roster_state.get("roster_id") != ROSTER_ID:
+    atomic_write_json(ROSTER_VERSION_FILE, {"roster_id": ROSTER_ID, "version": ROSTER_VERSION})
+
+class RosterVersionConflict(Exception):
+    """A versioned batch was based on a roster version other than the current one."""
+
+def _bump_roster_version():
+    """
+    Advance and persist the roster version. Called by every mutation before it is journalled,
+    so after a crash the stored version can only be ahead of the data (forcing a resync), never behind.
+    """
+    global ROSTER_VERSION
+    with ROSTER_VERSION_LOCK:
+        version = ROSTER_VERSION + 1
+        try:
+            tmp = f"{ROSTER_VERSION_FILE}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"roster_id": ROSTER_ID, "version": version}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, ROSTER_VERSION_FILE)
+        except Exception as e:
+            logging.error(f"Error saving roster version: {e}")
+        ROSTER_VERSION = version
+        return version
 
-ALLOWED_SET = set()  # set[int]
-BLOCKED_SET = set()  # set[int]
+# Secondary indexes maintained with `users` under USERS_LOCK: user id / ref_id -> set of card numbers
+USERS_BY_ID = {}
+USERS_BY_REF_ID = {}
 
 def _card_str_to_int(card_str: str):
     try:
@@ -312,208 +484,660 @@ def _card_str_to_int(card_str: str):
     except Exception:
         return None
 
-def _rebuild_allowed_set_from_users_dict(u: dict):
-    global ALLOWED_SET
-    with ALLOWED_SET_LOCK:
-        ALLOWED_SET = set()
-        for k in u.keys():
-            ci = _card_str_to_int(k)
+def _skips_photo(card_str, name, skip_sets=None):
+    skip_cards, skip_names = PHOTO_SKIP if skip_sets is None else skip_sets
+    return card_str in skip_cards or (name is not None and name.lower() in skip_names)
+
+def _access_entry(card_str, u=None, b=None, skip_sets=None):
+    """Decision record for one card from the roster dicts and photo preferences, or None if there is nothing to record."""
+    user = (users if u is None else u).get(card_str)
+    is_blocked = bool((blocked_users if b is None else b).get(card_str, False))
+    name = user.get("name", "Unknown") if user else None
+    skip_photo = _skips_photo(card_str, name, skip_sets)
+    if user is None and not is_blocked and not skip_photo:
+        return None
+    return make_access_entry(user is not None, is_blocked, name or "Unknown", skip_photo)
+
+def lookup_access(card_int):
+    """Lock-free access decision data for a card (None if unknown)."""
+    # Overlay before base: writers publish a folded base before emptying the overlay
+    entry = ACCESS_OVERLAY.get(card_int)
+    if entry is None:
+        entry = ACCESS_SNAPSHOT.get(card_int)
+        if entry is None:
+            card_db = CARD_DB
+            if card_db is not None:
+                return card_db.get(card_int)
+    return entry
+
+def _roster_mapped():
+    """True once the rosters are RosterViews over CARD_DB (CARD_DB_ENABLED) instead of plain dicts."""
+    return isinstance(users, RosterView)
+
+def _index_user(card_str, user):
+    if _roster_mapped():
+        return  # find_users reads the card DB indexes
+    for index, key in ((USERS_BY_ID, user.get("id")), (USERS_BY_REF_ID, user.get("ref_id"))):
+        if key:
+            index.setdefault(str(key), set()).add(card_str)
+
+def _unindex_user(card_str, user):
+    if _roster_mapped():
+        return
+    for index, key in ((USERS_BY_ID, user.get("id")), (USERS_BY_REF_ID, user.get("ref_id"))):
+        cards = index.get(str(key)) if key else None
+        if cards is not None:
+            cards.discard(card_str)
+            if not cards:
+                del index[str(key)]
+
+def _rebuild_user_indexes():
+    """Rebuild the id / ref_id indexes from `users`. Call with USERS_LOCK held."""
+    USERS_BY_ID.clear()
+    USERS_BY_REF_ID.clear()
+    if _roster_mapped():
+        return
+    for card_str, user in users.items():
+        _index_user(card_str, user)
+
+def find_users(user_id=None, ref_id=None, card_number=None):
+    """Users matching an id, ref_id or card number via the indexes (no scan of the roster)."""
+    ROSTER_READY.wait()
+    with USERS_LOCK:
+        if card_number:
+            return [users[card_number]] if card_number in users else []
+        if _roster_mapped():
+            field, key = ("id", user_id) if user_id else ("ref_id", ref_id)
+            return [users[c] for c in users.find(field, key)] if key else []
+        index, key = (USERS_BY_ID, user_id) if user_id else (USERS_BY_REF_ID, ref_id)
+        cards = sorted(index.get(str(key), ())) if key else []
+        return [users[c] for c in cards if c in users]
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return "-"
+
+def _roster_stamp():
+    """Identity of the on-disk roster snapshots; a card DB is only trusted at boot if it matches."""
+    return "|".join(_file_stamp(path) for path in (USER_DATA_FILE, BLOCKED_USERS_FILE, PHOTO_PREFS_FILE))
+
+def publish_access_snapshot():
+    """
+    Rebuild the access snapshot from the roster dicts and publish it. With CARD_DB_ENABLED
+    (boot without a usable card DB) the card DB is built instead and the rosters are mapped onto it.
+    """
+    global ACCESS_SNAPSHOT, ACCESS_OVERLAY, _card_db_skip
+    with ACCESS_SNAPSHOT_LOCK:
+        u, b, skip_sets = dict(users), dict(blocked_users), PHOTO_SKIP
+        snapshot = {}
+        db_entries = []
+        for card_str in set(u) | set(b) | skip_sets[0]:
+            ci = _card_str_to_int(card_str)
+            entry = _access_entry(card_str, u, b, skip_sets)
+            if ci is None or entry is None:
+                continue
+            if CARD_DB_ENABLED and card_key(card_str) is not None:
+                db_entries.append((ci, entry, u.get(card_str)))
+            else:
+                snapshot[ci] = entry
+        if CARD_DB_ENABLED:
+            # Cards the DB can't hold stay in the views; such a DB is never reused at boot (empty stamp)
+            build_card_db(CARD_DB_FILE, db_entries, stamp="" if snapshot else _roster_stamp())
+            _map_roster(CardDB(CARD_DB_FILE),
+                        {k: v for k, v in u.items() if card_key(k) is None},
+                        {k: v for k, v in b.items() if card_key(k) is None})
+            _card_db_skip = skip_sets
+            return
+        ACCESS_SNAPSHOT = MappingProxyType(snapshot)
+        ACCESS_OVERLAY = MappingProxyType({})
+
+def _map_roster(card_db, user_changes, blocked_changes):
+    """
+    Serve the rosters from card_db: `users` / `blocked_users` become RosterViews with the given
+    changes on top, and the access snapshot holds entries for exactly those cards.
+    Call with ACCESS_SNAPSHOT_LOCK held (and the roster locks once the app is running).
+    """
+    global CARD_DB, users, blocked_users, ACCESS_SNAPSHOT, ACCESS_OVERLAY
+    u = RosterView(card_db, "users", user_changes)
+    b = RosterView(card_db, "blocked", blocked_changes)
+    snapshot = {}
+    for card_str in set(u.changes) | set(b.changes) | {c for c in PHOTO_SKIP[0] if card_key(c) is None}:
+        ci = _card_str_to_int(card_str)
+        if ci is not None:
+            snapshot[ci] = _access_entry(card_str, u, b) or ACCESS_TOMBSTONE
+    # DB first: until the snapshot swap, every card changed since the old DB is still shadowed
+    CARD_DB = card_db
+    users, blocked_users = u, b
+    USERS_BY_ID.clear()
+    USERS_BY_REF_ID.clear()
+    ACCESS_SNAPSHOT = MappingProxyType(snapshot)
+    ACCESS_OVERLAY = MappingProxyType({})
+
+def _patch_access_snapshot(card_strs):
+    """Publish refreshed entries for changed cards in the overlay; fold it into the base when full."""
+    global ACCESS_SNAPSHOT, ACCESS_OVERLAY
+    with ACCESS_SNAPSHOT_LOCK:
+        overlay = dict(ACCESS_OVERLAY)
+        for card_str in card_strs:
+            ci = _card_str_to_int(card_str)
             if ci is not None:
-                ALLOWED_SET.add(ci)
-
-def _rebuild_blocked_set_from_dict(b: dict):
-    global BLOCKED_SET
-    with BLOCKED_SET_LOCK:
-        BLOCKED_SET = set()
-        for k, v in b.items():
-            if v:
-                ci = _card_str_to_int(k)
-                if ci is not None:
-                    BLOCKED_SET.add(ci)
-
-def load_local_users():
-    """Load users from disk into memory and refresh the ALLOWED_SET."""
-    global users
+                # Removed cards stay in the overlay as tombstones so they shadow the base
+                overlay[ci] = _access_entry(card_str) or ACCESS_TOMBSTONE
+        if len(overlay) < ACCESS_OVERLAY_MAX:
+            ACCESS_OVERLAY = MappingProxyType(overlay)
+            return
+        snapshot = dict(ACCESS_SNAPSHOT)
+        snapshot.update(overlay)
+        if CARD_DB is None:
+            # Nothing underneath to shadow: unknown cards are simply absent
+            for card_int, entry in overlay.items():
+                if entry is ACCESS_TOMBSTONE:
+                    del snapshot[card_int]
+        ACCESS_SNAPSHOT = MappingProxyType(snapshot)
+        ACCESS_OVERLAY = MappingProxyType({})
+
+# Set when a roster journal is due for compaction but the rosters are mapped: compaction
+# rewrites the card DB too, so it runs on roster_compact_worker instead of the caller
+ROSTER_COMPACT_DUE = threading.Event()
+CARD_DB_REBUILD_LOCK = threading.Lock()  # one rebuild at a time; never taken while holding the roster locks
+_card_db_skip = None  # PHOTO_SKIP the current CARD_DB was built with
+
+def _journal_change(journal, data, card_number, value):
+    """Journal one change (value None = delete), compacting when due, then refresh the access snapshot."""
+    _bump_roster_version()
+    compact_due = journal.delete(card_number) if value is None else journal.put(card_number, value)
+    if compact_due:
+        if _roster_mapped():
+            ROSTER_COMPACT_DUE.set()
+        else:
+            journal.compact(data)
+    _patch_access_snapshot([card_number])
+
+def _merged_card_rows(card_db, u, b, skip_sets):
+    """card_db rows with the views' changes and the photo preferences applied, in card order (write_card_db input)."""
+    skip_cards, skip_names = skip_sets
+    changed = sorted({ci for ci in map(card_key, set(u.changes) | set(b.changes) | skip_cards) if ci is not None})
+    rows = card_db.rows()
+    row = next(rows, None)
+    for ci in changed + [None]:
+        # Unchanged cards keep their encoded record; only the photo flag is re-derived
+        while row is not None and (ci is None or row[0] < ci):
+            card_int, flags, raw = row
+            flags &= ~FLAG_SKIP_PHOTO
+            if flags & FLAG_ALLOWED and skip_names and raw:
+                if json.loads(raw.decode("utf-8")).get("name", "Unknown").lower() in skip_names:
+                    flags |= FLAG_SKIP_PHOTO
+            if flags:
+                yield card_int, flags, raw
+            row = next(rows, None)
+        if ci is None:
+            break
+        if row is not None and row[0] == ci:
+            row = next(rows, None)
+        card_str = str(ci)
+        user = u.get(card_str)
+        flags = ((FLAG_ALLOWED if user is not None else 0) | (FLAG_BLOCKED if card_str in b else 0)
+                 | (FLAG_SKIP_PHOTO if _skips_photo(card_str, user.get("name", "Unknown") if user else None, skip_sets) else 0))
+        if flags:
+            yield ci, flags, json.dumps(user, separators=(",", ":")).encode("utf-8") if user else b""
+
+def rebuild_card_db():
+    """
+    Fold the roster changes into users.json / blocked_users.json and a new card DB, then swap it in.
+    Only copying the changes and rotating the journals happen under the roster locks; the files are
+    written from that copy while scans and roster changes carry on (those go to the new journals
+    and the overlay, and stay in the views after the swap). Returns True if anything was rebuilt.
+    """
+    global _card_db_skip
+    journals = (users_journal, blocked_journal)
+    with CARD_DB_REBUILD_LOCK:
+        with USERS_LOCK, BLOCKED_LOCK:
+            u, b, skip_sets = users.copy(), blocked_users.copy(), PHOTO_SKIP
+            due = (skip_sets is not _card_db_skip
+                   or any(card_key(k) is not None for k in itertools.chain(u.changes, b.changes))
+                   or any(j.pending or os.path.exists(j.rotated_path) or not os.path.exists(j.snapshot_path)
+                          for j in journals))
+            if not due:
+                return False
+            prefs_stamp = _file_stamp(PHOTO_PREFS_FILE)
+            for journal in journals:
+                journal.rotate()
+
+        users_journal.compact_rotated(u)
+        blocked_journal.compact_rotated(b)
+        # Cards the DB can't hold stay in the views; such a DB is never reused at boot (empty stamp)
+        leftover = any(card_key(k) is None and v is not None for k, v in itertools.chain(u.changes.items(), b.changes.items()))
+        stamp = "" if leftover else "|".join((_file_stamp(USER_DATA_FILE), _file_stamp(BLOCKED_USERS_FILE), prefs_stamp))
+        write_card_db(CARD_DB_FILE, _merged_card_rows(u.card_db, u, b, skip_sets), stamp=stamp)
+        card_db = CardDB(CARD_DB_FILE)
+
+        with USERS_LOCK, BLOCKED_LOCK, ACCESS_SNAPSHOT_LOCK:
+            # Keep the changes made since the copy (and the cards the DB can't hold)
+            changes = []
+            for view, copied in ((users, u), (blocked_users, b)):
+                changes.append({k: v for k, v in view.changes.items()
+                                if k not in copied.changes or copied.changes[k] != v
+                                or (card_key(k) is None and v is not None)})
+            _map_roster(card_db, *changes)
+            _card_db_skip = skip_sets
+    logging.info(f"Card database rebuilt: {len(card_db)} cards")
+    return True
+
+def compact_roster_journals():
+    """
+    Fold pending journal entries into users.json / blocked_users.json (and write them if missing),
+    so the plain snapshot files other tools read stay current. Returns True if anything was written.
+    """
+    if not ROSTER_READY.is_set():
+        return False
+    if _roster_mapped():
+        return rebuild_card_db()
+    compacted = False
+    with USERS_LOCK, BLOCKED_LOCK:
+        for journal, data in ((users_journal, users), (blocked_journal, blocked_users)):
+            if journal.pending or not os.path.exists(journal.snapshot_path):
+                journal.compact(data)
+                compacted = True
+    return compacted
+
+def roster_compact_worker():
+    """Background worker that compacts the roster journals every USER_JOURNAL_COMPACT_INTERVAL (sooner when due)"""
+    while True:
+        try:
+            ROSTER_COMPACT_DUE.wait(USER_JOURNAL_COMPACT_INTERVAL)
+            ROSTER_COMPACT_DUE.clear()
+            if compact_roster_journals():
+                logging.debug("Roster journals compacted")
+        except Exception as e:
+            logging.error(f"Roster compaction error: {e}")
+            time.sleep(60)  # Retry in 1 minute on error
+
+# Name-sorted /get_users rows, rebuilt only when ROSTER_VERSION moves: (version, rows, sort keys)
+USERS_VIEW_LOCK = threading.Lock()
+_users_view = None
+
+def _user_sort_key(row):
+    return (row["name"].lower(), row["card_number"])
+
+def _user_row(card_number, user_data, blocked):
+    return {
+        "card_number": card_number,
+        "id": user_data.get("id", ""),
+        "name": user_data.get("name", ""),
+        "ref_id": user_data.get("ref_id", ""),
+        "blocked": blocked
+    }
+
+def get_users_view():
+    """Cached, name-sorted user rows with blocked status; rebuilt once per roster change."""
+    global _users_view
+    view = _users_view
+    version = ROSTER_VERSION  # read before building so a concurrent change forces a rebuild next time
+    if view is not None and view[0] == version:
+        return view
+    with USERS_VIEW_LOCK:
+        view = _users_view
+        if view is not None and view[0] == version:
+            return view
+        users_data = get_local_users()
+        blocked_data = get_blocked_users()
+        rows = [_user_row(card_number, user_data, blocked_data.get(card_number, False))
+                for card_number, user_data in users_data.items()]
+        rows.sort(key=_user_sort_key)
+        _users_view = (version, rows, [_user_sort_key(r) for r in rows])
+        return _users_view
+
+def user_rows_from(after=None):
+    """
+    (roster version, user count, iterator of name-sorted user rows after the sort key `after`, or all rows).
+    Mapped rosters merge the card DB name index with the changes on top, so the roster is never
+    materialised; otherwise rows come from the cached view.
+    """
+    if not _roster_mapped():
+        version, rows, keys = get_users_view()
+        return version, len(rows), itertools.islice(rows, bisect.bisect_right(keys, after) if after is not None else 0, None)
+    ROSTER_READY.wait()
+    with USERS_LOCK, BLOCKED_LOCK:
+        version, u, b = ROSTER_VERSION, users.copy(), blocked_users.copy()
+    changed = sorted((_user_row(k, v, k in b) for k, v in u.changes.items() if v is not None), key=_user_sort_key)
+    if after is not None:
+        changed = [r for r in changed if _user_sort_key(r) > after]
+    base = (_user_row(k, v, k in b) for k, v in u.card_db.by_name(after) if k not in u.changes)
+    return version, len(u), heapq.merge(base, changed, key=_user_sort_key)
+
+def load_roster():
+    """Load users and the block list (snapshot + journal) into memory and build the id indexes."""
+    global users, blocked_users
+    with USERS_LOCK, BLOCKED_LOCK:
+        users = users_journal.load()
+        blocked_users = blocked_journal.load()
+        _rebuild_user_indexes()
+    ROSTER_READY.set()
+    logging.info(f"Roster loaded: {len(users)} users, {len(blocked_users)} blocked")
+
+def get_local_users():
+    """Copy of the in-memory roster (no disk access)."""
+    ROSTER_READY.wait()
     with USERS_LOCK:
-        users = read_json_or_default(USER_DATA_FILE, {})
-        _rebuild_allowed_set_from_users_dict(users)
         return dict(users)
 
-def save_local_users(new_users):
-    """Persist users and refresh the ALLOWED_SET."""
-    global users
+def upsert_user(card_number, user_data):
+    """Add or replace one user: one dict update, one journal append, one snapshot swap."""
+    ROSTER_READY.wait()
     with USERS_LOCK:
-        users = dict(new_users)
-        atomic_write_json(USER_DATA_FILE, users)
-        _rebuild_allowed_set_from_users_dict(users)
-
-def load_blocked_users():
-    """Load blocked users from disk into memory and refresh the BLOCKED_SET."""
-    global blocked_users
+        previous = users.get(card_number)
+        if previous is not None:
+            _unindex_user(card_number, previous)
+        users[card_number] = user_data
+        _index_user(card_number, user_data)
+        _journal_change(users_journal, users, card_number, user_data)
+
+def remove_user(card_number):
+    """Delete one user; returns the removed user dict or None if unknown."""
+    ROSTER_READY.wait()
+    with USERS_LOCK:
+        removed = users.pop(card_number, None)
+        if removed is None:
+            return None
+        _unindex_user(card_number, removed)
+        _journal_change(users_journal, users, card_number, None)
+    return removed
+
+def get_blocked_users():
+    """Copy of the in-memory block list (no disk access)."""
+    ROSTER_READY.wait()
     with BLOCKED_LOCK:
-        blocked_users = read_json_or_default(BLOCKED_USERS_FILE, {})
-        _rebuild_blocked_set_from_dict(blocked_users)
         return dict(blocked_users)
 
-def save_blocked_users(new_blocked):
-    """Persist blocked users and refresh the BLOCKED_SET."""
-    global blocked_users
+def block_card(card_number):
+    """Block one card: one dict update, one journal append, one snapshot swap."""
+    ROSTER_READY.wait()
     with BLOCKED_LOCK:
-        blocked_users = dict(new_blocked)
-        atomic_write_json(BLOCKED_USERS_FILE, blocked_users)
-        _rebuild_blocked_set_from_dict(blocked_users)
-
-def cache_transaction(transaction):
-    """Stores transactions locally when internet is unavailable."""
-    txns = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-    txns.append(transaction)
-    atomic_write_json(TRANSACTION_CACHE_FILE, txns)
-
-def update_daily_stats(status):
-    """Update daily statistics for access attempts."""
-    try:
-        today = datetime.now().strftime('%Y-%m-%d')
-        stats = read_json_or_default(DAILY_STATS_FILE, {})
-        
-        if today not in stats:
-            stats[today] = {
-                'date': today,
-                'valid_entries': 0,
-                'invalid_entries': 0,
-                'blocked_entries': 0
-            }
-        
-        if status == 'Access Granted':
-            stats[today]['valid_entries'] += 1
-        elif status == 'Access Denied':
-            stats[today]['invalid_entries'] += 1
-        elif status == 'Blocked':
-            stats[today]['blocked_entries'] += 1
-        
-        atomic_write_json(DAILY_STATS_FILE, stats)
-        
-        # Clean up old stats (keep only 20 days)
-        cleanup_old_daily_stats()
-        
+        blocked_users[card_number] = True
+        _journal_change(blocked_journal, blocked_users, card_number, True)
+
+def unblock_card(card_number):
+    """Unblock one card; returns False if it was not blocked."""
+    ROSTER_READY.wait()
+    with BLOCKED_LOCK:
+        if card_number not in blocked_users:
+            return False
+        blocked_users.pop(card_number, None)
+        _journal_change(blocked_journal, blocked_users, card_number, None)
+    return True
+
+def _persist_batch(journal, data, touched, replace):
+    """One persist per batch: a single journal append, or a fresh snapshot for large/replace batches."""
+    mapped = _roster_mapped()
+    if not mapped and (replace or len(touched) >= journal.compact_every):
+        journal.compact(data)
+        return
+    puts = {k: data[k] for k in touched if k in data}
+    deletes = [k for k in touched if k not in data]
+    if journal.record_many(puts=puts, deletes=deletes) or replace:
+        if mapped:
+            ROSTER_COMPACT_DUE.set()
+        else:
+            journal.compact(data)
+
+def apply_roster_batch(ops, replace=False, since=None):
+    """
+    Apply an ordered list of validated roster operations as one batch.
+    ops: (op, card_number, user_data) with op in upsert/delete/block/unblock.
+    replace=True makes the batch's upserts the complete roster (full sync).
+    since: roster version the batch was computed against; RosterVersionConflict is raised
+    (and nothing applied) unless it is the current version. Ignored for replace batches.
+    Each roster is copied, updated, persisted once and swapped in; the access snapshot is rebuilt once
+    (mapped rosters: only the touched cards are republished and the card DB is rebuilt in the background).
+    Returns per-operation counts.
+    """
+    global users, blocked_users
+    ROSTER_READY.wait()
+    counts = {"upserted": 0, "deleted": 0, "blocked": 0, "unblocked": 0}
+    user_ops = [op for op in ops if op[0] in ("upsert", "delete")]
+    block_ops = [op for op in ops if op[0] in ("block", "unblock")]
+
+    # Every mutation holds USERS_LOCK or BLOCKED_LOCK, so the version cannot move under both
+    with USERS_LOCK, BLOCKED_LOCK:
+        if since is not None and not replace and since != ROSTER_VERSION:
+            raise RosterVersionConflict(f"Batch is based on version {since}, roster is at {ROSTER_VERSION}")
+        if not ops and not replace:
+            return counts
+        _bump_roster_version()
+        mapped = _roster_mapped()
+        all_touched = set()
+
+        if user_ops or replace:
+            touched = set()
+            if mapped:
+                # Views copy only their changes; a replace deletes every current card first
+                new_users = users.copy()
+                if replace:
+                    touched.update(new_users)
+                    for card_number in touched:
+                        del new_users[card_number]
+            else:
+                new_users = {} if replace else dict(users)
+            for op, card_number, user_data in user_ops:
+                if op == "upsert":
+                    new_users[card_number] = user_data
+                    counts["upserted"] += 1
+                elif new_users.pop(card_number, None) is not None:
+                    counts["deleted"] += 1
+                touched.add(card_number)
+            _persist_batch(users_journal, new_users, touched, replace)
+            users = new_users
+            _rebuild_user_indexes()
+            all_touched |= touched
+
+        if block_ops:
+            new_blocked = blocked_users.copy() if mapped else dict(blocked_users)
+            touched = set()
+            for op, card_number, _ in block_ops:
+                if op == "block":
+                    new_blocked[card_number] = True
+                    counts["blocked"] += 1
+                elif new_blocked.pop(card_number, None) is not None:
+                    counts["unblocked"] += 1
+                touched.add(card_number)
+            _persist_batch(blocked_journal, new_blocked, touched, False)
+            blocked_users = new_blocked
+            all_touched |= touched
+
+        if mapped:
+            _patch_access_snapshot(all_touched)
+        else:
+            publish_access_snapshot()
+
+    return counts
+
+def set_photo_preferences(card_preferences, user_preferences):
+    """Replace the cached photo preferences, persist them locally and republish the access snapshot."""
+    global PHOTO_PREFS, PHOTO_SKIP
+    prefs = {"card_preferences": list(card_preferences), "user_preferences": list(user_preferences)}
+    if prefs == PHOTO_PREFS:
+        return False
+    ROSTER_READY.wait()
+    with USERS_LOCK, BLOCKED_LOCK:
+        atomic_write_json(PHOTO_PREFS_FILE, prefs)
+        PHOTO_PREFS = prefs
+        PHOTO_SKIP = _photo_skip_sets(prefs)
+        mapped = _roster_mapped()
+        if not mapped:
+            publish_access_snapshot()
+    if mapped:
+        # The skip flags are stored in the card DB: rebuild it (outside the roster locks)
+        rebuild_card_db()
+    return True
+
+def _open_card_db_for_boot():
+    """
+    Fast boot path: map an up-to-date card DB and serve the rosters from it, with the journalled
+    changes made since it was built on top. Returns False (caller loads and builds it) if missing or stale.
+    """
+    global _card_db_skip
+    if not CARD_DB_ENABLED or not os.path.exists(CARD_DB_FILE):
+        return False
+    try:
+        card_db = CardDB(CARD_DB_FILE)
+    except Exception as e:
+        logging.error(f"Error opening card database {CARD_DB_FILE}: {e}")
+        return False
+    if not card_db.stamp or card_db.stamp != _roster_stamp():
+        card_db.close()
+        return False
+    with ACCESS_SNAPSHOT_LOCK:
+        _map_roster(card_db, users_journal.final_state(), blocked_journal.final_state())
+    _card_db_skip = PHOTO_SKIP
+    return True
+
+if _open_card_db_for_boot():
+    # Rosters and access decisions are served from the mapped DB right away; nothing is parsed
+    ROSTER_READY.set()
+    logging.info(f"Card database mapped: {len(CARD_DB)} cards, {len(ACCESS_SNAPSHOT)} journalled changes")
+else:
+    load_roster()
+    publish_access_snapshot()
+
+# Indexed SQLite transaction store (WAL) - all dashboard reads are range / top-N queries
+transaction_store = TransactionStore(
+    TRANSACTION_DB_FILE,
+    legacy_paths=(TRANSACTION_CACHE_FILE,)
+)
+
+# In-memory name/card index for /search_user_transactions. Rows up to SEARCH_INDEX_BASE_SEQ are
+# bulk-loaded by build_search_index() at startup; everything newer is added by cache_transactions().
+search_index = TransactionSearchIndex()
+SEARCH_INDEX_BASE_SEQ = transaction_store.last_seq
+
+def build_search_index():
+    """Background startup task: load existing transactions into the search index."""
+    try:
+        search_index.build(transaction_store.iter_search_rows(SEARCH_INDEX_BASE_SEQ))
+    except Exception as e:
+        logging.error(f"Error building transaction search index: {e}")
+
+def cache_transactions(transactions):
+    """Store a batch of transactions locally in one SQLite commit and index them. Returns their sequence ids."""
+    seqs = transaction_store.add_many(transactions)
+    try:
+        for seq, tx in zip(seqs, transactions):
+            search_index.add(seq, tx.get("timestamp", 0), tx.get("card"), tx.get("name"))
+    except Exception as e:
+        logging.error(f"Error indexing transactions: {e}")
+    return seqs
+
+def _firestore_payload(txn):
+    """Strip local-only fields (row id, sync flag) before uploading to Firestore."""
+    return {k: v for k, v in txn.items() if k not in ("id", "synced_to_firestore")}
+
+def _firestore_doc_id(txn):
+    """Stable Firestore document id for a cached transaction (entity + store + sequence)."""
+    return f"{ENTITY_ID}_{transaction_store.store_id}_{txn['id']}"
+
+def _format_cached_transaction(tx):
+    """Shape a cached transaction row for the dashboard/API responses."""
+    return {
+        "card_number": tx.get("card", "N/A"),
+        "name": tx.get("name", "Unknown"),
+        "status": tx.get("status", "Unknown"),
+        "timestamp": _ts_to_epoch(tx.get("timestamp", None)),
+        "reader": tx.get("reader", "Unknown"),
+        "entity_id": tx.get("entity_id", ENTITY_ID),
+        "source": "local_cache"
+    }
+
+# In-memory daily counters; the scan path only increments, a worker flushes to DAILY_STATS_FILE
+DAILY_STATS_RETENTION_DAYS = 20
+DAILY_STATS_FLUSH_INTERVAL = int(os.environ.get("DAILY_STATS_FLUSH_INTERVAL", "30"))  # Seconds between flushes
+daily_stats = DailyStats(DAILY_STATS_FILE, retention_days=DAILY_STATS_RETENTION_DAYS)
+
+def update_daily_stats(status, reader_id=None):
+    """Update daily statistics for access attempts (memory only - no file I/O on the scan path)."""
+    try:
+        daily_stats.record(status, reader_id)
     except Exception as e:
         logging.error(f"Error updating daily stats: {e}")
 
 def cleanup_old_daily_stats():
-    """Remove daily statistics older than 20 days."""
+    """Remove daily statistics older than 20 days. Returns the number of days removed."""
     try:
-        stats = read_json_or_default(DAILY_STATS_FILE, {})
-        cutoff_date = datetime.now() - timedelta(days=20)
-        cutoff_str = cutoff_date.strftime('%Y-%m-%d')
-        
-        old_dates = [date for date in stats.keys() if date < cutoff_str]
-        for date in old_dates:
-            del stats[date]
-        
-        if old_dates:
-            atomic_write_json(DAILY_STATS_FILE, stats)
-            logging.info(f"Cleaned up {len(old_dates)} old daily statistics")
-            
+        removed = daily_stats.prune()
+        if removed:
+            daily_stats.flush()
+            logging.info(f"Cleaned up {removed} old daily statistics")
+        return removed
     except Exception as e:
         logging.error(f"Error cleaning up daily stats: {e}")
+        return 0
 
 def get_daily_stats():
-    """Get daily statistics for the last 20 days."""
+    """Get daily statistics for the last 20 days (oldest first), served from memory."""
     try:
-        stats = read_json_or_default(DAILY_STATS_FILE, {})
-        
-        # Generate last 20 days
-        today = datetime.now()
-        last_20_days = []
-        
-        for i in range(20):
-            date = today - timedelta(days=i)
-            date_str = date.strftime('%Y-%m-%d')
-            
-            if date_str in stats:
-                last_20_days.append(stats[date_str])
-            else:
-                last_20_days.append({
-                    'date': date_str,
-                    'valid_entries': 0,
-                    'invalid_entries': 0,
-                    'blocked_entries': 0
-                })
-        
-        # Sort by date (oldest first)
-        last_20_days.sort(key=lambda x: x['date'])
-        
-        return last_20_days
-        
+        return daily_stats.last_days(DAILY_STATS_RETENTION_DAYS)
     except Exception as e:
         logging.error(f"Error getting daily stats: {e}")
         return []
 
+def commit_unsynced_transactions():
+    """
+    Push unsynced cached transactions to Firestore using WriteBatch commits of up to
+    FIRESTORE_BATCH_SIZE documents, with ONE local sync-state update per committed batch.
+    Pending work is everything after the store's last_synced_seq cursor; document ids are
+    derived from the sequence id so a batch retried after a crash overwrites, not duplicates.
+    Serialized by FIRESTORE_SYNC_LOCK so the uploader and sync_loop never double-upload.
+    Returns (synced_count, failed_count).
+    """
+    synced_count = 0
+    with FIRESTORE_SYNC_LOCK:
+        while True:
+            batch_txns = transaction_store.unsynced(limit=FIRESTORE_BATCH_SIZE)
+            if not batch_txns:
+                break
+            try:
+                batch = db.batch()
+                for txn in batch_txns:
+                    # Remove local-only fields before uploading (internal use only)
+                    upload_data = _firestore_payload(txn)
+                    # Add SERVER_TIMESTAMP as "created_at" (only for Firestore, not local cache)
+                    upload_data["created_at"] = SERVER_TIMESTAMP
+                    # Flat structure with entity_id, idempotent document id per sequence
+                    batch.set(db.collection("transactions").document(_firestore_doc_id(txn)), upload_data)
+                batch.commit()
+            except google.api_core.exceptions.DeadlineExceeded:
+                logging.warning(f"Firestore timeout committing batch of {len(batch_txns)} transactions")
+                return synced_count, len(batch_txns)
+            except Exception as e:
+                logging.error(f"Error committing Firestore batch of {len(batch_txns)} transactions: {str(e)}")
+                return synced_count, len(batch_txns)
+
+            # Advance the high-water mark past the whole committed batch in one local update
+            mark_transactions_synced(batch_txns[-1]["id"])
+            synced_count += len(batch_txns)
+            logging.info(f"Committed {len(batch_txns)} transactions to Firestore in one batch")
+    return synced_count, 0
+
 def sync_transactions():
     """
     Syncs unsynced transactions with Firebase when internet is restored.
     Only uploads transactions where synced_to_firestore = False.
     This prevents duplicate uploads while ensuring all transactions reach Firestore.
     """
-    if not os.path.exists(TRANSACTION_CACHE_FILE):
-        logging.debug("No transaction cache file to sync")
-        return
     if not (is_internet_available() and db is not None):
         logging.debug("Cannot sync: No internet or Firebase unavailable")
         return
     
     try:
-        txns = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        if not txns:
-            logging.debug("No transactions in cache")
-            return
-
-        # Filter ONLY transactions that haven't been synced yet
-        unsynced_txns = [tx for tx in txns if not tx.get("synced_to_firestore", False)]
-        
-        if not unsynced_txns:
+        pending_count = transaction_store.count_unsynced()
+        if not pending_count:
             logging.debug("All transactions already synced to Firestore")
             return
         
-        logging.info(f"Found {len(unsynced_txns)} unsynced transactions to upload")
-        
-        batch_size = 10
-        idx = 0
-        synced_count = 0
-        failed_count = 0
-        
-        while idx < len(unsynced_txns):
-            batch = unsynced_txns[idx:idx + batch_size]
-            for txn in batch:
-                try:
-                    # Ensure new schema keys for consistency
-                    if "card_number" in txn and "card" not in txn:
-                        txn["card"] = txn.get("card_number")
-                        txn.pop("card_number", None)
-                    
-                    # Remove sync flag before uploading (internal use only)
-                    upload_data = {k: v for k, v in txn.items() if k != "synced_to_firestore"}
-                    
-                    # Add SERVER_TIMESTAMP as "created_at" (only for Firestore, not local cache)
-                    upload_data["created_at"] = SERVER_TIMESTAMP
-                    
-                    # Upload to Firestore (flat structure with entity_id)
-                    db.collection("transactions").add(upload_data)
-                    synced_count += 1
-                    
-                    # Mark as synced in cache
-                    mark_transaction_synced(txn.get("timestamp"))
-                    
-                    logging.info(f"Synced transaction to Firestore: {txn.get('card', 'unknown')} (timestamp: {txn.get('timestamp')})")
-                    
-                except google.api_core.exceptions.DeadlineExceeded:
-                    logging.warning(f"Firestore timeout during sync for card: {txn.get('card', 'unknown')}")
-                    failed_count += 1
-                except Exception as e:
-                    logging.error(f"Error syncing transaction {txn.get('card', 'unknown')}: {str(e)}")
-                    failed_count += 1
-                    
-            idx += batch_size
-            time.sleep(1)  # Rate limiting between batches
+        logging.info(f"Found {pending_count} unsynced transactions to upload")
+        synced_count, failed_count = commit_unsynced_transactions()
         
         # KEEP the cache file for offline access and dashboard display
         logging.info(f"Sync complete: {synced_count} uploaded, {failed_count} failed. Local cache preserved.")
@@ -522,24 +1146,60 @@ def sync_transactions():
         logging.error(f"Error syncing transactions: {str(e)}")
 
 # =========================
-# Rate Limiter (thread-safe, keyed by int card)
+# Rate Limiter (thread-safe, per-reader windows, expiring entries)
 # =========================
-class ScanRateLimiter:
-    def __init__(self, delay_seconds=60):
-        self.last_seen = {}
-        self.delay = delay_seconds
+def _reader_scan_delays():
+    """SCAN_DELAY_SECONDS_READER_N overrides; blank means the reader uses SCAN_DELAY_SECONDS."""
+    delays = {}
+    for reader_id in (1, 2, 3):
+        value = os.environ.get(f"SCAN_DELAY_SECONDS_READER_{reader_id}", "").strip()
+        if value:
+            delays[reader_id] = int(value)
+    return delays
+
+rate_limiter = ScanRateLimiter(
+    delay_seconds=int(os.environ.get("SCAN_DELAY_SECONDS", "60")),
+    reader_delays=_reader_scan_delays(),
+    cross_reader_seconds=int(os.environ.get("CROSS_READER_DEDUP_SECONDS", "0")),
+    max_entries=int(os.environ.get("SCAN_RATE_MAX_CARDS", "10000")),
+)
+
+# =========================
+# Recent transactions ring buffer (thread-safe, fixed size, zero disk I/O on read)
+# =========================
+class RecentTransactions:
+    def __init__(self, size=50):
+        self._items = deque(maxlen=size)
         self._lock = threading.Lock()
 
-    def should_process(self, card_int: int):
-        now = time.time()
+    @property
+    def size(self):
+        return self._items.maxlen
+
+    def seed(self, txns):
+        """Load newest-first transactions from the store (called once at startup)."""
         with self._lock:
-            last = self.last_seen.get(card_int, 0)
-            if now - last >= self.delay:
-                self.last_seen[card_int] = now
-                return True
-            return False
+            self._items.clear()
+            for tx in reversed(txns[:self._items.maxlen]):
+                self._items.append(tx)
+
+    def add(self, txn):
+        with self._lock:
+            self._items.append(txn)
 
-rate_limiter = ScanRateLimiter(delay_seconds=int(os.environ.get("SCAN_DELAY_SECONDS", "60")))
+    def latest(self, limit=10):
+        """Return up to limit transactions, newest first."""
+        with self._lock:
+            items = list(self._items)
+        items.reverse()
+        return items[:limit]
+
+RECENT_TRANSACTIONS_WINDOW = int(os.environ.get("RECENT_TRANSACTIONS_WINDOW", "50"))
+recent_transactions = RecentTransactions(size=RECENT_TRANSACTIONS_WINDOW)
+try:
+    recent_transactions.seed(transaction_store.latest(RECENT_TRANSACTIONS_WINDOW))
+except Exception as e:
+    logging.error(f"Error seeding recent transactions buffer: {e}")
 
 # =========================
 # Camera capture manager (integrated; non-blocking)
@@ -772,85 +1432,101 @@ def is_camera_enabled(reader_id: int) -> bool:
     camera_enabled_key = f"CAMERA_{reader_id}_ENABLED"
     return os.getenv(camera_enabled_key, "true").lower() == "true"
 
-def should_capture_photo(card_number: str, user_name: str = None) -> bool:
-    """Check if photo should be captured based on preferences."""
-    try:
-        # Check global setting for registered vehicles
-        capture_registered = os.getenv("CAPTURE_REGISTERED_VEHICLES", "true").lower() == "true"
-        if not capture_registered:
-            return False
-        
-        # Check card-based preferences
-        if db is not None and is_internet_available():
-            try:
-                # Get card preferences from Firestore
-                card_prefs_doc = db.collection("entities").document(ENTITY_ID) \
-                                  .collection("preferences").document("card_photo_prefs").get()
-                if card_prefs_doc.exists:
-                    preferences = card_prefs_doc.to_dict().get("preferences", [])
-                    for pref in preferences:
-                        if pref.get("identifier") == card_number and pref.get("skip_photo", False):
-                            logging.info(f"Skipping photo capture for card {card_number} (card preference)")
-                            return False
-                
-                # Get user preferences from Firestore if user_name is provided
-                if user_name:
-                    user_prefs_doc = db.collection("entities").document(ENTITY_ID) \
-                                      .collection("preferences").document("user_photo_prefs").get()
-                    if user_prefs_doc.exists:
-                        preferences = user_prefs_doc.to_dict().get("preferences", [])
-                        for pref in preferences:
-                            if pref.get("identifier").lower() == user_name.lower() and pref.get("skip_photo", False):
-                                logging.info(f"Skipping photo capture for user {user_name} (user preference)")
-                                return False
-                                
-            except Exception as e:
-                logging.error(f"Error checking photo preferences: {e}")
-        
-        return True
-        
-    except Exception as e:
-        logging.error(f"Error in should_capture_photo: {e}")
-        return True  # Default to capturing if there's an error
+# Per-reader routing, precomputed so the scan path does not read the environment:
+# relay GPIO, camera key / RTSP URL, and whether that reader captures photos at all
+ReaderRoute = namedtuple("ReaderRoute", ["relay", "camera_key", "rtsp_url", "capture"])
+READER_ROUTES = {}
+
+def refresh_reader_routes():
+    """Rebuild READER_ROUTES from the environment (call after camera or photo settings change)."""
+    global READER_ROUTES
+    capture_registered = os.getenv("CAPTURE_REGISTERED_VEHICLES", "true").lower() == "true"
+    routes = {}
+    for reader_id, relay in ((1, RELAY_1), (2, RELAY_2), (3, RELAY_3)):
+        camera_key = f"camera_{reader_id}"
+        routes[reader_id] = ReaderRoute(relay, camera_key, RTSP_CAMERAS.get(camera_key),
+                                        capture_registered and is_camera_enabled(reader_id))
+    READER_ROUTES = routes
+
+refresh_reader_routes()
+
+def refresh_photo_preferences():
+    """Pull the photo preferences from Firestore into the local cache; returns True if they changed."""
+    if db is None or not is_internet_available():
+        return False
+    prefs_ref = db.collection("entities").document(ENTITY_ID).collection("preferences")
+    card_prefs_doc = prefs_ref.document("card_photo_prefs").get()
+    user_prefs_doc = prefs_ref.document("user_photo_prefs").get()
+    changed = set_photo_preferences(
+        card_prefs_doc.to_dict().get("preferences", []) if card_prefs_doc.exists else [],
+        user_prefs_doc.to_dict().get("preferences", []) if user_prefs_doc.exists else []
+    )
+    if changed:
+        logging.info("Photo preferences updated from Firestore")
+    return changed
+
+PHOTO_PREFS_REFRESH_INTERVAL = int(os.environ.get("PHOTO_PREFS_REFRESH_INTERVAL", "300"))
+
+def photo_prefs_worker():
+    """Background worker that keeps the local photo preference cache in step with Firestore"""
+    while True:
+        try:
+            refresh_photo_preferences()
+        except Exception as e:
+            logging.error(f"Photo preference refresh error: {e}")
+        time.sleep(PHOTO_PREFS_REFRESH_INTERVAL)
 
 # Thread pool for camera so scans don't block
 CAMERA_WORKERS = int(os.environ.get("CAMERA_WORKERS", "2"))
 IMAGE_UPLOAD_WORKERS = int(os.environ.get("IMAGE_UPLOAD_WORKERS", "5"))  # Increased for faster uploads
 JSON_UPLOAD_WORKERS = int(os.environ.get("JSON_UPLOAD_WORKERS", "5"))  # NEW: JSON upload workers
-camera_executor = ThreadPoolExecutor(max_workers=CAMERA_WORKERS)
-image_upload_executor = ThreadPoolExecutor(max_workers=IMAGE_UPLOAD_WORKERS)
-json_upload_executor = ThreadPoolExecutor(max_workers=JSON_UPLOAD_WORKERS)  # NEW: JSON upload executor
-
-def capture_for_reader_async(reader_id: int, card_int: int, user_name: str = None, status: str = None, timestamp: int = None):
+CAPTURE_QUEUE_MAX = int(os.environ.get("CAPTURE_QUEUE_MAX", "4"))  # captures waiting beyond CAMERA_WORKERS are shed
+camera_executor = BoundedExecutor(CAPTURE, CAMERA_WORKERS, CAPTURE_QUEUE_MAX, "camera")
+image_upload_executor = BoundedExecutor(UPLOAD, IMAGE_UPLOAD_WORKERS, IMAGE_UPLOAD_WORKERS, "image_upload")
+json_upload_executor = BoundedExecutor(UPLOAD, JSON_UPLOAD_WORKERS, JSON_UPLOAD_WORKERS * 4, "json_upload")  # NEW: JSON upload executor
+
+# During a camera outage each capture would hold a worker for up to ~14 s (2 tries x 3 s open +
+# 3 s read + 1 s sleep); after CAMERA_FAILURE_THRESHOLD failures in a row the camera's captures
+# are skipped, with one probe every CAMERA_COOLDOWN_SECONDS
+CAMERA_BREAKERS = {
+    reader_id: FailureBreaker(CAPTURE, f"camera_{reader_id}",
+                              threshold=int(os.environ.get("CAMERA_FAILURE_THRESHOLD", "3")),
+                              cooldown=float(os.environ.get("CAMERA_COOLDOWN_SECONDS", "30")))
+    for reader_id in (1, 2, 3)
+}
+
+def capture_for_reader_async(reader_id: int, card_int: int, user_name: str = None, status: str = None, timestamp: int = None, trace=None):
     """
     Non-blocking: pick camera based on reader, save image as CARD_TIMESTAMP.jpg
     Routes to either S3 or JSON upload based on configuration.
+    Photo preferences and camera enablement are already applied by handle_access.
     """
     try:
         card_str = str(card_int)
-        
-        # Check if photo should be captured based on preferences
-        if not should_capture_photo(card_str, user_name):
-            logging.info(f"Skipping photo capture for card {card_str} (preference settings)")
-            return
-        
-        # Check if camera is enabled for this reader
-        if not is_camera_enabled(reader_id):
-            logging.info(f"Camera {reader_id} is disabled, skipping image capture for card {card_int}")
-            return
+        if trace is not None:
+            trace.mark("capture_start")
 
         safe = _sanitize_card_number(card_str)
         ts = timestamp if timestamp else int(time.time())
         filename = f"{safe}_r{reader_id}_{ts}.jpg"  # format: card_reader_timestamp
         filepath = os.path.join(IMAGES_DIR, filename)
 
+        route = READER_ROUTES.get(reader_id)
         camera_key = f"camera_{reader_id}"
-        rtsp_url = RTSP_CAMERAS.get(camera_key)
+        rtsp_url = route.rtsp_url if route else None
         if not rtsp_url:
             logging.error(f"No RTSP URL configured for {camera_key}")
             return
 
         ok = _rtsp_capture_single(rtsp_url, filepath)
+        if trace is not None:
+            trace.mark("capture_end" if ok else "capture_failed")
+        breaker = CAMERA_BREAKERS.get(reader_id)
+        if breaker is not None:
+            if ok:
+                breaker.success()
+            else:
+                breaker.failure()
         if ok:
             logging.info(f"[CAPTURE] {camera_key}: saved {filepath}")
             
@@ -858,12 +1534,9 @@ def capture_for_reader_async(reader_id: int, card_int: int, user_name: str = Non
             json_mode_enabled = os.getenv("JSON_UPLOAD_ENABLED", "false").lower() == "true"
             
             if json_mode_enabled:
-                # JSON MODE: Create JSON with base64 and queue for upload
-                json_upload_executor.submit(
-                    create_and_queue_json_upload,
-                    filepath, card_str, reader_id, user_name, status, ts
-                )
-                logging.debug(f"[JSON MODE] Queued for JSON upload: {filepath}")
+                # JSON MODE: Create JSON with base64 and queue for upload (never waits on the upload pool)
+                if queue_json_capture(filepath, card_str, reader_id, user_name, status, ts):
+                    logging.debug(f"[JSON MODE] Queued for JSON upload: {filepath}")
             else:
                 # S3 MODE: Queue JPG for S3 upload (original behavior)
                 if is_internet_available():
@@ -883,17 +1556,25 @@ def capture_for_reader_async(reader_id: int, card_int: int, user_name: str = Non
 # Wiegand Decoder
 # =========================
 class WiegandDecoder:
+    """
+    Collects D0/D1 edges into frames. With expected_bits set, a frame is delivered as soon as that
+    many bits arrive, and a partial frame is discarded when the next bit comes more than timeout_ms
+    later (no daemon round trips per frame). With expected_bits=0 the frame length is auto-detected:
+    a pigpio watchdog, armed only in this mode, fires timeout_ms after the last bit and whatever was
+    collected is delivered.
+    """
     def __init__(self, pi, d0, d1, callback, timeout_ms=25, expected_bits=26):
         self.pi = pi
         self.d0 = d0
         self.d1 = d1
         self.callback = callback
         self.timeout_ms = timeout_ms
-        self.expected_bits = expected_bits  # Support 26 or 34 bit Wiegand
+        self.expected_bits = expected_bits  # 0 = auto-detect by frame length
 
         self.value = 0
         self.bits = 0
         self.last_tick = None
+        self.dropped = 0
 
         pi.set_mode(d0, pigpio.INPUT)
         pi.set_mode(d1, pigpio.INPUT)
@@ -904,23 +1585,50 @@ class WiegandDecoder:
         self.cb1 = pi.callback(d1, pigpio.FALLING_EDGE, self._handle_d1)
 
     def _handle_d0(self, gpio, level, tick):
-        self._process_bit(0, tick)
+        if level == pigpio.TIMEOUT:
+            self._end_frame(tick)
+        else:
+            self._process_bit(0, tick)
 
     def _handle_d1(self, gpio, level, tick):
-        self._process_bit(1, tick)
+        if level == pigpio.TIMEOUT:
+            self._end_frame(tick)
+        else:
+            self._process_bit(1, tick)
+
+    def _set_watchdog(self, timeout_ms):
+        for gpio in (self.d0, self.d1):
+            self.pi.set_watchdog(gpio, timeout_ms)
+
+    def _end_frame(self, tick):
+        """Watchdog expiry (auto-detect mode): no edge for timeout_ms, so the frame is complete."""
+        if self.bits and pigpio.tickDiff(self.last_tick, tick) < self.timeout_ms * 1000:
+            return  # this line was idle, but bits are still arriving on the other one
+        self._set_watchdog(0)
+        if not self.bits:
+            return
+        bits, value, tick = self.bits, self.value, self.last_tick
+        self.value = 0
+        self.bits = 0
+        self.callback(bits, value, tick)
 
     def _process_bit(self, bit, tick):
-        if self.last_tick is not None and pigpio.tickDiff(self.last_tick, tick) > self.timeout_ms * 1000:
+        if self.bits and pigpio.tickDiff(self.last_tick, tick) > self.timeout_ms * 1000:
+            # Gap inside a frame: the partial frame (wrong length, or an expired auto-detect frame) is discarded
+            self.dropped += 1
             self.value = 0
             self.bits = 0
 
+        if not self.bits and not self.expected_bits:
+            self._set_watchdog(self.timeout_ms)
         self.value = (self.value << 1) | bit
         self.bits += 1
         self.last_tick = tick
 
-        # Support both 26-bit and 34-bit Wiegand based on configuration
         if self.bits == self.expected_bits:
-            self.callback(self.bits, self.value)
+            # Fixed length: deliver at once.
+            # Pass the last bit's tick so the access path can be timed from the swipe itself
+            self.callback(self.bits, self.value, tick)
             self.value = 0
             self.bits = 0
 
@@ -935,6 +1643,11 @@ class WiegandDecoder:
                 self.cb1.cancel()
         except Exception:
             pass
+        if not self.expected_bits:
+            try:
+                self._set_watchdog(0)
+            except Exception:
+                pass
 
 # =========================
 # Flask Routes
@@ -1167,14 +1880,20 @@ def system_status():
             },
             "files": {
                 "users_file": os.path.exists(USER_DATA_FILE),
+                "users_journal": os.path.exists(users_journal.journal_path),
                 "blocked_users_file": os.path.exists(BLOCKED_USERS_FILE),
-                "transaction_cache": os.path.exists(TRANSACTION_CACHE_FILE)
+                "blocked_users_journal": os.path.exists(blocked_journal.journal_path),
+                "transaction_cache": os.path.exists(TRANSACTION_DB_FILE)
+            },
+            # Roster changes not yet folded into users.json / blocked_users.json
+            "journal_pending": {
+                "users": users_journal.pending,
+                "blocked_users": blocked_journal.pending
             }
         }
         if status["files"]["transaction_cache"]:
             try:
-                cached_transactions = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-                status["cached_transactions_count"] = len(cached_transactions)
+                status["cached_transactions_count"] = transaction_store.count()
             except Exception:
                 status["cached_transactions_count"] = 0
         else:
@@ -1205,9 +1924,7 @@ def add_user():
             "card_number": card_number
         }
 
-        curr = load_local_users()
-        curr[card_number] = user_data
-        save_local_users(curr)  # updates dict + ALLOWED_SET
+        upsert_user(card_number, user_data)  # updates dict + journal + access snapshot
 
         logging.info(f"User added locally: {name} (Card: {card_number})")
         return jsonify({"status": "success", "message": "User added successfully."})
@@ -1222,11 +1939,9 @@ def delete_user():
         if not card_number:
             return jsonify({"status": "error", "message": "Missing card_number"}), 400
 
-        curr = load_local_users()
-        if card_number in curr:
-            user_name = curr[card_number].get("name", "Unknown")
-            del curr[card_number]
-            save_local_users(curr)  # updates dict + ALLOWED_SET
+        removed = remove_user(card_number)  # updates dict + journal + access snapshot
+        if removed is not None:
+            user_name = removed.get("name", "Unknown")
             logging.info(f"User deleted locally: {user_name} (Card: {card_number})")
             return jsonify({"status": "success", "message": "User deleted successfully."})
         else:
@@ -1234,12 +1949,145 @@ def delete_user():
     except Exception as e:
         return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
+BULK_USER_OPS = ("upsert", "delete", "block", "unblock")
+
+def _parse_bulk_user_body():
+    """
+    Read a /bulk_users body into ((op, card, user_data) list, replace flag, since version, error list).
+    JSON: {"upsert": [...users], "delete": [...cards], "block": [...], "unblock": [...], "replace": false, "since": 41}
+    A replace with no upserts would empty the roster, so it also needs "confirm_empty": true.
+    NDJSON: one {"op": "upsert"|"delete"|"block"|"unblock", "card_number": ..., ...} object per line.
+    `since` may also be given as a query parameter (the only way for NDJSON bodies).
+    """
+    raw = request.get_data(as_text=True) or ""
+    content_type = (request.content_type or "").lower()
+    items = []
+    replace = False
+    confirm_empty = False
+    since = request.args.get("since")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        for line_no, line in enumerate(raw.splitlines(), 1):
+            line = line.strip()
+            if line:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    return [], False, None, [f"line {line_no}: invalid JSON"]
+    else:
+        try:
+            body = json.loads(raw) if raw.strip() else {}
+        except ValueError:
+            return [], False, None, ["Body must be JSON or NDJSON"]
+        if not isinstance(body, dict):
+            return [], False, None, ["JSON body must be an object"]
+        replace = bool(body.get("replace", False))
+        confirm_empty = body.get("confirm_empty") is True
+        since = body.get("since", since)
+        for op in BULK_USER_OPS:
+            if body.get(op) is None:
+                continue
+            if not isinstance(body[op], list):
+                return [], False, None, [f"{op} must be a list"]
+            for entry in body[op]:
+                item = dict(entry) if isinstance(entry, dict) else {"card_number": entry}
+                item["op"] = op
+                items.append(item)
+
+    ops, errors = [], []
+    if since is not None:
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            errors.append("since must be an integer roster version")
+    for i, item in enumerate(items):
+        op = item.get("op") if isinstance(item, dict) else None
+        card_number = str(item.get("card_number", "")).strip() if op else ""
+        if op not in BULK_USER_OPS:
+            errors.append(f"item {i}: unknown op {op!r}")
+        elif not card_number.isdigit():
+            errors.append(f"item {i}: card_number must be numeric")
+        elif op == "upsert" and (not item.get("id") or not item.get("name")):
+            errors.append(f"item {i}: upsert requires id and name")
+        else:
+            user_data = None
+            if op == "upsert":
+                user_data = {
+                    "id": str(item["id"]),
+                    "ref_id": str(item.get("ref_id", "")),
+                    "name": item["name"],
+                    "card_number": card_number
+                }
+            ops.append((op, card_number, user_data))
+    if replace and not confirm_empty and not any(op == "upsert" for op, _, _ in ops):
+        errors.append('replace without upserts would delete every user; send "confirm_empty": true to clear the roster')
+    return ops, replace, since, errors
+
+@app.route("/bulk_users", methods=["POST"])
+@require_api_key
+def bulk_users():
+    """
+    Apply many user upserts/deletes and blocks/unblocks as one batch.
+    The whole body is validated first; nothing is applied if any item is invalid.
+    With `since`, the batch is a delta against that roster version and is rejected
+    with 409 (and the current version) if the roster has moved on; the upstream
+    then resends from the returned version or does a full replace.
+    """
+    try:
+        ops, replace, since, errors = _parse_bulk_user_body()
+        if errors:
+            return jsonify({"status": "error", "message": "Invalid bulk request", "errors": errors[:50]}), 400
+        if not ops and not replace and since is None:
+            return jsonify({"status": "error", "message": "No operations supplied"}), 400
+
+        try:
+            counts = apply_roster_batch(ops, replace=replace, since=since)
+        except RosterVersionConflict as e:
+            logging.warning(f"Rejected roster delta: {e}")
+            return jsonify({
+                "status": "error",
+                "message": "Roster version mismatch",
+                "roster_id": ROSTER_ID,
+                "roster_version": ROSTER_VERSION
+            }), 409
+        logging.info(f"Bulk user update applied: {counts} (replace={replace}, since={since}, version={ROSTER_VERSION})")
+        return jsonify(dict(status="success", message=f"Applied {len(ops)} operations.",
+                            roster_id=ROSTER_ID, roster_version=ROSTER_VERSION, **counts))
+    except Exception as e:
+        logging.error(f"Error applying bulk user update: {e}")
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+@app.route("/roster_version", methods=["GET"])
+def roster_version():
+    """
+    Current roster id and version (O(1)). With ?since=N&roster_id=... also reports whether
+    a client that last saw version N of this roster is still in sync.
+    """
+    try:
+        response = {
+            "status": "success",
+            "roster_id": ROSTER_ID,
+            "roster_version": ROSTER_VERSION,
+            "ready": ROSTER_READY.is_set()
+        }
+        since = request.args.get("since", type=int)
+        if since is not None:
+            roster_id = request.args.get("roster_id")
+            response["in_sync"] = since == ROSTER_VERSION and (not roster_id or roster_id == ROSTER_ID)
+        return jsonify(response)
+    except Exception as e:
+        logging.error(f"Error reading roster version: {e}")
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
 @app.route("/search_user", methods=["GET"])
 def search_user():
+    """Find users by id, ref_id or card_number through the in-memory indexes."""
     try:
         user_id = request.args.get("id")
-        all_users = load_local_users()
-        results = [user for user in all_users.values() if user.get("id") == user_id]
+        ref_id = request.args.get("ref_id")
+        card_number = request.args.get("card_number")
+        if not user_id and not ref_id and not card_number:
+            return jsonify({"status": "error", "message": "Missing id, ref_id or card_number"}), 400
+        results = find_users(user_id=user_id, ref_id=ref_id, card_number=card_number)
         if results:
             return jsonify({"status": "success", "users": results}), 200
         else:
@@ -1254,10 +2102,9 @@ def relay():
     try:
         action = request.args.get("action")
         relay_num = request.args.get("relay")
-        if relay_num not in ["1", "2"]:
+        if relay_num not in ["1", "2", "3"]:
             return jsonify({"status": "error", "message": "Invalid relay number"}), 400
-        relay_num = int(relay_num)
-        relay_gpio = RELAY_1 if relay_num == 1 else RELAY_2
+        relay_gpio = RELAY_PINS[int(relay_num)]
 
         if action in ["open_hold", "close_hold", "normal_rfid", "normal"]:
             operate_relay(action, relay_gpio)
@@ -1267,35 +2114,39 @@ def relay():
         logging.error(f"Error in relay control API : {str(e)}")
         return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
+@app.route("/relay_status", methods=["GET"])
+def relay_status():
+    """Mode (normal / open_hold / close_hold), output state and remaining pulse time of each relay."""
+    try:
+        states = relay_controller.status()
+        return jsonify({
+            "status": "success",
+            "relays": {str(num): states[pin] for num, pin in RELAY_PINS.items()}
+        })
+    except Exception as e:
+        logging.error(f"Error reading relay status: {str(e)}")
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
 # --- Transactions ---
 @app.route("/get_transactions", methods=["GET"])
 def get_transactions():
     """
     Fetch the latest RFID access transactions.
     ALWAYS reads from local cache FIRST for speed and offline support.
+    Served from the in-memory ring buffer (seeded from the store at startup,
+    updated on every access decision) - no disk I/O on the 5s dashboard poll.
     Firestore is only used for backup/analytics.
     """
     try:
         transactions = []
+        limit = min(max(request.args.get("limit", 10, type=int), 1), recent_transactions.size)
         
         # ALWAYS read from local cache FIRST (fast, offline-capable)
-        cached = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        if cached:
-            # Sort by timestamp descending and get last 10
-            sorted_cached = sorted(cached, key=lambda x: x.get("timestamp", 0), reverse=True)
-            recent_cached = sorted_cached[:10]
-            
+        recent_cached = recent_transactions.latest(limit)
+        if recent_cached:
             # Format consistently
             for tx in recent_cached:
-                transactions.append({
-                    "card_number": tx.get("card", "N/A"),
-                    "name": tx.get("name", "Unknown"),
-                    "status": tx.get("status", "Unknown"),
-                    "timestamp": _ts_to_epoch(tx.get("timestamp", None)),
-                    "reader": tx.get("reader", "Unknown"),
-                    "entity_id": tx.get("entity_id", ENTITY_ID),
-                    "source": "local_cache"
-                })
+                transactions.append(_format_cached_transaction(tx))
             
             logging.debug(f"Returning {len(transactions)} transactions from local cache")
             return jsonify(transactions)
@@ -1307,7 +2158,7 @@ def get_transactions():
                 docs_iter = db.collection("transactions") \
                               .where(filter=FieldFilter("entity_id", "==", ENTITY_ID)) \
                               .order_by("timestamp", direction=firestore.Query.DESCENDING) \
-                              .limit(10).stream()
+                              .limit(limit).stream()
                 
                 for doc in docs_iter:
                     tx = doc.to_dict() or {}
@@ -1337,36 +2188,78 @@ def get_transactions():
         logging.error(f"Error in get_transactions: {e}")
         return jsonify({"status": "error", "message": f"Error fetching transactions: {str(e)}"}), 500
 
+TRANSACTION_PAGE_MAX = 500
+TRANSACTION_STATUS_ALIASES = {"granted": "Access Granted", "denied": "Access Denied", "blocked": "Blocked"}
+
+def _encode_page_cursor(tx):
+    """Opaque keyset cursor pointing just past tx (newest-first order)."""
+    return base64.urlsafe_b64encode(f"{tx['timestamp']}:{tx['id']}".encode()).decode().rstrip("=")
+
+def _decode_page_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    ts, seq = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+    return int(ts), int(seq)
+
+@app.route("/get_transaction_history", methods=["GET"])
+def get_transaction_history():
+    """
+    Page through cached transactions, newest first.
+    Query params: from / to (epoch seconds), reader, status, card, limit (max 500) and the
+    opaque cursor returned as next_cursor by the previous page. Each page is a keyset read
+    over the day segments, so memory use is bounded by limit regardless of history size.
+    """
+    try:
+        now = int(time.time())
+        start_time = request.args.get("from", 0, type=int)
+        end_time = request.args.get("to", now, type=int)
+        limit = min(max(request.args.get("limit", 100, type=int), 1), TRANSACTION_PAGE_MAX)
+        reader = request.args.get("reader", type=int)
+        status = request.args.get("status", "").strip()
+        status = TRANSACTION_STATUS_ALIASES.get(status.lower(), status)
+        card_number = request.args.get("card", "").strip()
+        
+        cursor = request.args.get("cursor", "").strip()
+        before = None
+        if cursor:
+            try:
+                before = _decode_page_cursor(cursor)
+            except Exception:
+                return jsonify({"status": "error", "message": "Invalid cursor"}), 400
+        
+        # Read one extra row to know whether another page exists
+        rows = transaction_store.page(start_time, end_time, limit=limit + 1, before=before,
+                                      reader=reader, status=status or None, card=card_number or None)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return jsonify({
+            "status": "success",
+            "transactions": [_format_cached_transaction(tx) for tx in rows],
+            "count": len(rows),
+            "next_cursor": _encode_page_cursor(rows[-1]) if has_more else None
+        })
+        
+    except Exception as e:
+        logging.error(f"Error getting transaction history: {e}")
+        return jsonify({"status": "error", "message": f"Error getting transaction history: {str(e)}"}), 500
+
 # --- User Analytics ---
 @app.route("/get_today_stats", methods=["GET"])
 def get_today_stats():
     """
     Get today's transaction statistics.
-    LOCAL-FIRST: Always reads from cache for speed and offline support.
+    Served from the in-memory daily counters - no disk or database access.
     """
     try:
-        today = datetime.now().strftime("%Y-%m-%d")
+        today = daily_stats.day(datetime.now().strftime('%Y-%m-%d'))
         stats = {
-            "total": 0,
-            "granted": 0,
-            "denied": 0,
-            "blocked": 0
+            "total": today["valid_entries"] + today["invalid_entries"] + today["blocked_entries"],
+            "granted": today["valid_entries"],
+            "denied": today["invalid_entries"],
+            "blocked": today["blocked_entries"],
+            "readers": today.get("readers", {})
         }
         
-        # ALWAYS use cached transactions (fast, offline-capable)
-        cached = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        for tx in cached:
-            tx_date = datetime.fromtimestamp(tx.get("timestamp", 0)).strftime("%Y-%m-%d")
-            if tx_date == today:
-                stats["total"] += 1
-                status = tx.get("status", "").lower()
-                if "granted" in status:
-                    stats["granted"] += 1
-                elif "denied" in status:
-                    stats["denied"] += 1
-                elif "blocked" in status:
-                    stats["blocked"] += 1
-        
         return jsonify(stats)
         
     except Exception as e:
@@ -1376,14 +2269,15 @@ def get_today_stats():
 @app.route("/search_user_transactions", methods=["GET"])
 def search_user_transactions():
     """
-    Search transactions by user name.
-    LOCAL-FIRST: Always searches local cache for speed and offline support.
+    Search transactions by user name (substring, case-insensitive) or exact card number.
+    LOCAL-FIRST: Served from the in-memory search index, newest matches first.
     """
     try:
         user_name = request.args.get("name", "").strip()
+        card_number = request.args.get("card", "").strip()
         date_range = request.args.get("range", "today")
         
-        if not user_name:
+        if not user_name and not card_number:
             return jsonify({"status": "error", "message": "User name is required"}), 400
         
         logging.info(f"Searching for user: '{user_name}' with range: '{date_range}'")
@@ -1405,25 +2299,20 @@ def search_user_transactions():
             end_time = int(now.timestamp())
         
         # ALWAYS search local cache (fast, offline-capable)
-        cached = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        for tx in cached:
-            if user_name.lower() in tx.get("name", "").lower():
-                if date_range == "all" or start_time <= tx.get("timestamp", 0) <= end_time:
-                    transactions.append({
-                        "card_number": tx.get("card", tx.get("card_number", "N/A")),
-                        "name": tx.get("name", "Unknown"),
-                        "status": tx.get("status", "Unknown"),
-                        "timestamp": _ts_to_epoch(tx.get("timestamp", None)),
-                        "reader": tx.get("reader", "Unknown"),
-                        "entity_id": tx.get("entity_id", ENTITY_ID),
-                        "source": "local_cache"
-                    })
-                    # Limit results to 100
-                    if len(transactions) >= 100:
-                        break
-        
-        # Sort by timestamp descending
-        transactions.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
+        # Newest-first, limited to 100; the index resolves matches, the store loads just those rows
+        if search_index.ready:
+            if card_number:
+                refs = search_index.search_card(card_number, start_time, end_time, limit=100)
+            else:
+                refs = search_index.search_name(user_name, start_time, end_time, limit=100)
+            matches = transaction_store.fetch(refs)
+        elif card_number:
+            # Index still loading right after boot - fall back to the per-segment indexes
+            matches = transaction_store.search_card(card_number, start_time, end_time, limit=100)
+        else:
+            matches = transaction_store.search_name(user_name, start_time, end_time, limit=100)
+        for tx in matches:
+            transactions.append(_format_cached_transaction(tx))
         
         logging.info(f"Found {len(transactions)} transactions for user '{user_name}' in range '{date_range}'")
         
@@ -1431,6 +2320,7 @@ def search_user_transactions():
             "transactions": transactions,
             "count": len(transactions),
             "user_name": user_name,
+            "card": card_number or None,
             "date_range": date_range
         })
         
@@ -1495,32 +2385,18 @@ def get_photo_preferences():
             "capture_registered_vehicles": os.getenv("CAPTURE_REGISTERED_VEHICLES", "true").lower() == "true"
         }
         
-        # Load card preferences from Firestore or local config
-        card_preferences = []
-        user_preferences = []
-        
-        if db is not None and is_internet_available():
-            try:
-                # Get card preferences from Firestore
-                card_prefs_doc = db.collection("entities").document(ENTITY_ID) \
-                                  .collection("preferences").document("card_photo_prefs").get()
-                if card_prefs_doc.exists:
-                    card_preferences = card_prefs_doc.to_dict().get("preferences", [])
-                
-                # Get user preferences from Firestore
-                user_prefs_doc = db.collection("entities").document(ENTITY_ID) \
-                                  .collection("preferences").document("user_photo_prefs").get()
-                if user_prefs_doc.exists:
-                    user_preferences = user_prefs_doc.to_dict().get("preferences", [])
-                    
-            except Exception as e:
-                logging.error(f"Error loading photo preferences from Firestore: {e}")
+        # Refresh the local cache from Firestore when online; otherwise serve the cached copy
+        try:
+            refresh_photo_preferences()
+        except Exception as e:
+            logging.error(f"Error loading photo preferences from Firestore: {e}")
+        prefs = PHOTO_PREFS
         
         return jsonify({
             "status": "success",
             "global_settings": global_settings,
-            "card_preferences": card_preferences,
-            "user_preferences": user_preferences
+            "card_preferences": prefs["card_preferences"],
+            "user_preferences": prefs["user_preferences"]
         })
         
     except Exception as e:
@@ -1540,6 +2416,7 @@ def save_global_photo_settings():
         
         # Save to environment variable (this would need to be persisted to .env file)
         os.environ["CAPTURE_REGISTERED_VEHICLES"] = str(capture_registered).lower()
+        refresh_reader_routes()
         
         # Save to Firestore if available
         if db is not None and is_internet_available():
@@ -1559,6 +2436,14 @@ def save_global_photo_settings():
         logging.error(f"Error saving global photo settings: {e}")
         return jsonify({"status": "error", "message": f"Error saving settings: {str(e)}"}), 500
 
+def _cache_photo_preference_list(pref_type, preferences):
+    """Mirror one preference list just written to Firestore into the local cache."""
+    prefs = PHOTO_PREFS
+    set_photo_preferences(
+        preferences if pref_type == "card" else prefs["card_preferences"],
+        preferences if pref_type == "user" else prefs["user_preferences"]
+    )
+
 @app.route("/add_photo_preference", methods=["POST"])
 def add_photo_preference():
     """Add a photo preference for a card or user."""
@@ -1610,6 +2495,7 @@ def add_photo_preference():
                     "preferences": preferences,
                     "updated_at": int(datetime.now().timestamp())
                 })
+                _cache_photo_preference_list(pref_type, preferences)
                 
                 return jsonify({
                     "status": "success", 
@@ -1666,6 +2552,7 @@ def remove_photo_preference():
                             "preferences": preferences,
                             "updated_at": int(datetime.now().timestamp())
                         })
+                        _cache_photo_preference_list(pref_type, preferences)
                         
                         return jsonify({
                             "status": "success", 
@@ -1876,27 +2763,67 @@ def delete_image(filename):
         return jsonify({"status": "error", "message": f"Error deleting image: {str(e)}"}), 500
 
 # --- User Management ---
+USERS_PAGE_MAX = 1000
+
 @app.route("/get_users", methods=["GET"])
 def get_users():
-    """Get list of all users with blocked status."""
+    """
+    Get users with blocked status, sorted by name (user_rows_from: the cached roster view, or
+    the card DB name index when the rosters are mapped). Without query params the full list is
+    returned (legacy shape). With any of q (name substring / card prefix), offset, limit or cursor
+    a page object is returned.
+    """
     try:
-        users_data = load_local_users()
-        blocked_data = load_blocked_users()
-        users_list = []
+        paged = any(k in request.args for k in ("q", "offset", "limit", "cursor"))
+        if not paged:
+            version, total, rows = user_rows_from()
+            return jsonify(list(rows))
         
-        for card_number, user_data in users_data.items():
-            users_list.append({
-                "card_number": card_number,
-                "id": user_data.get("id", ""),
-                "name": user_data.get("name", ""),
-                "ref_id": user_data.get("ref_id", ""),
-                "blocked": blocked_data.get(card_number, False)
-            })
+        query = request.args.get("q", "").strip().lower()
+        limit = min(max(request.args.get("limit", 100, type=int), 1), USERS_PAGE_MAX)
+        offset = max(request.args.get("offset", 0, type=int), 0)
+        cursor = request.args.get("cursor", "").strip()
         
-        # Sort by name for better display
-        users_list.sort(key=lambda x: x["name"].lower())
+        def matches(row):
+            return not query or query in row["name"].lower() or row["card_number"].startswith(query)
         
-        return jsonify(users_list)
+        if cursor:
+            try:
+                name_part, card_part = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("\x00")
+            except Exception:
+                return jsonify({"status": "error", "message": "Invalid cursor"}), 400
+            version, _, rows = user_rows_from((name_part, card_part))
+            page = list(itertools.islice((r for r in rows if matches(r)), limit + 1))
+            total = None
+        else:
+            version, total, rows = user_rows_from()
+            if query:
+                page = []
+                total = 0
+                for row in rows:
+                    if matches(row):
+                        if offset <= total <= offset + limit:
+                            page.append(row)
+                        total += 1
+            else:
+                page = list(itertools.islice(rows, offset, offset + limit + 1))
+        
+        has_more = len(page) > limit
+        page = page[:limit]
+        next_cursor = None
+        if has_more:
+            name_part, card_part = _user_sort_key(page[-1])
+            next_cursor = base64.urlsafe_b64encode(f"{name_part}\x00{card_part}".encode()).decode().rstrip("=")
+        
+        return jsonify({
+            "status": "success",
+            "users": page,
+            "count": len(page),
+            "total": total,
+            "offset": None if cursor else offset,
+            "next_cursor": next_cursor,
+            "roster_version": version
+        })
         
     except Exception as e:
         logging.error(f"Error fetching users: {e}")
@@ -1926,6 +2853,10 @@ def get_config():
             "bind_port": int(os.getenv("BIND_PORT", "9000")),
             "api_key": os.getenv("API_KEY", "your-api-key-change-this"),
             "scan_delay_seconds": int(os.getenv("SCAN_DELAY_SECONDS", "60")),
+            "scan_delay_seconds_reader_1": os.getenv("SCAN_DELAY_SECONDS_READER_1", ""),
+            "scan_delay_seconds_reader_2": os.getenv("SCAN_DELAY_SECONDS_READER_2", ""),
+            "scan_delay_seconds_reader_3": os.getenv("SCAN_DELAY_SECONDS_READER_3", ""),
+            "cross_reader_dedup_seconds": int(os.getenv("CROSS_READER_DEDUP_SECONDS", "0")),
             "wiegand_bits_reader_1": int(os.getenv("WIEGAND_BITS_READER_1", "26")),
             "wiegand_bits_reader_2": int(os.getenv("WIEGAND_BITS_READER_2", "26")),
             "wiegand_bits_reader_3": int(os.getenv("WIEGAND_BITS_READER_3", "26")),
@@ -1981,6 +2912,10 @@ def update_config():
             "bind_port": "BIND_PORT",
             "api_key": "API_KEY",
             "scan_delay_seconds": "SCAN_DELAY_SECONDS",
+            "scan_delay_seconds_reader_1": "SCAN_DELAY_SECONDS_READER_1",
+            "scan_delay_seconds_reader_2": "SCAN_DELAY_SECONDS_READER_2",
+            "scan_delay_seconds_reader_3": "SCAN_DELAY_SECONDS_READER_3",
+            "cross_reader_dedup_seconds": "CROSS_READER_DEDUP_SECONDS",
             "wiegand_bits_reader_1": "WIEGAND_BITS_READER_1",
             "wiegand_bits_reader_2": "WIEGAND_BITS_READER_2",
             "wiegand_bits_reader_3": "WIEGAND_BITS_READER_3",
@@ -1995,6 +2930,11 @@ def update_config():
                     new_delay = int(config_data[key])
                     rate_limiter.delay = new_delay
                     logging.info(f"Rate limiter delay updated to {new_delay} seconds")
+                elif key.startswith("scan_delay_seconds_reader_"):
+                    reader_delay = str(config_data[key]).strip()
+                    rate_limiter.set_reader_delay(int(key.rsplit("_", 1)[1]), int(reader_delay) if reader_delay else None)
+                elif key == "cross_reader_dedup_seconds":
+                    rate_limiter.cross_reader_seconds = int(config_data[key])
         
         # Write updated .env file
         with open(env_file, 'w') as f:
@@ -2005,6 +2945,7 @@ def update_config():
         
         # Reload environment variables for current session with override
         load_dotenv(override=True)
+        refresh_reader_routes()
         
         return jsonify({"status": "success", "message": "Configuration updated successfully"})
         
@@ -2421,8 +3362,10 @@ def get_storage_stats():
         system_files_size = 0
         system_files = [
             USER_DATA_FILE,
+            users_journal.journal_path,
             BLOCKED_USERS_FILE,
-            TRANSACTION_CACHE_FILE,
+            blocked_journal.journal_path,
+            TRANSACTION_DB_FILE,
             DAILY_STATS_FILE,
             LOG_FILE
         ]
@@ -2430,6 +3373,15 @@ def get_storage_stats():
         for file_path in system_files:
             if os.path.exists(file_path):
                 system_files_size += os.path.getsize(file_path)
+
+        # Roster change journals (replayed over users.json / blocked_users.json until compacted)
+        journals = {}
+        for name, journal in (("users", users_journal), ("blocked_users", blocked_journal)):
+            path = journal.journal_path
+            journals[name] = {
+                "size": os.path.getsize(path) if os.path.exists(path) else 0,
+                "pending": journal.pending
+            }
         
         # Get daily statistics
         daily_stats = get_daily_stats()
@@ -2441,6 +3393,7 @@ def get_storage_stats():
             "free_space": free,
             "total_space": total,
             "used_space": used,
+            "journals": journals,
             "daily_stats": daily_stats
         })
         
@@ -2494,18 +3447,8 @@ def cleanup_old_images():
 def cleanup_old_stats():
     """Clean up statistics older than 20 days."""
     try:
-        stats = read_json_or_default(DAILY_STATS_FILE, {})
-        cutoff_date = datetime.now() - timedelta(days=20)
-        cutoff_str = cutoff_date.strftime('%Y-%m-%d')
-        
-        old_dates = [date for date in stats.keys() if date < cutoff_str]
-        deleted_count = len(old_dates)
-        
-        for date in old_dates:
-            del stats[date]
-        
-        if old_dates:
-            atomic_write_json(DAILY_STATS_FILE, stats)
+        deleted_count = daily_stats.prune()
+        daily_stats.flush()
         
         logging.info(f"Cleaned up {deleted_count} old daily statistics")
         return jsonify({
@@ -2523,6 +3466,7 @@ def cleanup_old_stats():
 def clear_all_stats():
     """Clear all daily statistics."""
     try:
+        daily_stats.clear()
         if os.path.exists(DAILY_STATS_FILE):
             os.remove(DAILY_STATS_FILE)
         
@@ -2548,30 +3492,27 @@ def manual_sync_transactions():
         if db is None:
             return jsonify({"status": "error", "message": "Firebase not available"}), 400
         
-        # Check cache file status
-        if not os.path.exists(TRANSACTION_CACHE_FILE):
-            return jsonify({"status": "success", "message": "No cached transactions to sync"})
-        
-        cached_txns = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        if not cached_txns:
+        # Check pending (unsynced) transactions
+        pending_count = transaction_store.count_unsynced()
+        if not pending_count:
             return jsonify({"status": "success", "message": "No cached transactions to sync"})
         
         # Trigger sync
         sync_transactions()
         
         # Check remaining transactions
-        remaining_txns = read_json_or_default(TRANSACTION_CACHE_FILE, [])
+        remaining_count = transaction_store.count_unsynced()
         
-        if remaining_txns:
+        if remaining_count:
             return jsonify({
                 "status": "partial", 
-                "message": f"Synced some transactions, {len(remaining_txns)} still pending",
-                "remaining_count": len(remaining_txns)
+                "message": f"Synced some transactions, {remaining_count} still pending",
+                "remaining_count": remaining_count
             })
         else:
             return jsonify({
                 "status": "success", 
-                "message": f"All {len(cached_txns)} transactions synced successfully"
+                "message": f"All {pending_count} transactions synced successfully"
             })
             
     except Exception as e:
@@ -2582,7 +3523,8 @@ def manual_sync_transactions():
 def transaction_cache_status():
     """Get status of cached transactions with retention info."""
     try:
-        if not os.path.exists(TRANSACTION_CACHE_FILE):
+        cached_count = transaction_store.count()
+        if not cached_count:
             return jsonify({
                 "status": "success",
                 "cached_count": 0,
@@ -2590,38 +3532,78 @@ def transaction_cache_status():
                 "message": "No cached transactions"
             })
         
-        cached_txns = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        
-        # Calculate age statistics
-        if cached_txns:
-            timestamps = [tx.get("timestamp", 0) for tx in cached_txns]
-            oldest_ts = min(timestamps) if timestamps else None
-            newest_ts = max(timestamps) if timestamps else None
-            
-            if oldest_ts:
-                age_seconds = int(time.time()) - oldest_ts
-                oldest_age_days = age_seconds // 86400
-            else:
-                oldest_age_days = 0
+        # Calculate age statistics (MIN/MAX served by the timestamp index)
+        oldest_ts, newest_ts = transaction_store.time_bounds()
+        if oldest_ts:
+            age_seconds = int(time.time()) - oldest_ts
+            oldest_age_days = age_seconds // 86400
         else:
-            oldest_ts = None
-            newest_ts = None
             oldest_age_days = 0
         
         return jsonify({
             "status": "success",
-            "cached_count": len(cached_txns),
+            "cached_count": cached_count,
             "retention_days": TRANSACTION_RETENTION_DAYS,
             "oldest_transaction": datetime.fromtimestamp(oldest_ts).isoformat() if oldest_ts else None,
             "newest_transaction": datetime.fromtimestamp(newest_ts).isoformat() if newest_ts else None,
             "oldest_age_days": int(oldest_age_days),
-            "message": f"{len(cached_txns)} transactions cached (retention: {TRANSACTION_RETENTION_DAYS} days)"
+            "pending_sync_count": transaction_store.count_unsynced(),
+            "last_synced_seq": transaction_store.last_synced_seq,
+            "segment_count": len(transaction_store.segment_days()),
+            "message": f"{cached_count} transactions cached (retention: {TRANSACTION_RETENTION_DAYS} days)"
         })
         
     except Exception as e:
         logging.error(f"Error checking cache status: {e}")
         return jsonify({"status": "error", "message": f"Error checking cache: {str(e)}"}), 500
 
+@app.route("/latency_stats", methods=["GET"])
+def latency_stats():
+    """
+    Per-reader access-path latency percentiles (ms since the last Wiegand bit) for each stage:
+    callback, decision, relay, handoff, enqueue, capture_start, capture_end.
+    """
+    try:
+        stats = latency_tracker.snapshot()
+        stats["status"] = "success"
+        stats["tick_clock_calibrated"] = tick_clock.calibrated
+        return jsonify(stats)
+    except Exception as e:
+        logging.error(f"Error reading latency stats: {e}")
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+@app.route("/reset_latency_stats", methods=["POST"])
+@require_api_key
+def reset_latency_stats():
+    """Start a fresh latency collection window (e.g. before a load test)."""
+    try:
+        latency_tracker.reset()
+        return jsonify({"status": "success", "message": "Latency statistics reset"})
+    except Exception as e:
+        logging.error(f"Error resetting latency stats: {e}")
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+@app.route("/scan_rate_stats", methods=["GET"])
+def scan_rate_stats():
+    """Rate limiter windows, tracked cards and accepted/suppressed scan counters."""
+    try:
+        stats = rate_limiter.stats()
+        stats["rejected_frames"] = {str(reader): count for reader, count in sorted(rejected_frames.items())}
+        stats["status"] = "success"
+        return jsonify(stats)
+    except Exception as e:
+        logging.error(f"Error reading scan rate stats: {e}")
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+@app.route("/work_stats", methods=["GET"])
+def work_stats():
+    """Priority classes: nice value, queue/executor occupancy, shed counts and camera breakers."""
+    try:
+        return jsonify({"status": "success", "classes": work_class_snapshot()})
+    except Exception as e:
+        logging.error(f"Error reading work class stats: {e}")
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
 @app.route("/cleanup_old_transactions", methods=["POST"])
 @require_api_key
 def manual_cleanup_old_transactions():
@@ -2897,6 +3879,8 @@ def system_reset():
         def delayed_restart():
             time.sleep(2)  # Give time for response to be sent
             logging.info("Restarting application...")
+            # Flush state before the replacement process opens the same files (os._exit skips atexit)
+            cleanup()
             
             try:
                 # Try to restart using subprocess
@@ -3012,9 +3996,7 @@ def block_user():
         if not card_number:
             return jsonify({"status": "error", "message": "Missing card_number"}), 400
 
-        curr = load_blocked_users()
-        curr[card_number] = True
-        save_blocked_users(curr)  # updates dict + BLOCKED_SET
+        block_card(card_number)  # updates dict + journal + access snapshot
 
         logging.info(f"User blocked locally: Card {card_number}")
         return jsonify({"status": "success", "message": f"User {card_number} blocked successfully."})
@@ -3029,11 +4011,7 @@ def unblock_user():
         if not card_number:
             return jsonify({"status": "error", "message": "Missing card_number"}), 400
 
-        curr = load_blocked_users()
-        if card_number in curr:
-            curr.pop(card_number, None)
-            save_blocked_users(curr)  # updates dict + BLOCKED_SET
-
+        if unblock_card(card_number):  # updates dict + journal + access snapshot
             logging.info(f"User unblocked locally: Card {card_number}")
             return jsonify({"status": "success", "message": f"User {card_number} unblocked successfully."})
         else:
@@ -3052,194 +4030,227 @@ def unblock_user():
 # =========================
 # Access handling
 # =========================
-recent_transactions = []
 wiegand1 = None
 wiegand2 = None
+wiegand3 = None
 
 def operate_relay(action, relay):
-    global relay_status
+    """Apply a relay command through relay_controller; never blocks (pulses are released by its scheduler)."""
     try:
-        if not hasattr(GPIO, 'output'):
-            logging.warning("GPIO not available. Relay operation skipped.")
-            return
-
         if action == "open_hold":
-            GPIO.output(relay, GPIO.LOW)
-            relay_status = 1   # OPEN HOLD
+            relay_controller.hold_open(relay)
             logging.info(f"Relay {relay} opened (hold)")
         elif action == "close_hold":
-            GPIO.output(relay, GPIO.HIGH)
-            relay_status = 2   # CLOSE HOLD
+            relay_controller.hold_closed(relay)
             logging.info(f"Relay {relay} closed (hold)")
         elif action == "normal":
-            relay_status = 0
+            relay_controller.release(relay)
             logging.info(f"Relay {relay} set to normal mode")
         elif action == "normal_rfid":
-            relay_status = 0
-            GPIO.output(relay, GPIO.LOW)
-            time.sleep(1)  # NOTE: runs in separate thread (see below)
-            GPIO.output(relay, GPIO.HIGH)
+            relay_controller.release(relay)
+            relay_controller.pulse(relay)
             logging.info(f"Relay {relay} pulsed (normal RFID)")
         else:
             logging.warning(f"Invalid relay action received: {action}")
     except Exception as e:
         logging.error(f"Error setting relay {relay}: {str(e)}")
 
-def handle_access(bits, value, reader_id):
-    """Handle Wiegand 26-bit or 34-bit read -> O(1) set lookups, immediate local decisions, async image capture."""
+ScanEvent = namedtuple("ScanEvent", ["reader_id", "card_int", "entry", "timestamp", "capture", "trace"])
+
+def handle_access(bits, value, reader_id, tick=None):
+    """
+    pigpio callback stage: decode, rate-limit, decide, trigger the relay, then hand the scan to
+    scan_event_worker. Nothing here touches the disk, stdout or a blocking queue, so pigpio can
+    keep delivering bits for the other readers.
+    tick is the pigpio tick of the last bit; every stage is recorded in latency_tracker relative to it.
+    """
     try:
-        global relay_status
-        
-        # Accept both 26-bit and 34-bit Wiegand
-        if bits not in [26, 34]:
-            logging.warning(f"Invalid Wiegand bits received: {bits} from reader {reader_id}")
+        trace = latency_tracker.trace(reader_id, tick_clock.to_local_us(tick) if tick is not None else None)
+        trace.mark("callback")
+        
+        # Format chosen by frame length; parity bits are checked and stripped with masks and shifts
+        card_int = WIEGAND_FORMATS.card_id(bits, value)
+        if card_int is None:
+            rejected_frames[reader_id] = rejected_frames.get(reader_id, 0) + 1
+            logging.debug(f"Rejected {bits}-bit frame from reader {reader_id}: unknown format or parity error")
             return
 
-        # Process based on bit length
-        if bits == 26:
-            # 26-bit with parity removal (bits 1..24) -> int
-            card_int = int(f"{value:026b}"[1:25], 2)
-        elif bits == 34:
-            # 34-bit with parity removal (bits 1..32) -> int
-            card_int = int(f"{value:034b}"[1:33], 2)
-
-        if not rate_limiter.should_process(card_int):
-            logging.info(f"Duplicate scan ignored: {card_int}")
+        if not rate_limiter.should_process(card_int, reader_id):
+            logging.debug(f"Duplicate scan ignored: {card_int} on reader {reader_id}")
             return
 
-        print(f"Scanned Card from Reader {reader_id}: {card_int}")
         timestamp = int(time.time())
-        if reader_id == 1:
-            relay = RELAY_1
-        elif reader_id == 2:
-            relay = RELAY_2
-        else:
-            relay = RELAY_3
-
-        # O(1) lookups using sets
-        with BLOCKED_SET_LOCK:
-            is_blocked = card_int in BLOCKED_SET
-        with ALLOWED_SET_LOCK:
-            is_allowed = card_int in ALLOWED_SET
-
-        if is_blocked:
-            status = "Blocked"
-            name = "Blocked User"
-        elif is_allowed:
-            with USERS_LOCK:
-                u = users.get(str(card_int))
-                name = u.get("name", "Unknown") if u else "Unknown"
-            status = "Access Granted"
-            if relay_status == 0:
-                # Offload relay pulse to avoid blocking pigpio callback thread
-                threading.Thread(target=operate_relay, args=("normal_rfid", relay), daemon=True).start()
-        else:
-            status = "Access Denied"
-            name = "Unknown"
+        route = READER_ROUTES.get(reader_id) or READER_ROUTES[3]
 
-        # === NON-BLOCKING CAMERA CAPTURE ===
-        # Capture image in the background; name format: CARD_TIMESTAMP.jpg
-        # Pass status and timestamp for JSON payload creation
-        camera_executor.submit(capture_for_reader_async, reader_id, card_int, name, status, timestamp)
+        # One lock-free read of the precomputed decision record (snapshot or card DB):
+        # status, transaction name and photo preference together
+        entry = lookup_access(card_int) or ACCESS_TOMBSTONE
+        trace.mark("decision")
 
-        # Standardized transaction payload (document fields)
-        transaction = {
-            "name": name,
-            "card": str(card_int),
-            "reader": reader_id,
-            "status": status,
-            "timestamp": timestamp,
-            "entity_id": ENTITY_ID
-        }
+        # Energise now; the relay scheduler releases it (refused while the relay is held)
+        if entry.status == STATUS_GRANTED and relay_controller.pulse(route.relay):
+            trace.mark("relay")
 
-        # Update daily statistics
-        update_daily_stats(status)
+        scan_events.put(ScanEvent(reader_id, card_int, entry, timestamp, route.capture and not entry.skip_photo, trace))
+        trace.mark("handoff")
 
-        # Check upload mode - only queue to Firestore if NOT in JSON mode
-        json_mode_enabled = os.getenv("JSON_UPLOAD_ENABLED", "false").lower() == "true"
-        
-        if not json_mode_enabled:
-            # S3 MODE: Queue transaction for Firestore upload
-            try:
-                transaction_queue.put(transaction)
-            except Exception as e:
-                logging.error(f"Queue error for card {card_int}: {str(e)}")
+    except Exception as e:
+        logging.error(f"Unexpected error in handle_access for reader {reader_id}: {str(e)}")
+
+def process_scan_event(event, capture=True):
+    """Consumer stage for one scan: logging, capture scheduling, daily stats and transaction hand-off."""
+    reader_id, card_int, entry, timestamp = event.reader_id, event.card_int, event.entry, event.timestamp
+    status = entry.status
+    name = entry.label
+    print(f"Scanned Card from Reader {reader_id}: {card_int}")
+
+    # === NON-BLOCKING CAMERA CAPTURE ===
+    # Capture image in the background; name format: CARD_TIMESTAMP.jpg
+    # Pass status and timestamp for JSON payload creation
+    # Captures are shed (never queued without bound) while the camera is failing or the backlog is full
+    if capture and event.capture:
+        breaker = CAMERA_BREAKERS.get(reader_id)
+        if breaker is not None and not breaker.allow():
+            logging.debug(f"Camera for reader {reader_id} is failing; capture skipped for card {card_int}")
+        elif camera_executor.try_submit(capture_for_reader_async, reader_id, card_int, name, status, timestamp, event.trace) is None:
+            logging.warning(f"Capture backlog full; capture skipped for card {card_int} on reader {reader_id}")
+    else:
+        logging.debug(f"Skipping photo capture for card {card_int} on reader {reader_id} (preference or camera disabled)")
+
+    # Standardized transaction payload (document fields)
+    transaction = {
+        "name": name,
+        "card": str(card_int),
+        "reader": reader_id,
+        "status": status,
+        "timestamp": timestamp,
+        "entity_id": ENTITY_ID
+    }
+
+    # Update daily statistics
+    update_daily_stats(status, reader_id)
+
+    # Hand off to the transaction writer thread (both upload modes) - no store I/O in this stage either.
+    # In S3 mode the writer also uploads to Firestore; in JSON mode the data travels with the JSON upload.
+    try:
+        transaction_queue.put(transaction)
+        event.trace.mark("enqueue")
+    except Exception as e:
+        logging.error(f"Queue error for card {card_int}: {str(e)}")
+
+    recent_transactions.add(transaction)
+
+def scan_event_worker():
+    """Consumer of scan_events: everything about a scan except the access decision and the relay"""
+    while not SCAN_CONSUMER_STOP.is_set():
+        event = scan_events.get()
+        if event is None:  # shutdown wake-up, see stop_scan_consumer()
+            continue
+        try:
+            process_scan_event(event)
+        except Exception as e:
+            logging.error(f"Error processing scan from reader {event.reader_id}: {str(e)}")
+
+def stop_scan_consumer(timeout=10):
+    """Stop scan_event_worker after the scan in hand; cleanup() finishes the queued ones without captures."""
+    SCAN_CONSUMER_STOP.set()
+    scan_events.put(None)  # wake the consumer if it is idle
+    if scan_consumer_thread is not None:
+        scan_consumer_thread.join(timeout)
+        if scan_consumer_thread.is_alive():
+            logging.error(f"Scan consumer did not stop within {timeout} s")
+
+def _drain_transaction_queue(first=None, limit=None):
+    """Collect `first` plus whatever is already queued (up to limit items) without blocking."""
+    batch = [first] if first is not None else []
+    while limit is None or len(batch) < limit:
+        try:
+            transaction = transaction_queue.get_nowait()
+        except Empty:
+            break
+        if transaction is None:  # shutdown wake-up, see stop_transaction_writer()
+            transaction_queue.task_done()
+            continue
+        batch.append(transaction)
+    return batch
+
+def stop_transaction_writer(timeout=10):
+    """Let the writer commit everything queued so far, then wait for it to exit (called from cleanup)."""
+    TRANSACTION_WRITER_STOP.set()
+    try:
+        transaction_queue.put(None, timeout=timeout)  # wake the writer if it is idle
+    except Full:
+        logging.error("Transaction queue full at shutdown, writer did not drain it")
+    if transaction_writer_thread is not None:
+        transaction_writer_thread.join(timeout)
+        if transaction_writer_thread.is_alive():
+            logging.error(f"Transaction writer did not stop within {timeout} s")
+
+def transaction_writer():
+    """
+    Single owner of the local transaction store, used in both upload modes.
+    Scans only enqueue; this thread drains the queue and group-commits everything waiting
+    (up to TRANSACTION_WRITE_BATCH rows) in one SQLite transaction, so concurrent scans
+    from the readers never race on the store. It never waits on Firestore: each commit
+    only sets TRANSACTIONS_COMMITTED for firestore_flush_worker (S3 mode).
+    Exits once TRANSACTION_WRITER_STOP is set and the queue is empty.
+    """
+    while True:
+        first = transaction_queue.get()
+        if first is None:  # shutdown wake-up
+            transaction_queue.task_done()
         else:
-            # JSON MODE: Transaction data will be included in JSON upload, skip Firestore
-            # BUT still save locally for dashboard display
-            logging.debug(f"[JSON MODE] Transaction will be included in JSON upload, saving locally for dashboard")
+            batch = _drain_transaction_queue(first, TRANSACTION_WRITE_BATCH)
             try:
-                # Save to local cache for dashboard display
-                # Use the global TRANSACTION_CACHE_FILE constant (matches dashboard)
-                cache = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-                
-                # Add new transaction to cache
-                cache.append(transaction)
-                
-                # Keep only last 1000 transactions in cache
-                if len(cache) > 1000:
-                    cache = cache[-1000:]
-                
-                # Save cache to file
-                with open(TRANSACTION_CACHE_FILE, 'w') as f:
-                    json.dump(cache, f, indent=2)
-                    
+                # ALWAYS cache locally first for fast offline access and persistence
+                cache_transactions(batch)
+                TRANSACTIONS_COMMITTED.set()
             except Exception as e:
-                logging.error(f"Error saving transaction to local cache: {e}")
-
-        recent_transactions.append(transaction)
-        if len(recent_transactions) > 10:
-            recent_transactions.pop(0)
+                logging.error(f"Error writing {len(batch)} transactions to local store: {str(e)}")
+            finally:
+                for _ in batch:
+                    transaction_queue.task_done()
 
-    except Exception as e:
-        logging.error(f"Unexpected error in handle_access for reader {reader_id}: {str(e)}")
+        if TRANSACTION_WRITER_STOP.is_set() and transaction_queue.empty():
+            logging.info("Transaction writer stopped")
+            return
 
-def transaction_uploader():
-    """Background worker to upload/cache transactions."""
+def firestore_flush_worker():
+    """
+    Upload-class Firestore flusher (S3 mode), woken by the transaction writer after each group commit.
+    Waits until FIRESTORE_BATCH_SIZE rows are pending or FIRESTORE_FLUSH_INTERVAL has passed since
+    the wake-up, then commits everything after the sync cursor. Slow Firestore calls and waiting for
+    FIRESTORE_SYNC_LOCK (held by sync_loop) only delay this thread, never local writes.
+    """
     while True:
-        transaction = transaction_queue.get()
         try:
-            # Mark as not yet synced to Firestore
-            transaction["synced_to_firestore"] = False
-            
-            # ALWAYS cache locally first for fast offline access and persistence
-            cache_transaction(transaction)
-            
-            # Then try to upload to Firestore if online
+            TRANSACTIONS_COMMITTED.wait()
+            first_pending_at = time.time()
+            # Sequence ids are handed out consecutively, so this is (at most) the number of rows after the sync cursor
+            while transaction_store.last_seq - transaction_store.last_synced_seq < FIRESTORE_BATCH_SIZE:
+                remaining = FIRESTORE_FLUSH_INTERVAL - (time.time() - first_pending_at)
+                if remaining <= 0:
+                    break
+                TRANSACTIONS_COMMITTED.clear()
+                TRANSACTIONS_COMMITTED.wait(remaining)
+            # Cleared before reading the store: a commit that sets it after this is picked up next round
+            TRANSACTIONS_COMMITTED.clear()
+
             if is_internet_available() and db is not None:
-                try:
-                    # Firestore path: transactions/{push-id} with entity_id inside document
-                    # Remove sync flag before uploading (internal use only)
-                    upload_data = {k: v for k, v in transaction.items() if k != "synced_to_firestore"}
-                    
-                    # Add SERVER_TIMESTAMP as "created_at" (only for Firestore, not local cache)
-                    upload_data["created_at"] = SERVER_TIMESTAMP
-                    
-                    db.collection("transactions").add(upload_data)
-                    logging.info(f"Transaction uploaded to Firestore for entity {ENTITY_ID} (with server timestamp)")
-                    
-                    # Mark as synced in cache
-                    mark_transaction_synced(transaction.get("timestamp"))
-                except Exception as e:
-                    logging.error(f"Error uploading transaction: {str(e)}")
-                    # Transaction already cached with synced=False, will retry in sync_transactions()
+                synced_count, failed_count = commit_unsynced_transactions()
+                logging.info(f"Transactions uploaded to Firestore for entity {ENTITY_ID}: {synced_count} ok, {failed_count} failed")
             else:
-                logging.debug("No internet/Firebase unavailable. Transaction cached locally, will sync when online.")
+                logging.debug("No internet/Firebase unavailable. Transactions cached locally, will sync when online.")
         except Exception as e:
-            logging.error(f"Error in transaction_uploader: {str(e)}")
-        finally:
-            transaction_queue.task_done()
+            logging.error(f"Error uploading transactions: {str(e)}")
+            # Transactions already cached locally, will retry in sync_transactions()
+            time.sleep(5)
 
-def mark_transaction_synced(timestamp):
-    """Mark a transaction as synced to Firestore in the cache."""
+def mark_transactions_synced(last_seq):
+    """Advance the persisted sync cursor: everything up to last_seq is in Firestore."""
     try:
-        txns = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        for tx in txns:
-            if tx.get("timestamp") == timestamp:
-                tx["synced_to_firestore"] = True
-                break
-        atomic_write_json(TRANSACTION_CACHE_FILE, txns)
-        logging.debug(f"Marked transaction {timestamp} as synced")
+        transaction_store.advance_sync_cursor(last_seq)
+        logging.debug(f"Sync cursor advanced to sequence {last_seq}")
     except Exception as e:
         logging.error(f"Error marking transaction as synced: {e}")
 
@@ -3250,32 +4261,20 @@ def cleanup_old_transactions():
     ALL transactions are kept for 120 days regardless of online/offline status.
     """
     try:
-        if not os.path.exists(TRANSACTION_CACHE_FILE):
-            logging.debug("No transaction cache file to clean")
-            return 0
-        
-        txns = read_json_or_default(TRANSACTION_CACHE_FILE, [])
-        if not txns:
-            logging.debug("No transactions in cache to clean")
-            return 0
-        
         # Calculate cutoff timestamp (120 days ago)
         cutoff_timestamp = int(time.time()) - (TRANSACTION_RETENTION_DAYS * 86400)
         
-        # Filter transactions to keep only those within retention period
-        original_count = len(txns)
-        filtered_txns = [
-            tx for tx in txns 
-            if tx.get("timestamp", 0) >= cutoff_timestamp
-        ]
-        
-        deleted_count = original_count - len(filtered_txns)
+        # Drop whole expired day segments - cost is per segment, not per row
+        deleted_count = transaction_store.drop_expired_segments(cutoff_timestamp)
+        if deleted_count > 0:
+            # Forget index references into the dropped segments
+            oldest_ts, _ = transaction_store.time_bounds()
+            search_index.trim(oldest_ts if oldest_ts is not None else cutoff_timestamp + 86400)
         
         if deleted_count > 0:
-            atomic_write_json(TRANSACTION_CACHE_FILE, filtered_txns)
-            logging.info(f"✂️ Cleaned up {deleted_count} transactions older than {TRANSACTION_RETENTION_DAYS} days. Kept {len(filtered_txns)} transactions.")
+            logging.info(f"✂️ Cleaned up {deleted_count} transactions older than {TRANSACTION_RETENTION_DAYS} days.")
         else:
-            logging.debug(f"No transactions older than {TRANSACTION_RETENTION_DAYS} days. All {len(filtered_txns)} transactions retained.")
+            logging.debug(f"No transactions older than {TRANSACTION_RETENTION_DAYS} days.")
         
         return deleted_count
         
@@ -3443,6 +4442,74 @@ def create_and_queue_json_upload(image_path: str, card_number: str, reader_id: i
         logging.error(f"[JSON] Error creating JSON upload: {e}")
 
 
+# Markers already handed to the upload pool, so a slow job isn't submitted again by the next sweep
+_json_markers_in_flight = set()
+
+def _json_pending_marker(image_path: str) -> str:
+    return image_path + ".json_pending"
+
+def queue_json_capture(image_path: str, card_number: str, reader_id: int, user_name: str, status: str, timestamp: int) -> bool:
+    """
+    Hand a saved capture to the JSON upload pool without blocking (called from capture workers).
+    If the pool is full, the upload arguments are saved next to the JPG as a .json_pending marker
+    and enqueue_pending_json_captures submits it on a later sync pass. Returns True if submitted.
+    """
+    if json_upload_executor.try_submit(create_and_queue_json_upload, image_path, card_number,
+                                       reader_id, user_name, status, timestamp) is not None:
+        return True
+    try:
+        with open(_json_pending_marker(image_path), "w") as f:
+            json.dump({"card_number": card_number, "reader_id": reader_id, "user_name": user_name,
+                       "status": status, "timestamp": timestamp}, f)
+        logging.info(f"[JSON MODE] Upload pool full, sync_loop will pick up {image_path}")
+    except Exception as e:
+        logging.error(f"[JSON] Error saving pending marker for {image_path}: {e}")
+    return False
+
+def _create_json_upload_from_marker(marker_path: str, image_path: str, meta: dict):
+    create_and_queue_json_upload(image_path, meta.get("card_number"), meta.get("reader_id"),
+                                 meta.get("user_name"), meta.get("status"), meta.get("timestamp"))
+    try:
+        os.remove(marker_path)
+    except OSError:
+        pass
+    finally:
+        _json_markers_in_flight.discard(marker_path)
+
+def enqueue_pending_json_captures(limit=100):
+    """Re-submit captures shed while the JSON upload pool was full (their .json_pending markers), oldest first."""
+    try:
+        if not os.path.exists(IMAGES_DIR):
+            return
+        markers = [os.path.join(IMAGES_DIR, name) for name in os.listdir(IMAGES_DIR) if name.endswith(".json_pending")]
+        if not markers:
+            return
+        markers.sort(key=lambda x: os.path.getmtime(x))
+
+        count = 0
+        for marker in markers[:limit]:
+            if marker in _json_markers_in_flight:
+                continue
+            image_path = marker[:-len(".json_pending")]
+            if not os.path.exists(image_path):
+                # Image removed by storage cleanup: nothing left to upload
+                os.remove(marker)
+                continue
+            with open(marker, "r") as f:
+                meta = json.load(f)
+            _json_markers_in_flight.add(marker)
+            if json_upload_executor.try_submit(_create_json_upload_from_marker, marker, image_path, meta) is None:
+                _json_markers_in_flight.discard(marker)
+                logging.warning("[JSON] Upload pool full, will retry pending captures later")
+                break
+            count += 1
+
+        if count:
+            logging.info(f"[JSON] Re-submitted {count} captures shed while the upload pool was full")
+    except Exception as e:
+        logging.error(f"[JSON] Error re-submitting pending captures: {e}")
+
+
 def json_uploader_worker():
     """
     Background worker to upload JSON files to custom URL.
@@ -3610,6 +4677,8 @@ def check_relay_status():
                 relay_gpio = RELAY_1
             elif relay == "RELAY_2":
                 relay_gpio = RELAY_2
+            elif relay == "RELAY_3":
+                relay_gpio = RELAY_3
             else:
                 logging.warning(f"Invalid relay identifier: {relay}")
                 return
@@ -3640,6 +4709,7 @@ def sync_loop():
                     
                     if json_mode_enabled:
                         # JSON MODE: Only upload JSON files, skip Firestore and S3
+                        enqueue_pending_json_captures(limit=100)
                         enqueue_pending_json_uploads(limit=100)
                         logging.debug("[SYNC] JSON mode - Firestore and S3 uploads DISABLED")
                     else:
@@ -3671,11 +4741,24 @@ def sync_loop():
 
 def restart_program():
     logging.error("Critical failure! Restarting the program...")
+    cleanup()  # execl replaces the process without running atexit hooks
     python = sys.executable
     os.execl(python, python, *sys.argv)
 
+# cleanup() runs from several places (SIGTERM, atexit, reset/restart, __main__); only the first call does the work
+CLEANUP_LOCK = threading.RLock()
+cleanup_done = False
+
 def cleanup():
     """Cleanup function for graceful shutdown"""
+    global cleanup_done
+    with CLEANUP_LOCK:
+        if cleanup_done:
+            return
+        cleanup_done = True
+        _cleanup()
+
+def _cleanup():
     logging.info("Starting cleanup...")
     try:
         # Cleanup Wiegand readers
@@ -3693,6 +4776,13 @@ def cleanup():
             except Exception as e:
                 logging.error(f"Error stopping wiegand2: {str(e)}")
 
+        if wiegand3 is not None:
+            try:
+                wiegand3.cancel()
+                logging.info("Wiegand reader 3 stopped")
+            except Exception as e:
+                logging.error(f"Error stopping wiegand3: {str(e)}")
+
         # Cleanup pigpio
         if pi is not None:
             try:
@@ -3701,6 +4791,58 @@ def cleanup():
             except Exception as e:
                 logging.error(f"Error stopping pigpio: {str(e)}")
 
+        # Finish scans still waiting for the consumer stage (no new captures at shutdown) before
+        # the transaction writer is stopped, so their transactions are in its last group
+        try:
+            stop_scan_consumer()
+        except Exception as e:
+            logging.error(f"Error stopping scan consumer: {str(e)}")
+        while True:
+            try:
+                event = scan_events.get_nowait()
+            except Empty:
+                break
+            if event is None:
+                continue
+            try:
+                process_scan_event(event, capture=False)
+            except Exception as e:
+                logging.error(f"Error processing queued scan from reader {event.reader_id}: {str(e)}")
+
+        # Fold the roster journals into users.json / blocked_users.json
+        try:
+            compact_roster_journals()
+        except Exception as e:
+            logging.error(f"Error compacting roster journals: {str(e)}")
+
+        # Persist in-memory daily statistics
+        try:
+            daily_stats.flush()
+        except Exception as e:
+            logging.error(f"Error flushing daily stats: {str(e)}")
+
+        # The writer commits everything queued (including the scans above) as its last groups and exits;
+        # anything still queued after that (writer dead or stuck) is written here
+        try:
+            stop_transaction_writer()
+            remaining = _drain_transaction_queue()
+            if remaining:
+                cache_transactions(remaining)
+                logging.info(f"Stored {len(remaining)} queued transactions at shutdown")
+        except Exception as e:
+            logging.error(f"Error storing queued transactions: {str(e)}")
+
+        try:
+            transaction_store.close()
+        except Exception as e:
+            logging.error(f"Error closing transaction store: {str(e)}")
+
+        # Stop the relay scheduler (pulsing relays are released) before GPIO is torn down
+        try:
+            relay_controller.stop()
+        except Exception as e:
+            logging.error(f"Error stopping relay controller: {str(e)}")
+
         # Cleanup GPIO
         try:
             GPIO.cleanup()
@@ -3718,17 +4860,18 @@ if pi is not None:
     try:
         print("Readers initialised successfully")
         print(pi)
-        # Get Wiegand bit configuration for each reader
+        threading.Thread(target=tick_clock_worker, daemon=True).start()
+        # Get Wiegand bit configuration for each reader (0 = auto-detect by frame length)
         wiegand_bits_1 = int(os.environ.get('WIEGAND_BITS_READER_1', '26'))
         wiegand_bits_2 = int(os.environ.get('WIEGAND_BITS_READER_2', '26'))
         wiegand_bits_3 = int(os.environ.get('WIEGAND_BITS_READER_3', '26'))
         
-        wiegand1 = WiegandDecoder(pi, D0_PIN_1, D1_PIN_1, lambda b, v: handle_access(b, v, 1), expected_bits=wiegand_bits_1)
-        wiegand2 = WiegandDecoder(pi, D0_PIN_2, D1_PIN_2, lambda b, v: handle_access(b, v, 2), expected_bits=wiegand_bits_2)
-        wiegand3 = WiegandDecoder(pi, D0_PIN_3, D1_PIN_3, lambda b, v: handle_access(b, v, 3), expected_bits=wiegand_bits_3)
-        # Initialize in-memory stores + sets at boot
-        load_local_users()
-        load_blocked_users()
+        wiegand1 = WiegandDecoder(pi, D0_PIN_1, D1_PIN_1, lambda b, v, t: handle_access(b, v, 1, t),
+                                  timeout_ms=WIEGAND_FRAME_TIMEOUT_MS, expected_bits=wiegand_bits_1)
+        wiegand2 = WiegandDecoder(pi, D0_PIN_2, D1_PIN_2, lambda b, v, t: handle_access(b, v, 2, t),
+                                  timeout_ms=WIEGAND_FRAME_TIMEOUT_MS, expected_bits=wiegand_bits_2)
+        wiegand3 = WiegandDecoder(pi, D0_PIN_3, D1_PIN_3, lambda b, v, t: handle_access(b, v, 3, t),
+                                  timeout_ms=WIEGAND_FRAME_TIMEOUT_MS, expected_bits=wiegand_bits_3)
         print("Readers initialised successfully")
         logging.info("RFID readers initialized successfully.")
     except Exception as e:
@@ -3743,30 +4886,36 @@ else:
 # Check upload mode to start only needed workers
 json_mode_enabled = os.getenv("JSON_UPLOAD_ENABLED", "false").lower() == "true"
 
-# Always start these core threads
-threading.Thread(target=sync_loop, daemon=True).start()
-threading.Thread(target=session_cleanup_worker, daemon=True).start()
-threading.Thread(target=daily_stats_cleanup_worker, daemon=True).start()
-threading.Thread(target=storage_monitor_worker, daemon=True).start()
-threading.Thread(target=transaction_cleanup_worker, daemon=True).start()  # Auto-cleanup old transactions (120 days)
+# Always start these core threads (each at its priority class)
+scan_consumer_thread = start_worker(CAPTURE, scan_event_worker)
+start_worker(UPLOAD, sync_loop)
+start_worker(CLEANUP, session_cleanup_worker)
+start_worker(PERSISTENCE, daily_stats_worker)
+start_worker(PERSISTENCE, roster_compact_worker)
+start_worker(CLEANUP, storage_monitor_worker)
+start_worker(CLEANUP, transaction_cleanup_worker)  # Auto-cleanup old transactions (120 days)
+start_worker(CLEANUP, build_search_index)
+start_worker(UPLOAD, photo_prefs_worker)
 
 # Conditionally start upload workers based on mode
 if json_mode_enabled:
     # JSON MODE: Start ONLY JSON upload workers
-    threading.Thread(target=json_uploader_worker, daemon=True).start()
-    threading.Thread(target=json_cleanup_worker, daemon=True).start()
+    transaction_writer_thread = start_worker(PERSISTENCE, transaction_writer)
+    start_worker(UPLOAD, json_uploader_worker)
+    start_worker(CLEANUP, json_cleanup_worker)
     logging.info("=" * 60)
     logging.info("🚀 UPLOAD MODE: JSON Base64")
     logging.info("=" * 60)
     logging.info("✅ JSON upload workers started")
     logging.info("❌ S3 upload workers NOT started (terminated)")
-    logging.info("❌ Firestore transaction worker NOT started (terminated)")
+    logging.info("✅ Local transaction writer started (Firestore upload disabled)")
     logging.info(f"📤 Upload URL: {os.getenv('JSON_UPLOAD_URL', 'Not configured')}")
     logging.info("=" * 60)
 else:
     # S3 MODE: Start ONLY S3 and Firestore workers
-    threading.Thread(target=transaction_uploader, daemon=True).start()
-    threading.Thread(target=image_uploader_worker, daemon=True).start()
+    transaction_writer_thread = start_worker(PERSISTENCE, transaction_writer)
+    start_worker(UPLOAD, firestore_flush_worker)
+    start_worker(UPLOAD, image_uploader_worker)
     logging.info("=" * 60)
     logging.info("🚀 UPLOAD MODE: S3 Multipart")
     logging.info("=" * 60)
@@ -3776,18 +4925,30 @@ else:
     logging.info(f"📤 S3 API: {os.getenv('S3_API_URL', 'Not configured')}")
     logging.info("=" * 60)
 
-# Flask serve
-try:
-    print("Waiting for RFID card scans...")
-    flask_host = os.environ.get('FLASK_HOST', '0.0.0.0')
-    flask_port = int(os.environ.get('FLASK_PORT', 5001))
-    flask_debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
-    app.run(host=flask_host, port=flask_port, debug=flask_debug)
-except KeyboardInterrupt:
-    print("\nStopping Wiegand readers...")
-    cleanup()
-except Exception as e:
-    logging.error(f"Unexpected error: {str(e)}")
-    cleanup()
-finally:
+def handle_sigterm(signum, frame):
+    """systemd and restart_rfid.py stop the service with SIGTERM: flush state, then exit"""
+    logging.info("SIGTERM received, shutting down")
     cleanup()
+    sys.exit(0)
+
+# Also flush on any normal interpreter exit (sys.exit, end of an importing script)
+atexit.register(cleanup)
+if threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+# Flask serve (not when imported, e.g. by load_harness.py)
+if __name__ == "__main__":
+    try:
+        print("Waiting for RFID card scans...")
+        flask_host = os.environ.get('FLASK_HOST', '0.0.0.0')
+        flask_port = int(os.environ.get('FLASK_PORT', 5001))
+        flask_debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
+        app.run(host=flask_host, port=flask_port, debug=flask_debug)
+    except KeyboardInterrupt:
+        print("\nStopping Wiegand readers...")
+        cleanup()
+    except Exception as e:
+        logging.error(f"Unexpected error: {str(e)}")
+        cleanup()
+    finally:
+        cleanup()
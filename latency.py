@@ -0,0 +1,172 @@
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+TICK_MASK = 0xFFFFFFFF  # pigpio ticks are microseconds in an unsigned 32-bit counter (wraps every ~72 min)
+
+# Geometric buckets from 1 µs to ~2 min; each bucket is 10% wider than the previous one,
+# so a reported percentile is within 10% of the true value
+BUCKET_GROWTH = 1.1
+BUCKET_COUNT = 200
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+
+def now_us() -> int:
+    """Local monotonic clock in microseconds (the time base for every stage)."""
+    return time.perf_counter_ns() // 1000
+
+
+def tick_diff(t1: int, t2: int) -> int:
+    """Signed microseconds from pigpio tick t1 to t2, correct across the 32-bit wrap."""
+    d = (t2 - t1) & TICK_MASK
+    return d - (TICK_MASK + 1) if d > TICK_MASK // 2 else d
+
+
+class TickClock:
+    """
+    Maps pigpio ticks (daemon clock) onto now_us() (local clock).
+
+    ``calibrate()`` samples the current tick and takes the midpoint of the
+    local time around the call as the matching local instant. The pair is
+    re-sampled periodically (well inside the wrap period), so converting the
+    tick of a GPIO edge costs two integer operations and no daemon round trip.
+    """
+
+    def __init__(self):
+        self._anchor = None  # (tick, local_us)
+
+    @property
+    def calibrated(self) -> bool:
+        return self._anchor is not None
+
+    def calibrate(self, get_tick: Callable[[], int], samples: int = 5):
+        best = None
+        for _ in range(samples):
+            before = now_us()
+            tick = get_tick()
+            after = now_us()
+            if best is None or after - before < best[0]:
+                best = (after - before, tick, (before + after) // 2)
+        self._anchor = (best[1], best[2])
+        return best[0]
+
+    def to_local_us(self, tick: int) -> Optional[int]:
+        anchor = self._anchor
+        if anchor is None:
+            return None
+        return anchor[1] + tick_diff(anchor[0], tick)
+
+
+class LatencyHistogram:
+    """Fixed-size log-bucketed histogram of microsecond latencies."""
+
+    __slots__ = ("counts", "count", "total", "max", "over_sla", "sla_us")
+
+    def __init__(self, sla_us: int = 0):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.over_sla = 0
+        self.sla_us = sla_us
+
+    @staticmethod
+    def bucket_of(us: int) -> int:
+        if us <= 1:
+            return 0
+        return min(BUCKET_COUNT - 1, int(math.log(us) / _LOG_GROWTH) + 1)
+
+    @staticmethod
+    def bucket_upper(i: int) -> float:
+        return BUCKET_GROWTH ** i
+
+    def record(self, us: int):
+        us = max(0, int(us))
+        self.counts[self.bucket_of(us)] += 1
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+        if self.sla_us and us > self.sla_us:
+            self.over_sla += 1
+
+    def percentile(self, p: float) -> int:
+        """Upper bound of the bucket holding the p-th percentile (capped at the observed max)."""
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(int(self.bucket_upper(i)), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """Milliseconds, rounded for display."""
+        ms = lambda us: round(us / 1000.0, 3)
+        return {
+            "count": self.count,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+            "max_ms": ms(self.max),
+            "mean_ms": ms(self.total / self.count) if self.count else 0.0,
+            "over_sla": self.over_sla,
+        }
+
+
+class LatencyTracker:
+    """Per-reader, per-stage latency histograms (thread-safe)."""
+
+    def __init__(self, sla_ms: float = 0):
+        self.sla_us = int(sla_ms * 1000)
+        self._lock = threading.Lock()
+        self._histograms: Dict[tuple, LatencyHistogram] = {}
+        self.started_at = time.time()
+
+    def record(self, reader, stage: str, us: int):
+        key = (str(reader), stage)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = LatencyHistogram(self.sla_us)
+            hist.record(us)
+
+    def trace(self, reader, start_us: Optional[int] = None) -> "ScanTrace":
+        return ScanTrace(self, reader, now_us() if start_us is None else start_us)
+
+    def snapshot(self) -> dict:
+        """{reader: {stage: summary}} plus the SLA and the collection window."""
+        with self._lock:
+            readers = {}
+            for (reader, stage), hist in sorted(self._histograms.items()):
+                readers.setdefault(reader, {})[stage] = hist.summary()
+        return {
+            "sla_ms": self.sla_us / 1000.0,
+            "since": int(self.started_at),
+            "readers": readers,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self.started_at = time.time()
+
+
+class ScanTrace:
+    """Timeline of one scan: every mark() records the time since the scan's start for its reader."""
+
+    __slots__ = ("tracker", "reader", "start_us")
+
+    def __init__(self, tracker: LatencyTracker, reader, start_us: int):
+        self.tracker = tracker
+        self.reader = reader
+        self.start_us = start_us
+
+    def mark(self, stage: str) -> int:
+        elapsed = now_us() - self.start_us
+        self.tracker.record(self.reader, stage, elapsed)
+        return elapsed
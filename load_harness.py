@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Load harness for the access decision path - no Raspberry Pi, readers or cameras required.
+
+Runs integrated_access_camera in simulation mode (sim_drivers.py stands in for pigpio and
+RPi.GPIO) inside a scratch directory, loads a synthetic roster and injects Wiegand frames on
+the readers through the fake pigpio daemon, so every swipe goes through the real decoder,
+rate limiter, decision, relay scheduler and scan pipeline. Reports decisions per second and
+the per-stage latency distribution from the application's own latency tracker.
+
+Examples:
+    python load_harness.py --rate 200 --duration 10
+    python load_harness.py --pattern burst --rate 500 --burst-size 50
+    python load_harness.py --pattern repeat --repeat-cards 20 --scan-delay 5
+    python load_harness.py --pattern distinct --bits 37 --json
+    python load_harness.py --flood 4    # relay latency with busy upload-class threads
+"""
+
+import argparse
+import base64
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from wiegand_formats import DEFAULT_FORMATS
+from work_classes import start_worker, UPLOAD
+
+PATTERNS = ("steady", "burst", "distinct", "repeat")
+STAGES = ("callback", "decision", "relay", "handoff", "enqueue")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Synthetic Wiegand load for the access decision path")
+    parser.add_argument("--rate", type=float, default=100, help="swipes per second across all readers")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--pattern", choices=PATTERNS, default="steady",
+                        help="steady: roster cards evenly spaced; burst: --burst-size swipes at once; "
+                             "distinct: a new unknown card every swipe; repeat: a few cards over and over")
+    parser.add_argument("--burst-size", type=int, default=25)
+    parser.add_argument("--repeat-cards", type=int, default=20)
+    parser.add_argument("--readers", default="1,2,3", help="comma-separated reader ids")
+    parser.add_argument("--roster", type=int, default=10000, help="cards in the synthetic roster")
+    parser.add_argument("--blocked-fraction", type=float, default=0.05)
+    parser.add_argument("--bits", type=int, default=26, choices=[f.bits for f in DEFAULT_FORMATS])
+    parser.add_argument("--scan-delay", type=int, default=60, help="SCAN_DELAY_SECONDS for the run")
+    parser.add_argument("--flood", type=int, default=0,
+                        help="CPU-bound upload-class threads (base64 + JSON encoding) running during the load")
+    parser.add_argument("--workdir", help="scratch directory (default: a new temporary directory)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args()
+
+
+def load_app(args, workdir, devnull):
+    """Import the application in simulation mode with all state under workdir."""
+    os.environ.update({
+        "SIMULATION_MODE": "true",
+        "BASE_DIR": workdir,
+        "LOG_FILE": os.path.join(workdir, "rfid_system.log"),
+        "SCAN_DELAY_SECONDS": str(args.scan_delay),
+        "CAMERA_1_ENABLED": "false",
+        "CAMERA_2_ENABLED": "false",
+        "CAMERA_3_ENABLED": "false",
+    })
+    for reader_id in (1, 2, 3):
+        os.environ[f"WIEGAND_BITS_READER_{reader_id}"] = str(args.bits)
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(devnull):
+        import integrated_access_camera as app_module
+    app_module.ROSTER_READY.wait(30)
+    deadline = time.monotonic() + 5
+    while not app_module.tick_clock.calibrated and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return app_module
+
+
+def load_roster(app_module, fmt, args, rng):
+    """Replace the roster with args.roster random cards, the first args.blocked_fraction of them blocked."""
+    cards = rng.sample(range(1, fmt.id_mask), args.roster)
+    ops = [("upsert", str(card), {"id": f"sim-{i}", "ref_id": "", "name": f"Sim User {i}", "card_number": str(card)})
+           for i, card in enumerate(cards)]
+    ops += [("block", str(card), None) for card in cards[:int(len(cards) * args.blocked_fraction)]]
+    app_module.apply_roster_batch(ops, replace=True)
+    return cards
+
+
+def swipe_plan(args, fmt, cards, readers, rng):
+    """(offset seconds, reader, card) for every swipe of the run."""
+    total = int(args.rate * args.duration)
+    repeat_pool = cards[-args.repeat_cards:]  # load_roster blocks a prefix of cards; repeat granted ones
+    plan = []
+    for i in range(total):
+        if args.pattern == "burst":
+            offset = (i // args.burst_size) * args.burst_size / args.rate
+        else:
+            offset = i / args.rate
+        if args.pattern == "distinct":
+            card = rng.randrange(1, fmt.id_mask)  # almost always unknown: the denied path
+        elif args.pattern == "repeat":
+            card = rng.choice(repeat_pool)
+        else:
+            card = rng.choice(cards)
+        plan.append((offset, readers[i % len(readers)], card))
+    return plan
+
+
+def _busy_upload(stop):
+    """Stand-in for the JSON upload path: base64 and JSON encoding of a camera-sized image."""
+    image = os.urandom(256 * 1024)
+    while not stop.is_set():
+        json.dumps({"image": base64.b64encode(image).decode()})
+
+
+def run_load(app_module, fmt, plan, readers):
+    """Inject the plan on one thread (the daemon delivers every callback on one thread too)."""
+    pi = app_module.pi
+    pins = {r: (getattr(app_module, f"D0_PIN_{r}"), getattr(app_module, f"D1_PIN_{r}")) for r in readers}
+    frames = [(offset, pins[reader], fmt.encode(card)) for offset, reader, card in plan]
+    late = 0
+    start = time.perf_counter()
+    for offset, (d0, d1), frame in frames:
+        wait = start + offset - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        elif wait < -0.01:
+            late += 1
+        pi.inject_frame(d0, d1, fmt.bits, frame)
+    inject_seconds = time.perf_counter() - start
+
+    # Let the consumer stage and the transaction writer catch up
+    drain_start = time.perf_counter()
+    while (not app_module.scan_events.empty() or not app_module.transaction_queue.empty()) \
+            and time.perf_counter() - drain_start < 60:
+        time.sleep(0.01)
+    return inject_seconds, time.perf_counter() - drain_start, late
+
+
+def build_report(app_module, args, plan, inject_seconds, drain_seconds, late):
+    latency = app_module.latency_tracker.snapshot()
+    readers = latency["readers"]
+    counts = {stage: sum(r.get(stage, {}).get("count", 0) for r in readers.values()) for stage in STAGES}
+    return {
+        "pattern": args.pattern,
+        "bits": args.bits,
+        "swipes": len(plan),
+        "flood_threads": args.flood,
+        "target_rate": args.rate,
+        "injected_per_second": round(len(plan) / inject_seconds, 1) if inject_seconds else 0,
+        "late_swipes": late,
+        "decisions": counts["decision"],
+        "decisions_per_second": round(counts["decision"] / inject_seconds, 1) if inject_seconds else 0,
+        "relay_pulses": counts["relay"],
+        "transactions_enqueued": counts["enqueue"],
+        "drain_seconds": round(drain_seconds, 3),
+        "rate_limiter": app_module.rate_limiter.stats(),
+        "sla_ms": latency["sla_ms"],
+        "latency": {reader: {stage: readers[reader][stage] for stage in STAGES if stage in readers[reader]}
+                    for reader in sorted(readers)},
+    }
+
+
+def print_report(report):
+    print("=" * 70)
+    print(f"Pattern {report['pattern']}, {report['bits']}-bit, {report['swipes']} swipes "
+          f"at {report['injected_per_second']}/s (target {report['target_rate']}/s, {report['late_swipes']} late), "
+          f"{report['flood_threads']} flood threads")
+    limiter = report["rate_limiter"]
+    print(f"Decisions: {report['decisions']} ({report['decisions_per_second']}/s), "
+          f"suppressed by rate limiter: {sum(limiter['suppressed'].values()) + limiter['suppressed_cross_reader']}")
+    print(f"Relay pulses: {report['relay_pulses']}, transactions enqueued: {report['transactions_enqueued']}, "
+          f"queues drained in {report['drain_seconds']} s")
+    print("-" * 70)
+    print(f"{'reader':<8}{'stage':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'>SLA':>6}")
+    for reader, stages in report["latency"].items():
+        for stage, s in stages.items():
+            print(f"{reader:<8}{stage:<12}{s['count']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}"
+                  f"{s['p99_ms']:>10}{s['max_ms']:>10}{s['over_sla']:>6}")
+    print("=" * 70)
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    readers = [int(r) for r in args.readers.split(",") if r.strip()]
+    fmt = next(f for f in DEFAULT_FORMATS if f.bits == args.bits)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rfid_load_")
+    os.makedirs(workdir, exist_ok=True)
+
+    if not args.json:
+        print(f"🧪 Load harness: {args.pattern} at {args.rate}/s for {args.duration} s on readers {readers} ({workdir})")
+    devnull = open(os.devnull, "w")
+    app_module = load_app(args, workdir, devnull)
+    cards = load_roster(app_module, fmt, args, rng)
+    plan = swipe_plan(args, fmt, cards, readers, rng)
+    app_module.latency_tracker.reset()
+
+    stop_flood = threading.Event()
+    for _ in range(args.flood):
+        start_worker(UPLOAD, _busy_upload, stop_flood)
+    # The consumer stage prints every scan
+    with contextlib.redirect_stdout(devnull):
+        inject_seconds, drain_seconds, late = run_load(app_module, fmt, plan, readers)
+    stop_flood.set()
+    report = build_report(app_module, args, plan, inject_seconds, drain_seconds, late)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    with contextlib.redirect_stdout(devnull):
+        app_module.cleanup()
+    return report["decisions"] > 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ScanRateLimiter:
+    """
+    Suppresses repeat scans of a card, with memory bounded by recent activity.
+
+    Each (reader, card) pair is throttled by that reader's window, so an exit
+    scan right after an entry scan on another reader is not rejected. With
+    ``cross_reader_seconds`` > 0, a card accepted on one reader is also
+    suppressed on the other readers for that long (adjacent readers that pick
+    up the same swipe).
+
+    Accepted scans are kept in OrderedDicts in acceptance order, so expired
+    entries are always at the front and are evicted in amortised O(1) on
+    each call; ``max_entries`` caps the size (least recently accepted first)
+    if a flood of distinct cards arrives within one window. Times come from
+    the monotonic clock, so an NTP step at boot does not open or close windows.
+    """
+
+    def __init__(self, delay_seconds: float = 60, reader_delays: Optional[Dict[int, float]] = None,
+                 cross_reader_seconds: float = 0, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self._delay = delay_seconds
+        self._reader_delays: Dict[int, float] = dict(reader_delays or {})
+        self._cross_reader_seconds = cross_reader_seconds
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[tuple, float]" = OrderedDict()  # (reader, card) -> accepted at
+        self._last_reader: "OrderedDict[int, tuple]" = OrderedDict()  # card -> (accepted at, reader)
+        self._ttl = self._max_window()
+        self.accepted = 0
+        self.suppressed: Dict[int, int] = {}
+        self.suppressed_cross_reader = 0
+        self.evicted = 0
+
+    # The default window; kept as an attribute so existing callers can assign it
+    @property
+    def delay(self) -> float:
+        return self._delay
+
+    @delay.setter
+    def delay(self, seconds: float):
+        with self._lock:
+            self._delay = seconds
+            self._ttl = self._max_window()
+
+    @property
+    def cross_reader_seconds(self) -> float:
+        return self._cross_reader_seconds
+
+    @cross_reader_seconds.setter
+    def cross_reader_seconds(self, seconds: float):
+        with self._lock:
+            self._cross_reader_seconds = seconds
+            self._ttl = self._max_window()
+
+    def set_reader_delay(self, reader_id: int, seconds: Optional[float]):
+        """Per-reader window; None falls back to the default delay."""
+        with self._lock:
+            if seconds is None:
+                self._reader_delays.pop(reader_id, None)
+            else:
+                self._reader_delays[reader_id] = seconds
+            self._ttl = self._max_window()
+
+    def reader_delay(self, reader_id: int) -> float:
+        return self._reader_delays.get(reader_id, self._delay)
+
+    def _max_window(self) -> float:
+        return max([self._delay, self._cross_reader_seconds] + list(self._reader_delays.values()))
+
+    def _expire(self, now: float):
+        horizon = now - self._ttl
+        seen = self._seen
+        while seen and (next(iter(seen.values())) <= horizon or len(seen) > self.max_entries):
+            seen.popitem(last=False)
+            self.evicted += 1
+        last_reader = self._last_reader
+        while last_reader and (next(iter(last_reader.values()))[0] <= horizon or len(last_reader) > self.max_entries):
+            last_reader.popitem(last=False)
+
+    def should_process(self, card_int: int, reader_id: int = 0) -> bool:
+        now = time.monotonic()
+        key = (reader_id, card_int)
+        with self._lock:
+            self._expire(now)
+            last = self._seen.get(key)
+            if last is not None and now - last < self._reader_delays.get(reader_id, self._delay):
+                self.suppressed[reader_id] = self.suppressed.get(reader_id, 0) + 1
+                return False
+            if self._cross_reader_seconds > 0:
+                other = self._last_reader.get(card_int)
+                if other is not None and other[1] != reader_id and now - other[0] < self._cross_reader_seconds:
+                    self.suppressed_cross_reader += 1
+                    return False
+                self._last_reader[card_int] = (now, reader_id)
+                self._last_reader.move_to_end(card_int)
+            self._seen[key] = now
+            self._seen.move_to_end(key)
+            self.accepted += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "default_delay_seconds": self._delay,
+                "reader_delay_seconds": {str(r): d for r, d in sorted(self._reader_delays.items())},
+                "cross_reader_seconds": self._cross_reader_seconds,
+                "tracked": len(self._seen),
+                "max_entries": self.max_entries,
+                "accepted": self.accepted,
+                "suppressed": {str(r): n for r, n in sorted(self.suppressed.items())},
+                "suppressed_cross_reader": self.suppressed_cross_reader,
+                "evicted": self.evicted,
+            }
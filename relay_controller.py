@@ -0,0 +1,131 @@
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+
+# Relay modes (same codes the old global relay_status used)
+NORMAL = 0
+OPEN_HOLD = 1
+CLOSE_HOLD = 2
+
+MODE_NAMES = {NORMAL: "normal", OPEN_HOLD: "open_hold", CLOSE_HOLD: "close_hold"}
+
+
+class RelayController:
+    """
+    Per-relay state plus one scheduler thread for timed releases.
+
+    ``pulse()`` energises the relay on the caller's thread (a GPIO write, a
+    few microseconds) and pushes the release deadline onto a heap; the
+    scheduler thread sleeps until the earliest deadline and de-energises.
+    A pulse on a relay that is already pulsing just moves its deadline, so
+    back-to-back grants on any number of lanes create no threads and never
+    block. Holds cancel pending releases; ``release()`` returns to normal.
+
+    ``write(pin, energised)`` performs the actual output; the caller maps
+    energised to the board's active level.
+    """
+
+    def __init__(self, write: Callable[[int, bool], None], pins: Iterable[int], pulse_seconds: float = 1.0):
+        self.logger = logging.getLogger(__name__)
+        self._write = write
+        self.pulse_seconds = pulse_seconds
+        self._cond = threading.Condition()
+        self._heap = []  # (deadline, pin)
+        self._mode: Dict[int, int] = {pin: NORMAL for pin in pins}
+        self._release_at: Dict[int, Optional[float]] = {pin: None for pin in self._mode}
+        self._energised: Dict[int, bool] = {pin: False for pin in self._mode}
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="relay-scheduler", daemon=True)
+        self._thread.start()
+
+    def _set(self, pin: int, energised: bool):
+        """Drive one relay; called with the condition held so writes for a pin never interleave."""
+        try:
+            self._write(pin, energised)
+            self._energised[pin] = energised
+        except Exception as e:
+            self.logger.error(f"Error setting relay {pin}: {e}")
+
+    def _check(self, pin: int):
+        if pin not in self._mode:
+            raise ValueError(f"Unknown relay {pin}")
+
+    def pulse(self, pin: int, seconds: Optional[float] = None) -> bool:
+        """Energise for `seconds` (default pulse_seconds). Returns False if the relay is held."""
+        self._check(pin)
+        deadline = time.monotonic() + (self.pulse_seconds if seconds is None else seconds)
+        with self._cond:
+            if self._mode[pin] != NORMAL:
+                return False
+            if not self._energised[pin]:
+                self._set(pin, True)
+            self._release_at[pin] = deadline
+            heapq.heappush(self._heap, (deadline, pin))
+            if self._heap[0][0] == deadline:
+                self._cond.notify()
+        return True
+
+    def hold_open(self, pin: int):
+        self._check(pin)
+        with self._cond:
+            self._mode[pin] = OPEN_HOLD
+            self._release_at[pin] = None
+            self._set(pin, True)
+
+    def hold_closed(self, pin: int):
+        self._check(pin)
+        with self._cond:
+            self._mode[pin] = CLOSE_HOLD
+            self._release_at[pin] = None
+            self._set(pin, False)
+
+    def release(self, pin: int):
+        """Back to normal (access-controlled) mode; the relay is de-energised unless a pulse is running."""
+        self._check(pin)
+        with self._cond:
+            self._mode[pin] = NORMAL
+            if self._release_at[pin] is None:
+                self._set(pin, False)
+
+    def mode(self, pin: int) -> int:
+        return self._mode[pin]
+
+    def status(self) -> Dict[int, dict]:
+        now = time.monotonic()
+        with self._cond:
+            return {
+                pin: {
+                    "mode": MODE_NAMES[self._mode[pin]],
+                    "energised": self._energised[pin],
+                    "pulse_remaining": round(max(0.0, self._release_at[pin] - now), 3)
+                    if self._release_at[pin] is not None else 0.0,
+                }
+                for pin in self._mode
+            }
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, pin = heapq.heappop(self._heap)
+                    # Entries superseded by a later pulse or cancelled by a hold are skipped
+                    if self._release_at[pin] == deadline:
+                        self._release_at[pin] = None
+                        if self._mode[pin] == NORMAL:
+                            self._set(pin, False)
+                self._cond.wait(self._heap[0][0] - now if self._heap else None)
+
+    def stop(self):
+        """Stop the scheduler and de-energise every relay that is not held open."""
+        with self._cond:
+            self._running = False
+            for pin in self._mode:
+                self._release_at[pin] = None
+                if self._mode[pin] != OPEN_HOLD:
+                    self._set(pin, False)
+            self._cond.notify()
+        self._thread.join(timeout=2)
@@ -0,0 +1,162 @@
+"""
+In-process stand-ins for the pigpio daemon and RPi.GPIO, used when SIMULATION_MODE=true.
+
+integrated_access_camera imports ``pigpio`` and ``GPIO`` from here instead of the
+hardware libraries, so the whole access path (Wiegand decoder, decision, relay
+scheduler, scan pipeline) runs on an ordinary Linux box. Swipes are injected with
+``FakePi.inject_frame``; relay writes are recorded by ``GPIO``.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+from latency import now_us, TICK_MASK
+
+
+def _tick_diff(t1, t2):
+    """pigpio.tickDiff: unsigned microseconds from t1 to t2 across the 32-bit wrap."""
+    return (t2 - t1) & TICK_MASK
+
+
+class _Callback:
+    def __init__(self, pi, gpio, func):
+        self._pi = pi
+        self.gpio = gpio
+        self.func = func
+
+    def cancel(self):
+        self._pi._remove_callback(self)
+
+
+class FakePi:
+    """
+    pigpio.pi() lookalike. Edge callbacks and watchdog timeouts are delivered
+    under one lock, the way the daemon delivers every callback on one thread.
+    Watchdogs fire every timeout_ms while their GPIO has no edges, as in pigpio.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.connected = True
+        self._callbacks = {}  # gpio -> [_Callback]
+        self._watchdogs = {}  # gpio -> [timeout_s, last edge or fire (monotonic)]
+        self._dispatch = threading.Lock()
+        self._cond = threading.Condition()
+        self._watchdog_thread = None
+        self.frames_injected = 0
+
+    # --- pigpio API used by the application ---
+    def set_mode(self, gpio, mode):
+        pass
+
+    def set_pull_up_down(self, gpio, pud):
+        pass
+
+    def callback(self, gpio, edge=0, func=None):
+        cb = _Callback(self, gpio, func)
+        with self._dispatch:
+            self._callbacks.setdefault(gpio, []).append(cb)
+        return cb
+
+    def _remove_callback(self, cb):
+        with self._dispatch:
+            if cb in self._callbacks.get(cb.gpio, []):
+                self._callbacks[cb.gpio].remove(cb)
+
+    def get_current_tick(self):
+        return now_us() & TICK_MASK
+
+    def set_watchdog(self, gpio, timeout_ms):
+        with self._cond:
+            if timeout_ms:
+                self._watchdogs[gpio] = [timeout_ms / 1000.0, time.monotonic()]
+                if self._watchdog_thread is None:
+                    self._watchdog_thread = threading.Thread(target=self._run_watchdogs, name="sim-watchdog", daemon=True)
+                    self._watchdog_thread.start()
+                self._cond.notify()
+            else:
+                self._watchdogs.pop(gpio, None)
+
+    def write(self, gpio, level):
+        pass
+
+    def stop(self):
+        self.connected = False
+
+    # --- simulation ---
+    def _fire(self, gpio, level, tick):
+        for cb in list(self._callbacks.get(gpio, ())):
+            cb.func(gpio, level, tick)
+
+    def inject_frame(self, d0, d1, bits, value, bit_interval_us=2000):
+        """
+        Deliver one Wiegand frame (MSB first) as falling edges on d0/d1. Edges are delivered
+        back to back; their ticks are spaced bit_interval_us apart and end at the current
+        tick, so the last bit's tick is "now" for latency purposes.
+        """
+        end = self.get_current_tick()
+        with self._dispatch:
+            for i in range(bits):
+                gpio = d1 if (value >> (bits - 1 - i)) & 1 else d0
+                watchdog = self._watchdogs.get(gpio)
+                if watchdog:
+                    watchdog[1] = time.monotonic()
+                self._fire(gpio, 0, (end - (bits - 1 - i) * bit_interval_us) & TICK_MASK)
+            self.frames_injected += 1
+
+    def _run_watchdogs(self):
+        while self.connected:
+            with self._cond:
+                if not self._watchdogs:
+                    self._cond.wait(0.5)
+                    continue
+                now = time.monotonic()
+                due = [gpio for gpio, (timeout, last) in self._watchdogs.items() if now - last >= timeout]
+                for gpio in due:
+                    self._watchdogs[gpio][1] = now
+            for gpio in due:
+                with self._dispatch:
+                    self._fire(gpio, pigpio.TIMEOUT, self.get_current_tick())
+            time.sleep(0.001)
+
+
+class _FakeGPIO:
+    """RPi.GPIO lookalike that records output levels per pin."""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self):
+        self.levels = {}
+        self.writes = 0
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode, *args, **kwargs):
+        self.levels.setdefault(pin, self.HIGH)
+
+    def output(self, pin, level):
+        self.levels[pin] = level
+        self.writes += 1
+
+    def input(self, pin):
+        return self.levels.get(pin, self.HIGH)
+
+    def cleanup(self, *args):
+        self.levels.clear()
+
+
+# Module-shaped stand-ins: `from sim_drivers import pigpio, GPIO`
+pigpio = SimpleNamespace(
+    pi=FakePi, tickDiff=_tick_diff,
+    INPUT=0, OUTPUT=1, PUD_OFF=0, PUD_DOWN=1, PUD_UP=2,
+    RISING_EDGE=0, FALLING_EDGE=1, EITHER_EDGE=2, TIMEOUT=2,
+)
+GPIO = _FakeGPIO()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for the memory-mapped compact card database (card_db.py).
+Runs against a temporary file - no Flask app or hardware required.
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from card_db import CardDB, RosterView, build_card_db, write_card_db, make_access_entry, MAX_CARD, FLAG_ALLOWED
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def test_lookups():
+    """Allowed, blocked and unknown cards resolve like the in-memory snapshot."""
+    path = os.path.join(tempfile.mkdtemp(), "cards.mpcd")
+    build_card_db(path, [
+        (5000, make_access_entry(True, False, "Alice"), {"name": "Alice", "id": "u1"}),
+        (12, make_access_entry(False, True), None),
+        (MAX_CARD, make_access_entry(True, True, "Édith"), {"name": "Édith"}),
+        (77, make_access_entry(False, False, skip_photo=True), None),
+    ], stamp="stamp-1")
+    db = CardDB(path)
+
+    ok = True
+    ok &= check(len(db) == 4 and db.stamp == "stamp-1", "header: count and stamp")
+    ok &= check(db.get(5000) == make_access_entry(True, False, "Alice"), "allowed card carries its name")
+    ok &= check(db.get(5000).status == "Access Granted" and db.get(5000).label == "Alice", "allowed card decision")
+    ok &= check(db.get(12) == make_access_entry(False, True), "blocked-only card")
+    ok &= check(db.get(MAX_CARD).status == "Blocked" and db.get(MAX_CARD).name == "Édith",
+                "largest uint32 card, UTF-8 name, blocking wins")
+    ok &= check(db.get(77).status == "Access Denied" and db.get(77).skip_photo, "photo preference for an unknown card")
+    ok &= check(db.get(13) is None and db.get(MAX_CARD + 1) is None and db.get(-1) is None, "unknown cards return None")
+    ok &= check(db.record(5000) == {"name": "Alice", "id": "u1"}, "record() returns stored attributes")
+    db.close()
+    return ok
+
+def test_indexes_and_views():
+    """Name order, id / ref_id indexes and RosterView edits over the mapped file."""
+    path = os.path.join(tempfile.mkdtemp(), "cards.mpcd")
+    roster = {3: {"name": "carol", "id": "u3", "ref_id": "r1"}, 1: {"name": "Bob", "id": "u1", "ref_id": "r1"},
+              2: {"name": "alice", "id": "u2"}}
+    entries = [(c, make_access_entry(True, False, u["name"]), u) for c, u in roster.items()]
+    build_card_db(path, entries + [(9, make_access_entry(False, True), None)])
+    db = CardDB(path)
+
+    ok = True
+    ok &= check([c for c, _ in db.by_name()] == ["2", "1", "3"], "name order is case-insensitive")
+    ok &= check([c for c, _ in db.by_name(("bob", "1"))] == ["3"], "name order resumes after a key")
+    ok &= check(sorted(db.find("ref_id", "r1")) == [1, 3] and db.find("id", "u2") == [2] and db.find("id", "x") == [],
+                "id / ref_id index lookups")
+    ok &= check(db.allowed_count == 3 and db.blocked_count == 1, "allowed / blocked counts")
+
+    copy_path = path + ".copy"
+    write_card_db(copy_path, db.rows(), stamp="s")
+    copy = CardDB(copy_path)
+    ok &= check(list(copy.rows()) == list(db.rows()) and copy.stamp == "s", "rows() round-trips through write_card_db")
+    copy.close()
+
+    users = RosterView(db, "users")
+    blocked = RosterView(db, "blocked", {"1": True, "9": None})
+    ok &= check(len(users) == 3 and users["1"]["name"] == "Bob" and "9" not in users, "users view reads the file")
+    ok &= check(set(blocked) == {"1"} and len(blocked) == 1, "blocked view applies changes over the file")
+    edited = users.copy()
+    edited["4"] = {"name": "Dan", "ref_id": "r1"}
+    del edited["3"]
+    edited["007"] = {"name": "Zed"}  # not a canonical card number: kept in the changes only
+    ok &= check(len(edited) == 4 and len(users) == 3 and "3" in users, "copy() edits do not touch the original")
+    ok &= check(sorted(edited) == ["007", "1", "2", "4"] and edited.find("ref_id", "r1") == ["1", "4"],
+                "iteration and find() include the changes")
+    ok &= check(db.flags(1) & FLAG_ALLOWED and db.flags(5) == 0, "flags() per card")
+    db.close()
+    return ok
+
+def test_large_roster():
+    """Opening is independent of roster size; lookups stay in the microsecond range."""
+    path = os.path.join(tempfile.mkdtemp(), "cards.mpcd")
+    cards = random.sample(range(MAX_CARD), 100000)
+    build_card_db(path, ((c, make_access_entry(True, False, f"User {c}"), {"name": f"User {c}"}) for c in cards))
+
+    start = time.perf_counter()
+    db = CardDB(path)
+    open_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    hits = sum(1 for c in cards[:10000] if db.get(c) is not None)
+    lookup_us = (time.perf_counter() - start) / 10000 * 1e6
+    print(f"   open: {open_ms:.2f} ms, lookup: {lookup_us:.1f} µs")
+
+    ok = check(hits == 10000, "every card found in a 100k roster")
+    ok &= check(open_ms < 50, "open maps the file without parsing it")
+    db.close()
+    return ok
+
+def main():
+    print("🧪 Testing Card Database")
+    print("=" * 50)
+    results = [test_lookups(), test_indexes_and_views(), test_large_roster()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory daily statistics counters (daily_stats.py).
+Runs against a temporary file - no Flask app or hardware required.
+"""
+
+import os
+import sys
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from daily_stats import DailyStats
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def test_counters_and_flush():
+    """Counters live in memory until flush() writes them out."""
+    path = os.path.join(tempfile.mkdtemp(), "daily_stats.json")
+    stats = DailyStats(path)
+    stats.record("Access Granted", 1)
+    stats.record("Access Granted", 2)
+    stats.record("Access Denied", 1)
+    stats.record("Blocked", 2)
+    stats.record("Unknown Status", 1)
+
+    today = stats.day(datetime.now().strftime('%Y-%m-%d'))
+    ok = True
+    ok &= check((today["valid_entries"], today["invalid_entries"], today["blocked_entries"]) == (2, 1, 1),
+                "status counters incremented")
+    ok &= check(today["readers"]["1"] == {"valid_entries": 1, "invalid_entries": 1, "blocked_entries": 0},
+                "per-reader breakdown kept")
+    ok &= check(not os.path.exists(path), "record() does no file I/O")
+    ok &= check(stats.flush() and not stats.flush(), "flush() writes once, then skips while clean")
+    ok &= check(DailyStats(path).day(today["date"]) == today, "flushed counters reload after restart")
+
+    last = stats.last_days(20)
+    ok &= check(len(last) == 20 and last[-1]["date"] == today["date"], "last_days() is oldest-first ending today")
+    return ok
+
+def test_prune():
+    """Days outside the retention window are dropped."""
+    path = os.path.join(tempfile.mkdtemp(), "daily_stats.json")
+    old = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    with open(path, "w") as f:
+        json.dump({old: {"date": old, "valid_entries": 3, "invalid_entries": 0, "blocked_entries": 0}}, f)
+    stats = DailyStats(path, retention_days=20)
+    ok = check(stats.prune() == 1 and stats.day(old)["valid_entries"] == 0, "prune() removes expired days")
+    return ok
+
+def main():
+    print("🧪 Testing Daily Stats")
+    print("=" * 50)
+    results = [test_counters_and_flush(), test_prune()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for the access-path latency histograms (latency.py).
+No Flask app, pigpio daemon or hardware required.
+"""
+
+import os
+import sys
+import random
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from latency import LatencyHistogram, LatencyTracker, TickClock, tick_diff, now_us, TICK_MASK
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def test_percentiles():
+    """Percentiles land within one bucket (10%) of the exact values."""
+    values = [random.randint(200, 80000) for _ in range(20000)]
+    hist = LatencyHistogram(sla_us=50000)
+    for v in values:
+        hist.record(v)
+    values.sort()
+
+    ok = True
+    for p in (50, 95, 99):
+        exact = values[int(len(values) * p / 100) - 1]
+        approx = hist.percentile(p)
+        ok &= check(exact <= approx <= exact * 1.1 + 1, f"p{p}: {approx} µs vs exact {exact} µs")
+    ok &= check(hist.max == values[-1] and hist.count == len(values), "max and count are exact")
+    ok &= check(hist.over_sla == sum(1 for v in values if v > 50000), "over_sla counts values above the SLA")
+    ok &= check(LatencyHistogram().percentile(99) == 0, "empty histogram reports 0")
+    return ok
+
+def test_ticks_and_tracker():
+    """pigpio ticks convert to the local clock across the 32-bit wrap; traces feed per-reader stages."""
+    ok = check(tick_diff(TICK_MASK - 10, 5) == 16 and tick_diff(5, TICK_MASK - 10) == -16, "tick_diff handles wrap")
+
+    # Fake daemon clock that is about to wrap
+    base_local = now_us()
+    daemon_offset = TICK_MASK - 1000
+    fake_tick = lambda: (now_us() - base_local + daemon_offset) & TICK_MASK
+    clock = TickClock()
+    ok &= check(clock.to_local_us(123) is None, "uncalibrated clock returns None")
+    clock.calibrate(fake_tick)
+    edge_tick = fake_tick()
+    edge_local = now_us()
+    ok &= check(abs(clock.to_local_us(edge_tick) - edge_local) < 2000, "tick maps onto the local clock")
+    ok &= check(abs(clock.to_local_us((edge_tick + 5000) & TICK_MASK) - (edge_local + 5000)) < 2000,
+                "mapping holds after the tick wraps")
+
+    tracker = LatencyTracker(sla_ms=100)
+    trace = tracker.trace(1, start_us=now_us() - 3000)
+    trace.mark("decision")
+    trace.mark("relay")
+    tracker.trace(2).mark("decision")
+    snap = tracker.snapshot()
+    ok &= check(set(snap["readers"]) == {"1", "2"} and set(snap["readers"]["1"]) == {"decision", "relay"},
+                "stages are kept per reader")
+    ok &= check(snap["readers"]["1"]["decision"]["p50_ms"] >= 2.7 and snap["sla_ms"] == 100, "elapsed time starts at the trace start")
+    tracker.reset()
+    ok &= check(tracker.snapshot()["readers"] == {}, "reset() clears the histograms")
+    return ok
+
+def main():
+    print("🧪 Testing Latency Histograms")
+    print("=" * 50)
+    results = [test_percentiles(), test_ticks_and_tracker()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -124,7 +124,7 @@ def check_firestore_code_consistency():
             print_success("Cache file is preserved (not deleted)")
         
         # Check if cache is always called
-        if 'cache_transaction(transaction)' in content:
+        if 'cache_transactions(batch)' in content:
             print_success("Cache function is used")
         else:
             print_error("Cache function not found")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the scan rate limiter (rate_limiter.py).
+No Flask app, pigpio daemon or hardware required.
+"""
+
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import ScanRateLimiter
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def test_windows():
+    """Per-reader windows, the cross-reader policy and suppression counters."""
+    limiter = ScanRateLimiter(delay_seconds=0.3, reader_delays={2: 0.1})
+    ok = check(limiter.should_process(1001, 1) and not limiter.should_process(1001, 1), "repeat on the same reader suppressed")
+    ok &= check(limiter.should_process(1001, 2), "exit scan on another reader right after entry is accepted")
+    time.sleep(0.15)
+    ok &= check(limiter.should_process(1001, 2) and not limiter.should_process(1001, 1),
+                "reader 2 uses its own shorter window, reader 1 the default")
+    time.sleep(0.2)
+    ok &= check(limiter.should_process(1001, 1), "accepted again once the window has passed")
+
+    stats = limiter.stats()
+    ok &= check(stats["accepted"] == 4 and stats["suppressed"] == {"1": 2}, f"counters: {stats['accepted']} accepted, {stats['suppressed']} suppressed")
+
+    limiter.delay = 5
+    ok &= check(not limiter.should_process(1001, 1) and limiter.reader_delay(1) == 5, "delay can be changed at runtime")
+
+    dedup = ScanRateLimiter(delay_seconds=0.1, cross_reader_seconds=0.3)
+    ok &= check(dedup.should_process(7, 1) and not dedup.should_process(7, 3), "cross-reader dedup suppresses the neighbouring reader")
+    time.sleep(0.15)
+    ok &= check(dedup.should_process(7, 1), "the accepting reader still follows its own window")
+    ok &= check(dedup.stats()["suppressed_cross_reader"] == 1, "cross-reader suppressions counted separately")
+    return ok
+
+def test_bounded_memory():
+    """Memory follows recently active cards, not every card ever seen."""
+    limiter = ScanRateLimiter(delay_seconds=0.1)
+    for card in range(5000):
+        limiter.should_process(card, 1)
+    ok = check(limiter.stats()["tracked"] == 5000, "active cards are tracked")
+    time.sleep(0.15)
+    limiter.should_process(99999, 1)
+    stats = limiter.stats()
+    ok &= check(stats["tracked"] == 1 and stats["evicted"] == 5000, "expired cards evicted on the next scan")
+
+    capped = ScanRateLimiter(delay_seconds=60, max_entries=100)
+    for card in range(1000):
+        capped.should_process(card, 1)
+    ok &= check(capped.stats()["tracked"] == 100, "max_entries caps a flood of distinct cards")
+    ok &= check(capped.should_process(0, 1) and not capped.should_process(999, 1),
+                "least recently accepted cards are dropped first")
+
+    start = time.perf_counter()
+    for card in range(50000):
+        limiter.should_process(card % 2000, card % 3)
+    per_call_us = (time.perf_counter() - start) / 50000 * 1e6
+    ok &= check(per_call_us < 20, f"should_process: {per_call_us:.2f} µs per call")
+    return ok
+
+def main():
+    print("🧪 Testing Scan Rate Limiter")
+    print("=" * 50)
+    results = [test_windows(), test_bounded_memory()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
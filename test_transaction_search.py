@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for the transaction search index (transaction_search.py).
+Runs against a temporary transaction store - no Flask app or hardware required.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from transaction_store import TransactionStore
+from transaction_search import TransactionSearchIndex
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def make_txn(ts, card, name):
+    return {"name": name, "card": str(card), "reader": 1, "status": "Access Granted",
+            "timestamp": ts, "entity_id": "test_entity"}
+
+def test_search():
+    """Index built from the store answers name and card queries newest-first."""
+    store = TransactionStore(os.path.join(tempfile.mkdtemp(), "transactions.db"))
+    now = int(time.time())
+    store.add(make_txn(now - 5 * 86400, 111, "Alice Smith"))
+    store.add(make_txn(now - 300, 222, "Bob Alison"))
+    store.add(make_txn(now - 200, 111, "Alice Smith"))
+
+    index = TransactionSearchIndex()
+    index.build(store.iter_search_rows(store.last_seq))
+    seq = store.add(make_txn(now - 100, 333, "Carol Ng"))
+    index.add(seq, now - 100, "333", "Carol Ng")
+
+    ok = True
+    refs = index.search_name("ALI", 0, now)
+    ok &= check([tx["name"] for tx in store.fetch(refs)] == ["Alice Smith", "Bob Alison", "Alice Smith"],
+                "substring match across names, newest first")
+    ok &= check(index.search_name("ali", now - 3600, now, limit=1) == [(now - 200, refs[0][1])],
+                "time range and limit honoured")
+    ok &= check(len(index.search_name("ng", 0, now)) == 1, "short queries scan distinct names")
+    ok &= check(index.search_name("zzz", 0, now) == [], "no match returns nothing")
+    ok &= check([ts for ts, _ in index.search_card("111", 0, now)] == [now - 200, now - 5 * 86400],
+                "card index is newest-first")
+
+    index.add(seq + 1, now - 250, "111", "Alice Smith")
+    ok &= check([ts for ts, _ in index.search_card("111", 0, now)][:2] == [now - 200, now - 250],
+                "out-of-order inserts stay sorted")
+
+    store.drop_expired_segments(now - 86400)
+    index.trim(store.time_bounds()[0])
+    ok &= check(len(index.search_card("111", 0, now)) == 2, "trim() forgets dropped segments")
+    return ok
+
+def main():
+    print("🧪 Testing Transaction Search Index")
+    print("=" * 50)
+    results = [test_search()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite transaction store (transaction_store.py).
+Runs against a temporary database - no Flask app or hardware required.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from transaction_store import TransactionStore
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def make_txn(ts, card, name, status="Access Granted", reader=1):
+    return {
+        "name": name,
+        "card": str(card),
+        "reader": reader,
+        "status": status,
+        "timestamp": ts,
+        "entity_id": "test_entity"
+    }
+
+def test_reads_and_writes():
+    """Insert transactions and exercise the indexed read paths."""
+    tmp = tempfile.mkdtemp()
+    store = TransactionStore(os.path.join(tmp, "transactions.db"))
+    now = int(time.time())
+
+    store.add(make_txn(now - 3 * 86400, 111, "Alice Smith"))
+    store.add(make_txn(now - 60, 222, "Bob Jones", status="Access Denied"))
+    store.add(make_txn(now - 30, 111, "Alice Smith"))
+    store.add(make_txn(now, 333, "Blocked User", status="Blocked"))
+
+    ok = True
+    ok &= check(store.count() == 4, "count() returns all rows")
+
+    latest = store.latest(2)
+    ok &= check([tx["card"] for tx in latest] == ["333", "111"], "latest() is newest-first top-N")
+
+    counts = store.status_counts(now - 3600, now)
+    ok &= check(counts == {"Access Denied": 1, "Access Granted": 1, "Blocked": 1}, "status_counts() honours the time range")
+
+    hits = store.search_name("alice", 0, now)
+    ok &= check(len(hits) == 2 and hits[0]["timestamp"] == now - 30, "search_name() is case-insensitive and newest-first")
+    ok &= check(store.search_name("%", 0, now) == [], "search_name() escapes LIKE wildcards")
+
+    oldest, newest = store.time_bounds()
+    ok &= check((oldest, newest) == (now - 3 * 86400, now), "time_bounds() returns oldest/newest")
+
+    unsynced = store.unsynced()
+    ok &= check(len(unsynced) == 4 and store.count_unsynced() == 4, "all rows start unsynced")
+    ok &= check([tx["id"] for tx in unsynced] == sorted(tx["id"] for tx in unsynced), "sequence ids are monotonic")
+    store.advance_sync_cursor(unsynced[1]["id"])
+    ok &= check(store.count_unsynced() == 2, "advance_sync_cursor() marks a whole batch synced")
+    ok &= check(store.unsynced(limit=1)[0]["id"] == unsynced[2]["id"], "unsynced() resumes after the cursor")
+    reopened = TransactionStore(store.path)
+    ok &= check(reopened.last_synced_seq == unsynced[1]["id"], "sync cursor survives a restart")
+
+    page = store.page(0, now, limit=2)
+    rest = store.page(0, now, limit=10, before=(page[-1]["timestamp"], page[-1]["id"]))
+    ok &= check([tx["timestamp"] for tx in page + rest] == [now, now - 30, now - 60, now - 3 * 86400],
+                "page() walks the history newest-first by keyset")
+    ok &= check([tx["card"] for tx in store.page(0, now, status="Access Granted", card="111")] == ["111", "111"],
+                "page() applies status and card filters")
+    ok &= check(store.page(0, now, reader=2) == [], "page() applies the reader filter")
+
+    ok &= check(len(store.segment_days()) >= 2, "transactions are partitioned into day segments")
+    stale_days = store.segment_days()  # a reader's day list taken just before retention runs
+    deleted = store.drop_expired_segments(now - 86400)
+    ok &= check(deleted == 1 and store.count() == 3, "drop_expired_segments() drops whole expired days")
+    ok &= check(store.latest(10)[-1]["timestamp"] == now - 60, "expired segment no longer readable")
+    ok &= check(len(store._newest_first(stale_days, "1", (), 10)) == 3, "a read racing the drop skips the dropped segment")
+    return ok
+
+def test_single_table_partitioning():
+    """A database from before partitioning is split into day segments, keeping ids and sync state."""
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "transactions.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp INTEGER NOT NULL, "
+                 "card TEXT, name TEXT, name_lower TEXT, reader INTEGER, status TEXT, entity_id TEXT, "
+                 "synced_to_firestore INTEGER DEFAULT 0)")
+    for ts, synced in ((100, 1), (100 + 86400, 1), (100 + 2 * 86400, 0)):
+        conn.execute("INSERT INTO transactions (timestamp, card, name, name_lower, reader, status, entity_id, "
+                     "synced_to_firestore) VALUES (?, '1', 'A', 'a', 1, 'Access Granted', 'e', ?)", (ts, synced))
+    conn.commit()
+    conn.close()
+
+    store = TransactionStore(path)
+    ok = True
+    ok &= check(store.count() == 3 and len(store.segment_days()) == 3, "old table split into one segment per day")
+    ok &= check(store.last_synced_seq == 2 and [tx["id"] for tx in store.unsynced()] == [3], "sync cursor carried over")
+    ok &= check(store.add(make_txn(int(time.time()), 9, "New")) == 4, "sequence continues after the migrated ids")
+    return ok
+
+def test_legacy_migration():
+    """The legacy JSON array cache is imported once."""
+    tmp = tempfile.mkdtemp()
+    legacy_json = os.path.join(tmp, "transactions_cache.json")
+    with open(legacy_json, "w") as f:
+        json.dump([dict(make_txn(100, 1, "Old One"), synced_to_firestore=True),
+                   dict(make_txn(200, 2, "Old Two"), synced_to_firestore=True),
+                   make_txn(300, 3, "Old Three")], f)
+
+    store = TransactionStore(os.path.join(tmp, "transactions.db"), legacy_paths=(legacy_json,))
+
+    ok = True
+    ok &= check(store.count() == 3, "legacy records imported")
+    ok &= check(store.count_unsynced() == 1 and store.unsynced()[0]["timestamp"] == 300, "sync cursor placed after the synced prefix")
+    ok &= check(not os.path.exists(legacy_json) and os.path.exists(legacy_json + ".migrated"), "legacy file renamed after import")
+    return ok
+
+def main():
+    print("🧪 Testing Transaction Store")
+    print("=" * 50)
+    results = [test_reads_and_writes(), test_legacy_migration(), test_single_table_partitioning()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
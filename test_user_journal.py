@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for the journaled user roster persistence (user_journal.py).
+Runs against temporary files - no Flask app or hardware required.
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from user_journal import JournaledDict
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def test_journal_replay_and_compaction():
+    """Changes are appended, replayed on load and folded into the snapshot."""
+    snapshot = os.path.join(tempfile.mkdtemp(), "users.json")
+    with open(snapshot, "w") as f:
+        json.dump({"100": {"name": "Existing"}}, f)
+
+    journal = JournaledDict(snapshot, compact_every=3)
+    ok = True
+    ok &= check(journal.put("200", {"name": "Added"}) is False, "single put is one append")
+    ok &= check(journal.delete("100") is False, "single delete is one append")
+    with open(snapshot) as f:
+        ok &= check(json.load(f) == {"100": {"name": "Existing"}}, "snapshot untouched by appends")
+
+    data = JournaledDict(snapshot).load()
+    ok &= check(data == {"200": {"name": "Added"}}, "load() replays journal over snapshot")
+
+    with open(journal.journal_path, "a") as f:
+        f.write('{"op": "put", "key": "30')  # torn write from a crash
+    ok &= check(JournaledDict(snapshot).load() == data, "torn trailing line is ignored")
+
+    journal = JournaledDict(snapshot, compact_every=3)
+    journal.load()
+    ok &= check(journal.record_many(puts={"300": {"name": "Bulk"}}, deletes=["200"]), "compaction due after threshold")
+    data = journal.load()
+    journal.compact(data)
+    with open(snapshot) as f:
+        ok &= check(json.load(f) == {"300": {"name": "Bulk"}}, "compact() writes the merged snapshot")
+    ok &= check(os.path.getsize(journal.journal_path) == 0, "compact() truncates the journal")
+    return ok
+
+def test_pending_and_first_snapshot():
+    """pending counts changes not in the snapshot; compaction creates a missing snapshot."""
+    snapshot = os.path.join(tempfile.mkdtemp(), "blocked_users.json")
+    journal = JournaledDict(snapshot, compact_every=1000)
+    ok = check(journal.load() == {} and journal.pending == 0, "no files: empty roster, nothing pending")
+    journal.put("42", True)
+    journal.record_many(puts={"43": True}, deletes=["42"])
+    ok &= check(journal.pending == 3 and not os.path.exists(snapshot), "changes are pending until compacted")
+    ok &= check(JournaledDict(snapshot).load() == {"43": True}, "pending changes survive a restart via the journal")
+
+    journal.compact({"43": True})
+    with open(snapshot) as f:
+        ok &= check(json.load(f) == {"43": True}, "compaction writes the first snapshot")
+    ok &= check(journal.pending == 0 and not os.path.exists(snapshot + ".tmp"), "nothing pending, no temp file left")
+    return ok
+
+def test_rotation():
+    """rotate() + compact_rotated() fold a copy while later changes go to a fresh journal."""
+    snapshot = os.path.join(tempfile.mkdtemp(), "users.json")
+    journal = JournaledDict(snapshot, compact_every=1000)
+    journal.compact({"1": {"name": "A"}})
+    journal.put("2", {"name": "B"})
+    journal.rotate()
+    journal.delete("1")
+    ok = check(journal.pending == 1 and os.path.exists(journal.rotated_path), "rotation starts a fresh journal")
+    ok &= check(JournaledDict(snapshot).load() == {"2": {"name": "B"}} and journal.final_state() == {"2": {"name": "B"}, "1": None},
+                "a crash mid-rotation replays both journals")
+
+    journal.rotate()  # unfinished rotation: the live entries are appended to it
+    journal.put("3", {"name": "C"})
+    ok &= check(JournaledDict(snapshot).load() == {"2": {"name": "B"}, "3": {"name": "C"}}, "repeated rotation keeps every entry")
+
+    journal.compact_rotated({"2": {"name": "B"}})
+    with open(snapshot) as f:
+        ok &= check(json.load(f) == {"2": {"name": "B"}} and not os.path.exists(journal.rotated_path),
+                    "compact_rotated writes the copy and drops the rotated journal")
+    ok &= check(JournaledDict(snapshot).load() == {"2": {"name": "B"}, "3": {"name": "C"}}, "later changes stay in the journal")
+    return ok
+
+def main():
+    print("🧪 Testing User Journal")
+    print("=" * 50)
+    results = [test_journal_replay_and_compaction(), test_pending_and_first_snapshot(), test_rotation()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -145,6 +145,53 @@ def test_user_management():
     except requests.exceptions.RequestException as e:
         print(f"❌ Delete user error: {e}")
     
+    # Test 8a: Versioned delta sync
+    print("\n8a. Testing roster version and delta sync...")
+    try:
+        state = requests.get(f"{base_url}/roster_version", timeout=10).json()
+        version = state['roster_version']
+        stale = requests.post(f"{base_url}/bulk_users", params={'api_key': api_key},
+                              json={'since': version - 1, 'block': ['123456789']}, timeout=10)
+        fresh = requests.post(f"{base_url}/bulk_users", params={'api_key': api_key},
+                              json={'since': version, 'unblock': ['123456789']}, timeout=10)
+        check = requests.get(f"{base_url}/roster_version",
+                             params={'since': fresh.json().get('roster_version'), 'roster_id': state['roster_id']},
+                             timeout=10).json()
+        if stale.status_code == 409 and fresh.status_code == 200 and check.get('in_sync'):
+            print(f"✅ Delta sync working: version {version} -> {check['roster_version']}, stale delta rejected")
+        else:
+            print(f"❌ Delta sync failed: stale={stale.status_code} fresh={fresh.status_code} check={check}")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Delta sync error: {e}")
+    
+    # Test 8b: A replace without upserts must not empty the roster unless confirmed
+    print("\n8b. Testing unconfirmed empty replace...")
+    try:
+        before = len(requests.get(f"{base_url}/get_users", timeout=10).json())
+        response = requests.post(f"{base_url}/bulk_users", params={'api_key': api_key},
+                                 json={'replace': True}, timeout=10)
+        after = len(requests.get(f"{base_url}/get_users", timeout=10).json())
+        if response.status_code == 400 and before == after:
+            print(f"✅ Empty replace rejected without confirm_empty ({after} users kept)")
+        else:
+            print(f"❌ Empty replace not rejected: {response.status_code} - users {before} -> {after}")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Empty replace error: {e}")
+    
+    # Test 8c: Op values must be lists (a string must not be split into one-digit cards)
+    print("\n8c. Testing non-list bulk op...")
+    try:
+        before = len(requests.get(f"{base_url}/get_users", timeout=10).json())
+        response = requests.post(f"{base_url}/bulk_users", params={'api_key': api_key},
+                                 json={'delete': '123'}, timeout=10)
+        after = len(requests.get(f"{base_url}/get_users", timeout=10).json())
+        if response.status_code == 400 and before == after:
+            print(f"✅ Non-list delete rejected ({after} users kept)")
+        else:
+            print(f"❌ Non-list delete not rejected: {response.status_code} - users {before} -> {after}")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Non-list bulk op error: {e}")
+    
     # Test 9: Get users again (should be empty now)
     print("\n9. Testing get users after delete...")
     try:
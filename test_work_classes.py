@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for priority classes, bounded queues and load shedding (work_classes.py).
+No Flask app, cameras or hardware required.
+"""
+
+import os
+import sys
+import time
+import threading
+from queue import Full
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from work_classes import (BoundedExecutor, ShedQueue, FailureBreaker, start_worker, set_switch_interval,
+                          snapshot, CAPTURE, UPLOAD, CLEANUP, CLASS_NICE)
+
+# Color codes for terminal output
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+def check(condition, message):
+    if condition:
+        print(f"{GREEN}✅ {message}{RESET}")
+    else:
+        print(f"{RED}❌ {message}{RESET}")
+    return bool(condition)
+
+def test_shedding():
+    """Bounded executors and queues shed instead of growing; breakers skip a dead camera."""
+    executor = BoundedExecutor(CAPTURE, max_workers=2, max_pending=2, name="test-capture")
+    release = threading.Event()
+    start = time.perf_counter()
+    futures = [executor.try_submit(release.wait, 5) for _ in range(1000)]
+    submit_ms = (time.perf_counter() - start) * 1000
+    admitted = [f for f in futures if f is not None]
+    ok = check(len(admitted) == 4 and executor.shed == 996, "a stalled capture class holds 4 jobs and sheds the rest")
+    ok &= check(submit_ms < 100, f"1000 submissions onto a full class took {submit_ms:.1f} ms (never blocks)")
+    release.set()
+    for f in admitted:
+        f.result(timeout=5)
+    time.sleep(0.05)
+    ok &= check(executor.stats()["in_use"] == 0 and executor.try_submit(lambda: None) is not None,
+                "slots are returned when jobs finish")
+
+    queue = ShedQueue(UPLOAD, maxsize=3, name="test-upload")
+    refused = 0
+    for i in range(10):
+        try:
+            queue.put(i, block=False)
+        except Full:
+            refused += 1
+    ok &= check(refused == 7 and queue.stats() == {"name": "test-upload", "in_use": 3, "capacity": 3, "admitted": 3, "shed": 7},
+                "bounded upload queue counts shed items")
+
+    breaker = FailureBreaker(CAPTURE, "test-camera", threshold=2, cooldown=0.1)
+    breaker.failure()
+    ok &= check(breaker.allow(), "closed below the failure threshold")
+    breaker.failure()
+    ok &= check(not breaker.allow() and breaker.stats()["open"], "open after consecutive failures")
+    time.sleep(0.12)
+    ok &= check(breaker.allow() and not breaker.allow(), "one probe after the cooldown")
+    breaker.success()
+    ok &= check(breaker.allow() and breaker.shed == 2, "closed again after a successful probe")
+
+    classes = snapshot()
+    ok &= check([c["name"] for c in classes[CAPTURE]["components"]][:2] == ["test-capture", "test-camera"]
+                and classes[CLEANUP]["nice"] == CLASS_NICE[CLEANUP], "snapshot lists components per class")
+    return ok
+
+def _spin(stop):
+    x = 0
+    while not stop.is_set():
+        for i in range(1000):
+            x += i * i
+
+def _wake_delays_ms(samples=300):
+    """How late a thread waking every 2 ms gets the GIL back (the pigpio callback's situation)."""
+    delays = []
+    for _ in range(samples):
+        t = time.perf_counter()
+        time.sleep(0.002)
+        delays.append((time.perf_counter() - t - 0.002) * 1000)
+    delays.sort()
+    return delays[len(delays) // 2], delays[int(len(delays) * 0.99)]
+
+def test_isolation():
+    """A CPU-bound background flood delays the realtime thread by about one switch interval."""
+    default_interval = sys.getswitchinterval()
+    results = {}
+    for interval_ms in (default_interval * 1000, 1):
+        set_switch_interval(interval_ms)
+        stop = threading.Event()
+        flood = [start_worker(CLEANUP, _spin, stop) for _ in range(2)]
+        time.sleep(0.05)
+        results[interval_ms] = _wake_delays_ms()
+        stop.set()
+        for thread in flood:
+            thread.join()
+    sys.setswitchinterval(default_interval)
+
+    (slow_p50, slow_p99), (fast_p50, fast_p99) = results.values()
+    print(f"   wake-up delay under flood: default interval p50 {slow_p50:.2f} ms / p99 {slow_p99:.2f} ms, "
+          f"1 ms interval p50 {fast_p50:.2f} ms / p99 {fast_p99:.2f} ms")
+    ok = check(fast_p50 < 3, "median GIL wait under a background flood stays under 3 ms")
+    ok &= check(fast_p50 < slow_p50, "shorter switch interval reduces the wait")
+    return ok
+
+def main():
+    print("🧪 Testing Work Classes")
+    print("=" * 50)
+    results = [test_shedding(), test_isolation()]
+    print("=" * 50)
+    passed = sum(1 for r in results if r)
+    print(f"🎯 {passed}/{len(results)} test groups passed")
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,171 @@
+import heapq
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+NGRAM = 3
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class _Postings:
+    """Parallel (timestamp, seq) arrays kept sorted by (timestamp, seq)."""
+
+    __slots__ = ("ts", "seq")
+
+    def __init__(self):
+        self.ts = array("q")
+        self.seq = array("q")
+
+    def add(self, ts: int, seq: int):
+        n = len(self.ts)
+        if n == 0 or (ts, seq) >= (self.ts[-1], self.seq[-1]):
+            self.ts.append(ts)
+            self.seq.append(seq)
+            return
+        # Out-of-order insert (clock adjustment or backfill): keep the arrays sorted
+        i = bisect_right(self.ts, ts)
+        while i > 0 and self.ts[i - 1] == ts and self.seq[i - 1] > seq:
+            i -= 1
+        self.ts.insert(i, ts)
+        self.seq.insert(i, seq)
+
+    def newest(self, start: int, end: int, limit: int) -> List[Tuple[int, int]]:
+        lo = bisect_left(self.ts, start)
+        hi = bisect_right(self.ts, end)
+        return [(self.ts[i], self.seq[i]) for i in range(hi - 1, max(lo, hi - limit) - 1, -1)]
+
+    def trim(self, cutoff: int) -> int:
+        i = bisect_left(self.ts, cutoff)
+        if i:
+            del self.ts[:i]
+            del self.seq[:i]
+        return i
+
+
+class TransactionSearchIndex:
+    """
+    In-memory search index over the transaction store.
+
+    Names are indexed by character trigrams, so a substring query intersects a
+    few small sets of distinct names instead of scanning every row; queries
+    shorter than a trigram scan the distinct names (bounded by the roster).
+    Each distinct name and each card number keeps time-ordered (timestamp,
+    seq) postings, so results come back newest first with a bisect per key.
+    The index only holds references; rows are fetched from the store by seq.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._names: Dict[str, _Postings] = {}
+        self._cards: Dict[str, _Postings] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self.ready = False
+
+    def add(self, seq: int, timestamp: int, card, name):
+        """Index one stored transaction."""
+        name_key = str(name or "").lower()
+        card_key = str(card or "")
+        with self._lock:
+            self._add_locked(seq, int(timestamp), card_key, name_key)
+
+    def _add_locked(self, seq: int, ts: int, card_key: str, name_key: str):
+        postings = self._names.get(name_key)
+        if postings is None:
+            postings = self._names[name_key] = _Postings()
+            for gram in _ngrams(name_key):
+                self._grams.setdefault(gram, set()).add(name_key)
+        postings.add(ts, seq)
+        if card_key:
+            self._cards.setdefault(card_key, _Postings()).add(ts, seq)
+
+    def build(self, rows: Iterable[Tuple[int, int, str, str]], chunk: int = 1000):
+        """Bulk-load (seq, timestamp, card, name) rows; the lock is released between chunks."""
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk:
+                total += self._load(batch)
+                batch = []
+        total += self._load(batch)
+        self.ready = True
+        self.logger.info(f"Transaction search index built: {total} rows, "
+                         f"{len(self._names)} names, {len(self._cards)} cards")
+        return total
+
+    def _load(self, batch) -> int:
+        with self._lock:
+            for seq, ts, card, name in batch:
+                self._add_locked(seq, int(ts), str(card or ""), str(name or "").lower())
+        return len(batch)
+
+    def _matching_names(self, query: str) -> List[str]:
+        if len(query) < NGRAM:
+            return [name for name in self._names if query in name]
+        sets = []
+        for gram in _ngrams(query):
+            names = self._grams.get(gram)
+            if not names:
+                return []
+            sets.append(names)
+        sets.sort(key=len)
+        candidates = set.intersection(*sets)
+        return [name for name in candidates if query in name]
+
+    @staticmethod
+    def _merge(postings: List[_Postings], start: int, end: int, limit: int) -> List[Tuple[int, int]]:
+        candidates = []
+        for p in postings:
+            candidates.extend(p.newest(start, end, limit))
+        return heapq.nlargest(limit, candidates)
+
+    def search_name(self, query: str, start: int, end: int, limit: int = 100) -> List[Tuple[int, int]]:
+        """Newest-first (timestamp, seq) refs whose name contains query (case-insensitive)."""
+        query = query.lower()
+        with self._lock:
+            postings = [self._names[name] for name in self._matching_names(query)]
+            return self._merge(postings, start, end, limit)
+
+    def search_card(self, card, start: int, end: int, limit: int = 100) -> List[Tuple[int, int]]:
+        """Newest-first (timestamp, seq) refs for one card number."""
+        with self._lock:
+            postings = self._cards.get(str(card))
+            return self._merge([postings], start, end, limit) if postings else []
+
+    def trim(self, cutoff: int) -> int:
+        """Forget every reference older than cutoff (called after retention drops segments)."""
+        removed = 0
+        with self._lock:
+            for name in list(self._names):
+                postings = self._names[name]
+                removed += postings.trim(cutoff)
+                if not len(postings.ts):
+                    del self._names[name]
+                    for gram in _ngrams(name):
+                        names = self._grams.get(gram)
+                        if names is not None:
+                            names.discard(name)
+                            if not names:
+                                del self._grams[gram]
+            for card in list(self._cards):
+                postings = self._cards[card]
+                postings.trim(cutoff)
+                if not len(postings.ts):
+                    del self._cards[card]
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "entries": sum(len(p.ts) for p in self._names.values()),
+                "names": len(self._names),
+                "cards": len(self._cards),
+            }
@@ -0,0 +1,465 @@
+import os
+import json
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class TransactionStore:
+    """
+    Local transaction store backed by SQLite in WAL mode, partitioned by day.
+
+    Each local calendar day lives in its own segment table (``tx_YYYYMMDD``)
+    indexed on timestamp, card and lowercase name. Retention drops whole
+    expired segments instead of deleting row by row, and range queries only
+    open the segments whose day falls inside the requested window. Each
+    thread gets its own connection; WAL lets the Flask readers proceed while
+    the uploader thread writes.
+
+    Every row carries a ``seq`` (exposed as ``id``) that increases
+    monotonically across segments. Firestore sync state is a single persisted
+    high-water mark, ``last_synced_seq``: rows with a higher seq are pending,
+    so finding the next batch only touches segments whose newest seq is past
+    the cursor and marking a batch synced is one row update.
+    """
+
+    COLUMNS = ("id", "timestamp", "card", "name", "reader", "status", "entity_id")
+    SELECT_COLUMNS = "seq AS id, timestamp, card, name, reader, status, entity_id"
+    SEGMENT_PREFIX = "tx_"
+
+    def __init__(self, path: str, legacy_paths: Tuple[str, ...] = ()):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # day -> [row_count, max_seq]; _days is replaced (never mutated) so readers can iterate it lock-free
+        self._segments: Dict[str, List[int]] = {}
+        self._days: Tuple[str, ...] = ()
+
+        self._create_schema()
+        self.store_id = self._get_meta("store_id")
+        if self.store_id is None:
+            self.store_id = uuid.uuid4().hex[:12]
+            self._set_meta("store_id", self.store_id)
+        self._cursor = self._load_cursor()
+        self._load_segments()
+        self._migrate_single_table()
+        self._seq = max([self._cursor] + [s[1] for s in self._segments.values()])
+
+        for legacy_path in legacy_paths:
+            if legacy_path and os.path.exists(legacy_path):
+                self._import_legacy(legacy_path)
+
+    # ---------- connection / schema ----------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @staticmethod
+    def _day_of(timestamp: int) -> str:
+        return datetime.fromtimestamp(max(int(timestamp), 0)).strftime("%Y%m%d")
+
+    def _table(self, day: str) -> str:
+        return self.SEGMENT_PREFIX + day
+
+    def _create_segment(self, conn: sqlite3.Connection, day: str):
+        table = self._table(day)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                seq INTEGER PRIMARY KEY,
+                timestamp INTEGER NOT NULL,
+                card TEXT,
+                name TEXT,
+                name_lower TEXT,
+                reader INTEGER,
+                status TEXT,
+                entity_id TEXT
+            )
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_card ON {table}(card, timestamp)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_name_lower ON {table}(name_lower, timestamp)")
+
+    def _load_segments(self):
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'tx_[0-9]*'"
+        ).fetchall()
+        for (table,) in rows:
+            day = table[len(self.SEGMENT_PREFIX):]
+            count, max_seq = conn.execute(f"SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM {table}").fetchone()
+            self._segments[day] = [count, max_seq]
+        self._days = tuple(sorted(self._segments))
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value, conn: Optional[sqlite3.Connection] = None):
+        (conn or self._conn()).execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+        if conn is None:
+            self._conn().commit()
+
+    def _load_cursor(self) -> int:
+        value = self._get_meta("last_synced_seq")
+        if value is not None:
+            return int(value)
+
+        # First start on a database that still carries per-row sync flags:
+        # resume just before the oldest unsynced row (a re-upload is preferred over a gap).
+        conn = self._conn()
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(transactions)").fetchall()]
+        cursor = 0
+        if "synced_to_firestore" in columns:
+            first_unsynced = conn.execute(
+                "SELECT MIN(id) FROM transactions WHERE synced_to_firestore = 0"
+            ).fetchone()[0]
+            if first_unsynced is not None:
+                cursor = first_unsynced - 1
+            else:
+                cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+        self._set_meta("last_synced_seq", cursor)
+        return cursor
+
+    def _migrate_single_table(self):
+        """One-time split of the old unpartitioned ``transactions`` table into day segments."""
+        conn = self._conn()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"
+        ).fetchone()
+        if not exists:
+            return
+        try:
+            rows = conn.execute(
+                "SELECT id, timestamp, card, name, reader, status, entity_id FROM transactions ORDER BY id"
+            ).fetchall()
+            with self._write_lock:
+                self._append(conn, [(r["id"], self._row_values(dict(r))) for r in rows],
+                             post_sql="DROP TABLE transactions")
+            self.logger.info(f"Split {len(rows)} transactions into {len(self._days)} day segments")
+        except Exception as e:
+            self.logger.error(f"Error partitioning transaction table: {e}")
+
+    def _import_legacy(self, legacy_path: str):
+        """One-time migration from the JSON array cache."""
+        try:
+            with open(legacy_path, "r") as f:
+                data = json.load(f)
+            txns = data if isinstance(data, list) else []
+
+            caught_up = self.count_unsynced() == 0
+            ids = self.add_many(txns)
+            if ids and caught_up:
+                # Move the cursor over the already-synced prefix of the imported records
+                pending_ids = [tx_id for tx_id, tx in zip(ids, txns) if not tx.get("synced_to_firestore", False)]
+                self.advance_sync_cursor(pending_ids[0] - 1 if pending_ids else ids[-1])
+            os.replace(legacy_path, legacy_path + ".migrated")
+            self.logger.info(f"Migrated {len(txns)} transactions from {legacy_path} to {self.path}")
+        except Exception as e:
+            self.logger.error(f"Error migrating legacy transaction cache {legacy_path}: {e}")
+
+    @staticmethod
+    def _row_values(txn: dict) -> tuple:
+        name = txn.get("name", "Unknown")
+        return (
+            int(txn.get("timestamp", 0) or 0),
+            str(txn.get("card", txn.get("card_number", ""))),
+            name,
+            str(name).lower(),
+            txn.get("reader"),
+            txn.get("status"),
+            txn.get("entity_id"),
+        )
+
+    def _row_to_dict(self, row: sqlite3.Row) -> dict:
+        tx = {k: row[k] for k in self.COLUMNS}
+        tx["synced_to_firestore"] = tx["id"] <= self._cursor
+        return tx
+
+    # ---------- writes ----------
+    INSERT_SQL = ("INSERT INTO {table} (seq, timestamp, card, name, name_lower, reader, status, entity_id) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+    def _append(self, conn: sqlite3.Connection, rows: List[Tuple[int, tuple]], post_sql: Optional[str] = None):
+        """Insert (seq, values) rows into their day segments in one SQLite transaction. Caller holds _write_lock."""
+        touched: Dict[str, List[int]] = {}
+        with conn:
+            for seq, values in rows:
+                day = self._day_of(values[0])
+                if day not in touched:
+                    if day not in self._segments:
+                        self._create_segment(conn, day)
+                    touched[day] = [0, 0]
+                conn.execute(self.INSERT_SQL.format(table=self._table(day)), (seq,) + values)
+                touched[day][0] += 1
+                touched[day][1] = max(touched[day][1], seq)
+            if post_sql:
+                conn.execute(post_sql)
+
+        for day, (added, max_seq) in touched.items():
+            segment = self._segments.setdefault(day, [0, 0])
+            segment[0] += added
+            segment[1] = max(segment[1], max_seq)
+        if any(day not in self._days for day in touched):
+            self._days = tuple(sorted(self._segments))
+
+    def add(self, txn: dict) -> int:
+        """Insert one transaction and return its sequence id."""
+        return self.add_many([txn])[0]
+
+    def add_many(self, txns: List[dict]) -> List[int]:
+        """Insert several transactions in a single SQLite transaction; returns their sequence ids."""
+        if not txns:
+            return []
+        with self._write_lock:
+            first = self._seq + 1
+            ids = list(range(first, first + len(txns)))
+            self._append(self._conn(), [(seq, self._row_values(tx)) for seq, tx in zip(ids, txns)])
+            self._seq = ids[-1]
+        return ids
+
+    def advance_sync_cursor(self, seq: int):
+        """Record that every transaction up to and including seq reached Firestore."""
+        with self._write_lock:
+            if seq <= self._cursor:
+                return
+            conn = self._conn()
+            with conn:
+                self._set_meta("last_synced_seq", seq, conn=conn)
+            self._cursor = seq
+
+    def drop_expired_segments(self, cutoff_timestamp: int) -> int:
+        """
+        Drop every day segment that ends before the day containing cutoff_timestamp.
+        Retention therefore works at day granularity. Returns the number of rows removed.
+        """
+        cutoff_day = self._day_of(cutoff_timestamp)
+        with self._write_lock:
+            expired = [day for day in self._days if day < cutoff_day]
+            if not expired:
+                return 0
+            # Unpublish the days first so new reads never open a table that is about to go
+            removed = sum(self._segments.pop(day)[0] for day in expired)
+            self._days = tuple(sorted(self._segments))
+            conn = self._conn()
+            with conn:
+                for day in expired:
+                    conn.execute(f"DROP TABLE IF EXISTS {self._table(day)}")
+        return removed
+
+    def _segment_rows(self, conn: sqlite3.Connection, day: str, sql: str, params: tuple = ()) -> list:
+        """
+        Rows of one segment query. A reader working from an older day list may reach a segment
+        that retention has just dropped; that segment is skipped (other errors are raised).
+        """
+        try:
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            if day in self._segments:
+                raise
+            return []
+
+    # ---------- reads ----------
+    def _days_between(self, start: int, end: int) -> List[str]:
+        first, last = self._day_of(start), self._day_of(end)
+        return [day for day in self._days if first <= day <= last]
+
+    def _pending_days(self) -> List[str]:
+        cursor = self._cursor
+        return [day for day in self._days if self._segments.get(day, (0, 0))[1] > cursor]
+
+    def segment_days(self) -> List[str]:
+        """Days that currently have a segment, oldest first."""
+        return list(self._days)
+
+    def count(self) -> int:
+        return sum(self._segments.get(day, (0, 0))[0] for day in self._days)
+
+    def count_unsynced(self) -> int:
+        conn = self._conn()
+        return sum(
+            row[0]
+            for day in self._pending_days()
+            for row in self._segment_rows(conn, day, f"SELECT COUNT(*) FROM {self._table(day)} WHERE seq > ?",
+                                          (self._cursor,))
+        )
+
+    @property
+    def last_synced_seq(self) -> int:
+        return self._cursor
+
+    @property
+    def last_seq(self) -> int:
+        """Highest sequence id handed out so far."""
+        return self._seq
+
+    def time_bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        """Return (oldest, newest) timestamps from the first and last segments."""
+        days = self._days
+        if not days:
+            return None, None
+        conn = self._conn()
+        oldest = self._segment_rows(conn, days[0], f"SELECT MIN(timestamp) FROM {self._table(days[0])}")
+        newest = self._segment_rows(conn, days[-1], f"SELECT MAX(timestamp) FROM {self._table(days[-1])}")
+        return (oldest[0][0] if oldest else None), (newest[0][0] if newest else None)
+
+    def _newest_first(self, days: List[str], where: str, params: tuple, limit: int) -> List[dict]:
+        """Walk segments newest day first until limit rows are collected."""
+        conn = self._conn()
+        results = []
+        for day in reversed(days):
+            remaining = limit - len(results)
+            if remaining <= 0:
+                break
+            rows = self._segment_rows(
+                conn, day,
+                f"SELECT {self.SELECT_COLUMNS} FROM {self._table(day)} WHERE {where} "
+                "ORDER BY timestamp DESC, seq DESC LIMIT ?",
+                params + (remaining,)
+            )
+            results.extend(self._row_to_dict(r) for r in rows)
+        return results
+
+    def latest(self, limit: int = 10) -> List[dict]:
+        return self._newest_first(list(self._days), "1", (), limit)
+
+    def status_counts(self, start: int, end: int) -> Dict[str, int]:
+        """Count transactions per status within [start, end]."""
+        conn = self._conn()
+        counts: Dict[str, int] = {}
+        for day in self._days_between(start, end):
+            rows = self._segment_rows(
+                conn, day,
+                f"SELECT status, COUNT(*) FROM {self._table(day)} WHERE timestamp BETWEEN ? AND ? GROUP BY status",
+                (start, end)
+            )
+            for status, count in rows:
+                counts[status or ""] = counts.get(status or "", 0) + count
+        return counts
+
+    def search_name(self, query: str, start: int, end: int, limit: int = 100) -> List[dict]:
+        """Newest-first transactions whose name contains query (case-insensitive) within [start, end]."""
+        pattern = "%" + query.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return self._newest_first(
+            self._days_between(start, end),
+            "timestamp BETWEEN ? AND ? AND name_lower LIKE ? ESCAPE '\\'",
+            (start, end, pattern),
+            limit
+        )
+
+    def search_card(self, card: str, start: int, end: int, limit: int = 100) -> List[dict]:
+        """Newest-first transactions for one card number within [start, end]."""
+        return self._newest_first(
+            self._days_between(start, end),
+            "card = ? AND timestamp BETWEEN ? AND ?",
+            (str(card), start, end),
+            limit
+        )
+
+    def page(self, start: int, end: int, limit: int = 100, before: Optional[Tuple[int, int]] = None,
+             reader: Optional[int] = None, status: Optional[str] = None,
+             card: Optional[str] = None) -> List[dict]:
+        """
+        One newest-first page of transactions within [start, end] matching the optional filters.
+        `before` is the (timestamp, seq) of the last row of the previous page (keyset pagination):
+        only segments at or before that day are opened and at most `limit` rows are read.
+        """
+        where = ["timestamp BETWEEN ? AND ?"]
+        params: list = [start, end]
+        if before is not None:
+            end = min(end, before[0])
+            where.append("(timestamp < ? OR (timestamp = ? AND seq < ?))")
+            params += [before[0], before[0], before[1]]
+        if reader is not None:
+            where.append("reader = ?")
+            params.append(reader)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if card:
+            where.append("card = ?")
+            params.append(str(card))
+        if end < start:
+            return []
+        return self._newest_first(self._days_between(start, end), " AND ".join(where), tuple(params), limit)
+
+    def unsynced(self, limit: Optional[int] = None) -> List[dict]:
+        """Pending transactions after the sync cursor, oldest first; only segments past the cursor are read."""
+        conn = self._conn()
+        sql = "SELECT {cols} FROM {table} WHERE seq > ? ORDER BY seq"
+        params = (self._cursor,)
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        rows = []
+        for day in self._pending_days():
+            rows.extend(self._segment_rows(conn, day, sql.format(cols=self.SELECT_COLUMNS, table=self._table(day)), params))
+        rows.sort(key=lambda r: r["id"])
+        if limit:
+            rows = rows[:limit]
+        return [self._row_to_dict(r) for r in rows]
+
+    def iter_search_rows(self, max_seq: int) -> Iterator[Tuple[int, int, str, str]]:
+        """Yield (seq, timestamp, card, name) for every row up to max_seq, segment by segment."""
+        conn = self._conn()
+        for day in self._days:
+            rows = self._segment_rows(
+                conn, day,
+                f"SELECT seq, timestamp, card, name FROM {self._table(day)} WHERE seq <= ? ORDER BY timestamp, seq",
+                (max_seq,)
+            )
+            for row in rows:
+                yield tuple(row)
+
+    def fetch(self, refs: List[Tuple[int, int]]) -> List[dict]:
+        """Load rows for (timestamp, seq) refs, preserving their order; refs in dropped segments are skipped."""
+        by_day: Dict[str, List[int]] = {}
+        for ts, seq in refs:
+            by_day.setdefault(self._day_of(ts), []).append(seq)
+        conn = self._conn()
+        found = {}
+        for day, seqs in by_day.items():
+            if day not in self._segments:
+                continue
+            placeholders = ",".join("?" * len(seqs))
+            rows = self._segment_rows(
+                conn, day, f"SELECT {self.SELECT_COLUMNS} FROM {self._table(day)} WHERE seq IN ({placeholders})",
+                tuple(seqs)
+            )
+            for row in rows:
+                found[row["id"]] = self._row_to_dict(row)
+        return [found[seq] for _, seq in refs if seq in found]
+
+    def size_bytes(self) -> int:
+        total = 0
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                total += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return total
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._local.conn = None
@@ -0,0 +1,210 @@
+import os
+import json
+import logging
+import threading
+from collections.abc import Mapping
+from typing import Optional
+
+
+class JournaledDict:
+    """
+    Durable dict persisted as a JSON snapshot plus an append-only change journal.
+
+    The snapshot keeps the existing file format (``users.json`` /
+    ``blocked_users.json``), so other tools can keep reading it. Each change
+    is one NDJSON line appended to ``<snapshot>.journal``:
+    ``{"op": "put", "key": ..., "value": ...}`` or ``{"op": "del", "key": ...}``.
+    Loading replays the journal over the snapshot. Once the journal reaches
+    ``compact_every`` entries it is folded into a fresh snapshot, so a single
+    change costs one small append on disk.
+
+    For owners that write the snapshot outside their lock, ``rotate()`` moves
+    the journal aside to ``<snapshot>.journal.compacting`` (still replayed,
+    before the live journal) and ``compact_rotated()`` later writes the
+    snapshot and drops it.
+
+    The caller owns the in-memory dict and its locking; this class only
+    handles persistence.
+    """
+
+    def __init__(self, snapshot_path: str, compact_every: int = 1000):
+        self.logger = logging.getLogger(__name__)
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.rotated_path = self.journal_path + ".compacting"
+        self.compact_every = max(1, compact_every)
+        self._lock = threading.Lock()
+        self._entries = 0
+        self._torn_tail = False
+
+    def load(self) -> dict:
+        """Return snapshot + replayed journal; a torn last line from a crash is ignored."""
+        data = {}
+        try:
+            with open(self.snapshot_path, "r") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                data = loaded
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Error reading {self.snapshot_path}: {e}")
+
+        for entry in self._read_entries(self.rotated_path)[0] + self.read_journal():
+            self._apply(data, entry)
+        return data
+
+    def read_journal(self) -> list:
+        """Live journal entries, in order (without reading the snapshot or a rotated journal)."""
+        entries, torn_tail = self._read_entries(self.journal_path)
+        with self._lock:
+            self._entries = len(entries)
+            self._torn_tail = torn_tail
+        return entries
+
+    def _read_entries(self, path: str):
+        entries = []
+        torn_tail = False
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    torn_tail = not line.endswith("\n")
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        self.logger.warning(f"Skipping unreadable journal line in {path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Error replaying {path}: {e}")
+        return entries, torn_tail
+
+    def final_state(self) -> dict:
+        """Net effect of the journal: key -> value, or None for keys deleted since the snapshot."""
+        state = {}
+        for entry in self._read_entries(self.rotated_path)[0] + self.read_journal():
+            if entry.get("op") == "put":
+                state[entry["key"]] = entry.get("value")
+            elif entry.get("op") == "del":
+                state[entry["key"]] = None
+        return state
+
+    @staticmethod
+    def _apply(data: dict, entry: dict):
+        if entry.get("op") == "put":
+            data[entry["key"]] = entry.get("value")
+        elif entry.get("op") == "del":
+            data.pop(entry["key"], None)
+
+    def _append(self, entries) -> bool:
+        """Append journal entries with a single write + fsync. Returns True when compaction is due."""
+        payload = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+        with self._lock:
+            if self._torn_tail:
+                # Terminate a partial line left by a crash so it doesn't swallow this entry
+                payload = "\n" + payload
+                self._torn_tail = False
+            with open(self.journal_path, "a") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries += len(entries)
+            return self._entries >= self.compact_every
+
+    @property
+    def pending(self) -> int:
+        """Journal entries not yet folded into the snapshot."""
+        return self._entries
+
+    def put(self, key: str, value) -> bool:
+        return self._append([{"op": "put", "key": key, "value": value}])
+
+    def delete(self, key: str) -> bool:
+        return self._append([{"op": "del", "key": key}])
+
+    def record_many(self, puts: Optional[dict] = None, deletes=()) -> bool:
+        """Journal a batch of puts and deletes in one append."""
+        entries = [{"op": "put", "key": k, "value": v} for k, v in (puts or {}).items()]
+        entries += [{"op": "del", "key": k} for k in deletes]
+        return self._append(entries) if entries else False
+
+    def compact(self, data: Mapping):
+        """
+        Write data as the new snapshot and truncate the journal. Call with the owner's lock held.
+        The snapshot and its rename are on disk before the journal is truncated, so a crash
+        in between replays the journal over the new snapshot instead of losing changes.
+        """
+        with self._lock:
+            self._write_snapshot(data)
+            with open(self.journal_path, "w"):
+                pass
+            self._entries = 0
+            self._torn_tail = False
+            self._remove_rotated()
+
+    def rotate(self):
+        """
+        Move the live journal aside (call with the owner's lock held, together with taking the
+        copy of the data to compact). Later changes start a new journal; pass that copy to
+        compact_rotated() without holding the lock.
+        """
+        with self._lock:
+            if os.path.exists(self.rotated_path):
+                # A rotation that never finished (crash): keep its entries, append the live ones
+                with open(self.journal_path, "r") as src:
+                    payload = src.read()
+                if payload:
+                    with open(self.rotated_path, "a") as f:
+                        f.write("\n" + payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                with open(self.journal_path, "w"):
+                    pass
+            elif os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.rotated_path)
+                self._fsync_dir()
+            self._entries = 0
+            self._torn_tail = False
+
+    def compact_rotated(self, data: Mapping):
+        """Write data (the state as of the last rotate()) as the new snapshot and drop the rotated journal."""
+        self._write_snapshot(data)
+        with self._lock:
+            self._remove_rotated()
+
+    def _remove_rotated(self):
+        try:
+            os.remove(self.rotated_path)
+        except FileNotFoundError:
+            pass
+
+    def _write_snapshot(self, data: Mapping):
+        """Stream data to the snapshot file (same layout as json.dump(..., indent=4)), fsync and rename it."""
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, "w") as f:
+            first = True
+            for key, value in data.items():
+                f.write("{\n" if first else ",\n")
+                f.write(json.dumps({key: value}, indent=4)[2:-2])
+                first = False
+            f.write("{}" if first else "\n}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self._fsync_dir()
+
+    def _fsync_dir(self):
+        """Make the snapshot rename durable (no-op where directories can't be opened, e.g. Windows)."""
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError as e:
+            self.logger.debug(f"Could not fsync directory of {self.snapshot_path}: {e}")
+        finally:
+            os.close(fd)
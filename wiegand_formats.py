@@ -0,0 +1,172 @@
+from collections import namedtuple
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+
+# Fields and parity positions are counted from the first transmitted bit (position 0 = MSB of the frame)
+WiegandCard = namedtuple("WiegandCard", ["format", "card_id", "facility", "number"])
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:  # Python < 3.10
+    def _popcount(x):
+        return bin(x).count("1")
+
+
+def _positions_mask(bits: int, positions: Iterable[int]) -> int:
+    mask = 0
+    for pos in positions:
+        mask |= 1 << (bits - 1 - pos)
+    return mask
+
+
+def _field(bits: int, field: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    """(start, length) -> (shift, mask); (0, 0) for an absent field."""
+    if not field:
+        return 0, 0
+    start, length = field
+    return bits - start - length, (1 << length) - 1
+
+
+class WiegandFormat:
+    """
+    One frame layout, compiled to shifts and masks.
+
+    ``card_id`` is the number the access system stores (the data bits between
+    the parity bits, as the controller has always used); ``facility`` and
+    ``number`` are the printed sub-fields where the format defines them.
+    ``parity`` entries are ("even" | "odd", parity_position, covered_positions);
+    a frame is valid when every (parity bit + covered bits) group has the
+    stated parity. Entries are listed in the order an encoder must fill them.
+    """
+
+    __slots__ = ("name", "bits", "id_shift", "id_mask", "facility_shift", "facility_mask",
+                 "number_shift", "number_mask", "parity", "_parity_spec")
+
+    def __init__(self, name: str, bits: int, card_id: Tuple[int, int],
+                 facility: Optional[Tuple[int, int]] = None, number: Optional[Tuple[int, int]] = None,
+                 parity: Sequence[Tuple[str, int, Iterable[int]]] = ()):
+        self.name = name
+        self.bits = bits
+        self.id_shift, self.id_mask = _field(bits, card_id)
+        self.facility_shift, self.facility_mask = _field(bits, facility)
+        self.number_shift, self.number_mask = _field(bits, number)
+        self._parity_spec = [(kind, pos, tuple(covered)) for kind, pos, covered in parity]
+        # (group mask, required popcount parity, parity bit mask, covered mask)
+        self.parity = tuple(
+            (_positions_mask(bits, (pos,) + covered), 1 if kind == "odd" else 0,
+             _positions_mask(bits, (pos,)), _positions_mask(bits, covered))
+            for kind, pos, covered in self._parity_spec
+        )
+
+    def parity_ok(self, value: int) -> bool:
+        for group, required, _, _ in self.parity:
+            if _popcount(value & group) & 1 != required:
+                return False
+        return True
+
+    def card_id(self, value: int) -> int:
+        return (value >> self.id_shift) & self.id_mask
+
+    def decode(self, value: int, check_parity: bool = True) -> Optional[WiegandCard]:
+        if check_parity and not self.parity_ok(value):
+            return None
+        return WiegandCard(
+            self.name,
+            (value >> self.id_shift) & self.id_mask,
+            (value >> self.facility_shift) & self.facility_mask if self.facility_mask else None,
+            (value >> self.number_shift) & self.number_mask if self.number_mask else None,
+        )
+
+    def encode(self, card_id: int) -> int:
+        """Frame for card_id with every parity bit set (used by tests and the card simulator)."""
+        value = (card_id & self.id_mask) << self.id_shift
+        for _, required, bit, covered in self.parity:
+            if _popcount(value & covered) & 1 != required:
+                value |= bit
+            else:
+                value &= ~bit
+        return value
+
+    def __repr__(self):
+        return f"WiegandFormat({self.name!r}, {self.bits} bits)"
+
+
+def _span(start: int, end: int) -> range:
+    return range(start, end + 1)
+
+
+H10301 = WiegandFormat(
+    "H10301", 26, card_id=(1, 24), facility=(1, 8), number=(9, 16),
+    parity=[("even", 0, _span(1, 12)), ("odd", 25, _span(13, 24))])
+
+WIEGAND_34 = WiegandFormat(
+    "34-bit", 34, card_id=(1, 32), facility=(1, 16), number=(17, 16),
+    parity=[("even", 0, _span(1, 16)), ("odd", 33, _span(17, 32))])
+
+# HID Corporate 1000 35-bit: interleaved parity groups, then odd parity over the whole frame
+CORPORATE_1000 = WiegandFormat(
+    "Corporate1000-35", 35, card_id=(2, 32), facility=(2, 12), number=(14, 20),
+    parity=[("even", 1, [p for p in _span(2, 33) if p % 3 != 1]),
+            ("odd", 34, [p for p in _span(1, 32) if p % 3 != 0]),
+            ("odd", 0, _span(1, 34))])
+
+H10304 = WiegandFormat(
+    "H10304", 37, card_id=(1, 35), facility=(1, 16), number=(17, 19),
+    parity=[("even", 0, _span(1, 18)), ("odd", 36, _span(18, 35))])
+
+DEFAULT_FORMATS = (H10301, WIEGAND_34, CORPORATE_1000, H10304)
+
+
+class FormatTable:
+    """Formats keyed by frame length, so a frame is decoded without knowing its format in advance."""
+
+    def __init__(self, formats: Iterable[WiegandFormat] = DEFAULT_FORMATS, check_parity: bool = True):
+        self.check_parity = check_parity
+        self._by_bits: Dict[int, WiegandFormat] = {}
+        for fmt in formats:
+            self.register(fmt)
+
+    def register(self, fmt: WiegandFormat):
+        """Add or replace the format for fmt.bits."""
+        self._by_bits[fmt.bits] = fmt
+
+    def lengths(self) -> Tuple[int, ...]:
+        return tuple(sorted(self._by_bits))
+
+    def get(self, bits: int) -> Optional[WiegandFormat]:
+        return self._by_bits.get(bits)
+
+    def card_id(self, bits: int, value: int) -> Optional[int]:
+        """Hot path: card id for a frame, or None for an unknown length or a parity error."""
+        fmt = self._by_bits.get(bits)
+        if fmt is None:
+            return None
+        if self.check_parity:
+            for group, required, _, _ in fmt.parity:
+                if _popcount(value & group) & 1 != required:
+                    return None
+        return (value >> fmt.id_shift) & fmt.id_mask
+
+    def decode(self, bits: int, value: int) -> Optional[WiegandCard]:
+        fmt = self._by_bits.get(bits)
+        return fmt.decode(value, self.check_parity) if fmt is not None else None
+
+
+def parse_custom_formats(spec: str):
+    """
+    Parse "name:bits:id_start:id_length[:even_end[:odd_start]]" entries separated by commas.
+    With even_end / odd_start, bit 0 is even parity over 1..even_end and the last bit is odd
+    parity over odd_start..bits-2 (the usual leading-even / trailing-odd layout).
+    """
+    formats = []
+    for entry in filter(None, (e.strip() for e in (spec or "").split(","))):
+        parts = entry.split(":")
+        if len(parts) not in (4, 6):
+            raise ValueError(f"Invalid Wiegand format {entry!r}")
+        name, (bits, start, length) = parts[0], map(int, parts[1:4])
+        parity = []
+        if len(parts) == 6:
+            even_end, odd_start = int(parts[4]), int(parts[5])
+            parity = [("even", 0, _span(1, even_end)), ("odd", bits - 1, _span(odd_start, bits - 2))]
+        formats.append(WiegandFormat(name, bits, card_id=(start, length), parity=parity))
+    return formats
@@ -0,0 +1,205 @@
+"""
+Priority classes for the application's threads and queues.
+
+realtime    - pigpio callbacks: decode, decide, pulse the relay. Never queued behind anything.
+capture     - scan consumer and camera captures. Bounded; excess captures are shed.
+persistence - the transaction writer. Bounded; never shed, producers wait instead.
+upload      - S3 / JSON uploads and sync. Bounded; shed items stay on disk and are re-enqueued.
+cleanup     - storage, retention and session housekeeping.
+
+Each class runs its threads at a higher nice value (Linux applies setpriority to single
+threads), so when the GIL is released the scheduler favours the pigpio callback thread.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Full
+from typing import Callable, Dict, Optional
+
+REALTIME = "realtime"
+CAPTURE = "capture"
+PERSISTENCE = "persistence"
+UPLOAD = "upload"
+CLEANUP = "cleanup"
+
+CLASS_ORDER = (REALTIME, CAPTURE, PERSISTENCE, UPLOAD, CLEANUP)
+CLASS_NICE = {REALTIME: 0, CAPTURE: 2, PERSISTENCE: 5, UPLOAD: 10, CLEANUP: 15}
+
+_registry_lock = threading.Lock()
+_registry: Dict[str, list] = {c: [] for c in CLASS_ORDER}
+
+
+def set_switch_interval(ms: float):
+    """Shorter GIL switch interval: a CPU-bound thread yields the GIL to the callback thread sooner."""
+    if ms > 0:
+        sys.setswitchinterval(ms / 1000.0)
+
+
+def set_thread_class(work_class: str):
+    """Lower the calling thread's OS priority to its class's nice value (no-op where unsupported)."""
+    nice = CLASS_NICE[work_class]
+    if not nice or not hasattr(os, "setpriority") or not hasattr(threading, "get_native_id"):
+        return
+    try:
+        tid = threading.get_native_id()
+        # Never raise a thread's priority (that needs privileges); only lower it
+        if os.getpriority(os.PRIO_PROCESS, tid) < nice:
+            os.setpriority(os.PRIO_PROCESS, tid, nice)
+    except OSError as e:
+        logging.debug(f"Could not set {work_class} thread priority: {e}")
+
+
+def start_worker(work_class: str, target: Callable, *args, name: Optional[str] = None) -> threading.Thread:
+    """Start a daemon thread that runs target(*args) at work_class priority."""
+    def run():
+        set_thread_class(work_class)
+        target(*args)
+    thread = threading.Thread(target=run, name=name or f"{work_class}-{target.__name__}", daemon=True)
+    thread.start()
+    return thread
+
+
+def _register(work_class: str, component):
+    with _registry_lock:
+        _registry[work_class].append(component)
+
+
+class BoundedExecutor:
+    """
+    ThreadPoolExecutor whose workers run at work_class priority and whose backlog is bounded:
+    at most max_workers running plus max_pending waiting. try_submit() sheds when full;
+    submit() waits for room (backpressure), so use it only from threads that may block.
+    """
+
+    def __init__(self, work_class: str, max_workers: int, max_pending: int, name: str):
+        self.work_class = work_class
+        self.name = name
+        self.capacity = max_workers + max_pending
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name,
+                                            initializer=set_thread_class, initargs=(work_class,))
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.admitted = 0
+        self.shed = 0
+        _register(work_class, self)
+
+    def _done(self, _future):
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def _run(self, fn, args, kwargs):
+        with self._lock:
+            self.in_use += 1
+            self.admitted += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def try_submit(self, fn, *args, **kwargs):
+        """Future, or None if the backlog is full (the work is shed)."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.shed += 1
+            return None
+        return self._run(fn, args, kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        self._slots.acquire()
+        return self._run(fn, args, kwargs)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        return {"name": self.name, "in_use": self.in_use, "capacity": self.capacity,
+                "admitted": self.admitted, "shed": self.shed}
+
+
+class ShedQueue(Queue):
+    """Bounded Queue that counts puts refused because it was full (put(block=False) raises Full as usual)."""
+
+    def __init__(self, work_class: str, maxsize: int, name: str):
+        super().__init__(maxsize)
+        self.work_class = work_class
+        self.name = name
+        self.admitted = 0
+        self.shed = 0
+        _register(work_class, self)
+
+    def put(self, item, block=True, timeout=None):
+        try:
+            super().put(item, block, timeout)
+        except Full:
+            self.shed += 1
+            raise
+        self.admitted += 1
+
+    def stats(self) -> dict:
+        return {"name": self.name, "in_use": self.qsize(), "capacity": self.maxsize,
+                "admitted": self.admitted, "shed": self.shed}
+
+
+class FailureBreaker:
+    """
+    Sheds work aimed at a failing dependency (e.g. an offline camera). After `threshold`
+    consecutive failures it opens for `cooldown` seconds; then one attempt is let through,
+    and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, work_class: str, name: str, threshold: int = 3, cooldown: float = 30.0):
+        self.work_class = work_class
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+        self.shed = 0
+        _register(work_class, self)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._failures < self.threshold:
+                return True
+            now = time.monotonic()
+            if now >= self._open_until:
+                self._open_until = now + self.cooldown  # one probe per cooldown
+                return True
+            self.shed += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures == self.threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                logging.warning(f"{self.name}: {self.threshold} consecutive failures, shedding for {self.cooldown:g}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            is_open = self._failures >= self.threshold and time.monotonic() < self._open_until
+        return {"name": self.name, "open": is_open, "consecutive_failures": self._failures, "shed": self.shed}
+
+
+def snapshot() -> dict:
+    """Per-class nice value and the state of every registered executor, queue and breaker."""
+    with _registry_lock:
+        components = {c: list(items) for c, items in _registry.items()}
+    return {
+        c: {"nice": CLASS_NICE[c], "components": [item.stats() for item in components[c]]}
+        for c in CLASS_ORDER
+    }